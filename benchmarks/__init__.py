@@ -0,0 +1,26 @@
+"""
+benchmarks - Hermetic benchmark suite for the GEL build
+
+Runs the build stages that work purely on the build files -
+mergeEntryPairs, addInflections, cleanAttributes (or processBaseChain in
+their place), frequencyListLemmas, insertFrequency, alphabetizeOutput
+and indexOutput - over a synthetic corpus of known size, so that
+throughput can be measured and compared without the OED source, the
+Google Books ngram tables or the corpus data.
+
+ - corpus: generates the synthetic base build files (and the frequency
+    data which the frequency-scoring stages would otherwise compute);
+ - standins/lex: minimal versions of the parts of the lex package used
+    by those stages (put on the path in place of the real lex);
+ - harness: runs the stages over a corpus, in a fresh process;
+ - run: command-line entry point, which runs the harness at each scale
+    requested and writes the results as JSON;
+ - micro: microbenchmarks for the functions called once per entry or
+    type (ops/sec and memory allocated per call), run on fixed inputs
+    from fixtures;
+ - gate: compares a set of results (from run or micro) with a stored
+    baseline, and fails if anything has got slower or uses more memory.
+
+generateBase and the frequency-scoring stages are not benchmarked here,
+since they depend on real OED data, ngram tables and regression models.
+"""
@@ -0,0 +1,336 @@
+"""
+corpus - Generate synthetic GEL build files
+
+generate_base() writes a set of base build files (as written to
+01_base by generateBase) for a made-up but realistically shaped
+lexicon: entries in alphabetical order, homographs in different
+wordclasses (some linked by parentId, some only by a shared ODE link, as
+mergeEntryPairs expects), compound subentries, obsolete entries, spelling
+variants, and a few pathological entries with hundreds of variants.
+
+add_frequency_data() takes the lemma lists written by
+frequencyListLemmas (<lemma>/<lex>/<instance>), and adds made-up
+Google Books ngram counts (<gbn>) and frequency tables, as
+frequencyComputeScores would; the result stands in for
+types_with_frequency.
+
+The same scale and seed always produce the same files.
+"""
+
+import os
+import random
+import string
+
+from lxml import etree
+
+import gelconfig
+
+# Number of entries at scale 1
+ENTRIES_PER_SCALE = 2000
+FILE_SIZE = gelconfig.FILE_SIZE_BUILD
+PERIODS = [period for period, _ in gelconfig.FREQUENCY_PERIODS]
+
+ONSETS = ('b', 'bl', 'br', 'c', 'ch', 'cr', 'd', 'dr', 'f', 'fl', 'g', 'gr',
+          'h', 'j', 'k', 'l', 'm', 'n', 'p', 'pl', 'pr', 'qu', 'r', 's', 'sh',
+          'sk', 'sl', 'sp', 'st', 't', 'th', 'tr', 'v', 'w', 'z', '')
+NUCLEI = ('a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'ee', 'oo', 'ou', 'y')
+CODAS = ('', '', 'n', 'r', 'l', 'st', 'nd', 'ck', 'm', 't', 'sh', 'x', 'ng')
+SUFFIXES = {'NN': ('', '', 'ness', 'ment', 'er', 'ism', 'ity', 'ics'),
+            'JJ': ('', 'ous', 'al', 'ive', 'ful', 'less', 'y'),
+            'VB': ('', '', 'ate', 'ize', 'en'),
+            'RB': ('ly',),
+            'NP': ('',),
+            'UH': ('',)}
+# Relative numbers of entries in each wordclass
+WORDCLASSES = (('NN', 55), ('JJ', 20), ('VB', 14), ('RB', 5), ('NP', 4),
+               ('UH', 2))
+DEFINITION_WORDS = ('a', 'the', 'of', 'or', 'relating', 'to', 'person',
+                    'thing', 'quality', 'state', 'act', 'which', 'is',
+                    'used', 'in', 'kind', 'having', 'form', 'small', 'plant')
+NGRAM_TAGS = {'NN': 'NOUN', 'NNS': 'NOUN', 'JJ': 'ADJ', 'VB': 'VERB',
+              'RB': 'ADV', 'NP': 'NOUN', 'UH': 'PRT'}
+
+
+def generate_base(out_dir, scale=1, seed=0):
+    """
+    Write base build files (0001.xml, 0002.xml, ...) to out_dir, with
+    ENTRIES_PER_SCALE * scale entries in all; return the number of
+    entries written.
+    """
+    rng = random.Random('%s-%s' % (seed, scale))
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    lemmas = _vocabulary(rng, int(ENTRIES_PER_SCALE * scale))
+
+    root = etree.Element('entries')
+    filecount = 0
+    entry_count = 0
+    oed_id = 10000
+    for lemma in lemmas:
+        # Start a new file when the buffer is full, but never split a
+        #  set of homographs
+        if len(root) >= FILE_SIZE:
+            filecount += 1
+            _write(root, out_dir, filecount)
+            root = etree.Element('entries')
+        oed_id += rng.randint(1, 20)
+        for entry_node in _entry_group(rng, lemma, oed_id):
+            root.append(entry_node)
+            entry_count += 1
+        oed_id += 10
+    if len(root):
+        filecount += 1
+        _write(root, out_dir, filecount)
+    return entry_count
+
+
+def _vocabulary(rng, size):
+    """
+    Return a sorted list of (lemma, wordclasses) tuples, one per group
+    of homographs, making up about `size` entries in all.
+    """
+    lemmas = {}
+    entries = 0
+    while entries < size:
+        wordclass = _weighted_choice(rng, WORDCLASSES)
+        word = ''.join([rng.choice(ONSETS) + rng.choice(NUCLEI)
+                        for _ in range(rng.choice((1, 2, 2, 3)))])
+        word += rng.choice(CODAS) + rng.choice(SUFFIXES[wordclass])
+        if wordclass == 'NP':
+            word = word.capitalize()
+        elif wordclass == 'NN' and rng.random() < 0.08:
+            # Compound
+            word += rng.choice((' ', '-')) + rng.choice(list(lemmas) or
+                                                        ['box'])
+        if word in lemmas or len(word) < 2:
+            continue
+        # About one lemma in seven has homographs in other wordclasses
+        wordclasses = [wordclass]
+        if wordclass in ('NN', 'VB', 'JJ') and rng.random() < 0.15:
+            wordclasses.extend(rng.sample([w for w in ('NN', 'VB', 'JJ')
+                                           if w != wordclass],
+                                          rng.randint(1, 2)))
+        lemmas[word] = wordclasses
+        entries += len(wordclasses)
+    return sorted(lemmas.items(), key=lambda item: (_sort(item[0]), item[0]))
+
+
+def _entry_group(rng, lemma, oed_id):
+    """
+    Return the entry nodes for a set of homographs.
+    """
+    word, wordclasses = lemma
+    nodes = []
+    # Homographs are linked either by parentId, or only by sharing the
+    #  same ODE entry
+    linked_by_parent = rng.random() < 0.4
+    shared_link = 'ode%06d' % oed_id
+    for i, wordclass in enumerate(wordclasses):
+        entry_id = oed_id + i
+        node = etree.Element('e', oedId=str(entry_id),
+                             oedLexid=str(entry_id * 10), tag='s1')
+        if i > 0 and linked_by_parent:
+            node.set('parentId', str(oed_id))
+        if ' ' in word and rng.random() < 0.5:
+            node.set('tag', 'sub')
+            node.set('oedLexid', str(entry_id * 10 + 1))
+        if len(wordclasses) > 1 and not linked_by_parent:
+            ode_link = shared_link
+        elif rng.random() < 0.5:
+            ode_link = 'ode%06d' % entry_id
+        else:
+            ode_link = None
+        _add_lemmas(rng, node, word)
+        node.append(_wordclass_set(rng, word, wordclass, entry_id, ode_link))
+        nodes.append(node)
+    return nodes
+
+
+def _add_lemmas(rng, node, word):
+    source = rng.choice(('oed_rev', 'oed_unrev', 'ode'))
+    if 'our' in word or 'ise' in word:
+        for locale, form in (('uk', word),
+                             ('us', word.replace('our', 'or')
+                              .replace('ise', 'ize'))):
+            lemma_node = etree.SubElement(node, 'lemma', src=source,
+                                          locale=locale)
+            lemma_node.text = form
+    else:
+        lemma_node = etree.SubElement(node, 'lemma', src=source)
+        lemma_node.text = word
+
+
+def _wordclass_set(rng, word, wordclass, entry_id, ode_link):
+    start = rng.choice((rng.randint(1150, 1500), rng.randint(1500, 1800),
+                        rng.randint(1800, 1990)))
+    obsolete = rng.random() < 0.15
+    if obsolete:
+        end = rng.randint(start, max(start, 1899))
+    else:
+        end = 2050
+    node = etree.Element('wordclassSet')
+    etree.SubElement(node, 'wordclass', penn=wordclass)
+    node.append(_date(start, end, obsolete))
+
+    block = etree.SubElement(node, 'morphSetBlock')
+    forms = [word] + _variants(rng, word, start)
+    for i, form in enumerate(forms):
+        morphset = etree.SubElement(block, 'morphSet')
+        if i == 0:
+            morphset.set('oedHeadword', 'true')
+            variant_start, variant_end = start, end
+        else:
+            variant_start = rng.randint(start, min(end, max(start, 1700)))
+            variant_end = rng.randint(variant_start, end)
+            if rng.random() < 0.1:
+                morphset.set('irregular', 'true')
+            if rng.random() < 0.05:
+                morphset.set('regional', 'true')
+        morphset.append(_date(variant_start, variant_end, False))
+        type_node = etree.SubElement(morphset, 'type')
+        etree.SubElement(type_node, 'form').text = form
+        etree.SubElement(type_node, 'wordclass', penn=wordclass)
+        if i > 0 and rng.random() < 0.3:
+            type_node.set('computed', 'true')
+
+    definitions = etree.SubElement(node, 'definitions')
+    for source in ('ode', 'oed_rev')[:rng.randint(1, 2)]:
+        definition = etree.SubElement(definitions, 'definition', src=source)
+        definition.text = ' '.join([rng.choice(DEFINITION_WORDS) for _ in
+                                    range(rng.randint(4, 16))])
+
+    resources = etree.SubElement(node, 'resourceSet')
+    etree.SubElement(resources, 'resource', code='oed', xrid=str(entry_id),
+                     xnode=str(entry_id * 10), type='entry')
+    if ode_link:
+        etree.SubElement(resources, 'resource', code='ode', xrid=ode_link,
+                         type='entry')
+    return node
+
+
+def _variants(rng, word, start):
+    """
+    Return a list of made-up variant spellings; older words have more,
+    and a very few have hundreds.
+    """
+    if rng.random() < 0.002:
+        count = rng.randint(100, 300)
+    elif start < 1500:
+        count = rng.randint(2, 12)
+    elif start < 1700:
+        count = rng.randint(0, 4)
+    else:
+        count = rng.choice((0, 0, 0, 1))
+    variants = []
+    seen = set([word])
+    attempts = 0
+    while len(variants) < count and attempts < count * 10:
+        attempts += 1
+        variant = _respell(rng, word)
+        if variant not in seen:
+            variants.append(variant)
+            seen.add(variant)
+    return variants
+
+
+def _respell(rng, word):
+    replacements = (('i', 'y'), ('y', 'ie'), ('ea', 'e'), ('oo', 'o'),
+                    ('ou', 'ow'), ('c', 'k'), ('k', 'c'), ('s', 'ss'),
+                    ('f', 'ff'), ('l', 'll'), ('u', 'v'), ('e', 'ee'))
+    variant = word
+    for _ in range(rng.randint(1, 4)):
+        old, new = rng.choice(replacements)
+        if old in variant:
+            position = rng.choice([i for i in range(len(variant))
+                                   if variant.startswith(old, i)])
+            variant = variant[:position] + new + variant[position + len(old):]
+    if rng.random() < 0.4:
+        variant += 'e'
+    return variant
+
+
+def _date(start, end, obsolete):
+    node = etree.Element('date', start=str(start), end=str(end))
+    if obsolete:
+        node.set('obs', 'true')
+    return node
+
+
+def _weighted_choice(rng, choices):
+    total = sum([weight for _, weight in choices])
+    point = rng.uniform(0, total)
+    for value, weight in choices:
+        point -= weight
+        if point <= 0:
+            return value
+    return choices[-1][0]
+
+
+def _sort(word):
+    return ''.join([c for c in word.lower() if c in string.ascii_lowercase])
+
+
+def _write(root, out_dir, filecount):
+    with open(os.path.join(out_dir, '%04d.xml' % filecount), 'w') as filehandle:
+        filehandle.write(etree.tounicode(root, pretty_print=True))
+
+
+def add_frequency_data(types_dir, out_dir, seed=0):
+    """
+    Copy the lemma lists in types_dir (one subdirectory per letter) to
+    out_dir, adding ngram counts and a frequency table for each lemma
+    and type; return the number of lemmas.
+    """
+    from lex.frequencytable import FrequencyTable
+
+    rng = random.Random('frequency-%s' % seed)
+    parser = etree.XMLParser(remove_blank_text=True)
+    count = 0
+    for letter in string.ascii_lowercase:
+        # FrequencyIterator expects a subdirectory for every letter
+        out_subdir = os.path.join(out_dir, letter)
+        if not os.path.isdir(out_subdir):
+            os.makedirs(out_subdir)
+        in_subdir = os.path.join(types_dir, letter)
+        if not os.path.isdir(in_subdir):
+            continue
+        for filename in sorted(os.listdir(in_subdir)):
+            if not filename.endswith('.xml'):
+                continue
+            doc = etree.parse(os.path.join(in_subdir, filename), parser)
+            for lemma_node in doc.getroot().findall('lemma'):
+                count += 1
+                # Zipf-like: a few common words, a long tail of rare ones
+                fpm = 2000.0 / (rng.paretovariate(0.9) * 100)
+                instances = lemma_node.findall('lex/instance')
+                lemma_node.append(_gbn_node(rng, lemma_node, instances, fpm))
+                for instance in instances:
+                    share = fpm * rng.random() / max(len(instances), 1)
+                    data = {period: {'frequency': share * rng.uniform(0.5, 1.5),
+                                     'estimate': rng.random() < 0.1}
+                            for period in PERIODS}
+                    instance.set('size', '%0.3g' % rng.uniform(0.5, 200))
+                    instance.set('rawSize', '%d' % rng.randint(0, 500))
+                    table = FrequencyTable(data=data).to_xml(band=False,
+                                                            log=False)
+                    table.set('wcMethod', 'ngram')
+                    instance.append(table)
+            _write(doc.getroot(), out_subdir, int(filename[:-4]))
+    return count
+
+
+def _gbn_node(rng, lemma_node, instances, fpm):
+    gbn = etree.Element('gbn')
+    wordclasses = ['ALL'] + sorted(set([NGRAM_TAGS.get(i.get('wordclass'),
+                                                       'NOUN')
+                                        for i in instances]))
+    gram_count = len(lemma_node.findtext('form').split())
+    for wordclass in wordclasses:
+        values = ['%d:%d' % (decade, max(0, fpm * rng.uniform(5, 50) *
+                                         (decade - 1490) / 10))
+                  for decade in range(1500, 2010, 10)
+                  if rng.random() < 0.9]
+        ngram = etree.SubElement(gbn, 'ngram', wordclass=wordclass,
+                                 n=str(gram_count))
+        ngram.text = ' '.join(values)
+    return gbn
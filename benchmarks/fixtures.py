@@ -0,0 +1,301 @@
+"""
+fixtures - Fixed inputs for the microbenchmarks
+
+Each function returns a list of argument tuples for one of the functions
+benchmarked by benchmarks.micro, made up from the same vocabulary as the
+synthetic corpus (see benchmarks.corpus); the same size and seed always
+produce the same fixtures.
+
+install_resources() fills the class-level tables behind the frequency
+resources (the frequency-prediction models, the weighted-size index, and
+the BNC/OEC probability tables) with made-up data, since the real ones
+are built from sources the benchmarks don't have.
+"""
+
+import math
+import random
+
+from lxml import etree
+
+from benchmarks import corpus
+
+DECADES = list(range(1750, 2010, 10))
+PHRASES = ('take the biscuit', 'man of straw', 'a bit of', 'in a word',
+           'eat one\'s heart out', 'salt and pepper', 'etc.', 'if and when',
+           'bring to bear', 'an arm and a leg', 'his nibs', 'man in the moon')
+
+
+def _rng(name, seed):
+    return random.Random('%s-%s' % (name, seed))
+
+
+def _words(rng, size):
+    return [lemma for lemma, _ in corpus._vocabulary(rng, size)]
+
+
+def compound_pairs(size, seed=0):
+    """
+    (lemma, referent_lemma) for split_closed_compound(): mostly closed
+    compounds of the referent, some with doubled consonants at the
+    join, and some which don't match at all.
+    """
+    rng = _rng('compound', seed)
+    words = [w for w in _words(rng, size) if ' ' not in w and '-' not in w]
+    pairs = []
+    while len(pairs) < size:
+        word = rng.choice(words)
+        roll = rng.random()
+        if roll < 0.6 and len(word) >= 3:
+            pairs.append((word + rng.choice(words).lower(), word))
+        elif roll < 0.75:
+            # e.g. run + ning
+            pairs.append((word + word[-1] + rng.choice(('ing', 'ed', 'er',
+                                                        'ess')), word))
+        elif roll < 0.8:
+            pairs.append((word, word + '-'))
+        else:
+            pairs.append((word, rng.choice(words)))
+    return pairs
+
+
+def ligature_lemmas(size, seed=0):
+    """
+    (lemma,) for unswung(): about a third contain ligatures or a
+    swung dash.
+    """
+    rng = _rng('ligature', seed)
+    lemmas = []
+    for word in _words(rng, size)[:size]:
+        if rng.random() < 0.33:
+            position = rng.randint(0, len(word))
+            word = (word[:position] +
+                    rng.choice(('æ', '\u009c', 'Æ', '~')) +
+                    word[position:])
+        lemmas.append((word,))
+    return lemmas
+
+
+def variant_dates(size, seed=0):
+    """
+    (variant_date, block_date) for _variant_date_node().
+    """
+    from lex.oed.daterange import DateRange
+    rng = _rng('dates', seed)
+    pairs = []
+    for _ in range(size):
+        block_start = rng.randint(1150, 1900)
+        obsolete = rng.random() < 0.2
+        block_end = rng.randint(block_start, 1950) if obsolete else 2050
+        variant_start = rng.randint(block_start - 50, block_end)
+        variant_end = rng.randint(variant_start, block_end + 50)
+        pairs.append((DateRange(start=variant_start, end=variant_end),
+                      DateRange(start=block_start, end=block_end,
+                                obsolete=obsolete)))
+    return pairs
+
+
+def morphsets(size, seed=0):
+    """
+    (morphset, wordclass) for _inflect_from_mmh() and
+    _compute_inflections().
+    """
+    from lex.gel.entrycomponents import MorphSet
+    rng = _rng('morphsets', seed)
+    output = []
+    for lemma, wordclasses in corpus._vocabulary(rng, size):
+        for wordclass in wordclasses:
+            if wordclass not in ('NN', 'VB', 'JJ', 'RB'):
+                continue
+            start = rng.randint(1150, 1900)
+            end = rng.choice((2050, 2050, rng.randint(start, 1950)))
+            node = etree.Element('morphSet')
+            etree.SubElement(node, 'date', start=str(start), end=str(end))
+            type_node = etree.SubElement(node, 'type')
+            etree.SubElement(type_node, 'form').text = lemma
+            etree.SubElement(type_node, 'wordclass', penn=wordclass)
+            output.append((MorphSet(node), wordclass))
+    return output[:size]
+
+
+def inflectable_forms(size, seed=0):
+    """
+    (form, wordclass) for _dont_inflect(): single words, compounds and
+    phrases.
+    """
+    rng = _rng('forms', seed)
+    words = _words(rng, size)
+    output = []
+    for word in words[:size]:
+        roll = rng.random()
+        if roll < 0.15:
+            word = rng.choice(PHRASES)
+        elif roll < 0.25:
+            word = '%s of %s' % (word, rng.choice(words))
+        output.append((word, rng.choice(('NN', 'VB', 'JJ', 'RB'))))
+    return output
+
+
+def lemma_nodes(size, seed=0):
+    """
+    <lemma> nodes as found in types_with_ngrams (lemma, instances and
+    <gbn> ngram counts), from which FrequencyEntry objects are made.
+    """
+    rng = _rng('lemmas', seed)
+    nodes = []
+    oed_id = 1000
+    for lemma, wordclasses in corpus._vocabulary(rng, size):
+        oed_id += 10
+        node = etree.Element('lemma', sort=corpus._sort(lemma))
+        etree.SubElement(node, 'form').text = lemma
+        lex = etree.SubElement(node, 'lex')
+        for i, wordclass in enumerate(wordclasses):
+            start = rng.randint(1150, 1900)
+            instance = etree.SubElement(
+                lex, 'instance',
+                wordclassId=str(oed_id * 100 + i),
+                typeId=str(oed_id * 100 + i + 50),
+                wordclass=wordclass,
+                start=str(start),
+                end=str(rng.choice((2050, 2050, rng.randint(start, 1950)))),
+                base=lemma,
+            )
+            if rng.random() < 0.9:
+                instance.set('xrid', str(oed_id + i))
+                instance.set('xnode', str((oed_id + i) * 10))
+            if rng.random() < 0.1:
+                instance.set('variant', 'true')
+        fpm = 2000.0 / (rng.paretovariate(0.9) * 100)
+        node.append(corpus._gbn_node(rng, node, lex.findall('instance'),
+                                     fpm))
+        nodes.append(node)
+    return nodes[:size]
+
+
+def frequency_entries(size, seed=0):
+    from frequency.frequencyentry import FrequencyEntry
+    return [FrequencyEntry(node) for node in lemma_nodes(size, seed)]
+
+
+def wordclass_ratio_args(size, seed=0):
+    """
+    (form, lex_items, ngram, tagged_ngrams) for WordclassRatios(); only
+    entries with an ngram are included, as in _apportion_scores().
+    """
+    return [(entry.form, entry.lex_items, entry.ngram, entry.tagged_ngrams)
+            for entry in frequency_entries(size, seed) if entry.ngram]
+
+
+def homograph_sets(size, seed=0):
+    """
+    (homographs, frequency, year) for HomographScorer.estimate(); the
+    lex items are new each time, so predictions aren't already cached.
+    """
+    rng = _rng('homographs', seed)
+    output = []
+    for entry in frequency_entries(size, seed):
+        output.append((entry.lex_items, rng.uniform(0, 500),
+                       rng.choice(DECADES)))
+    return output
+
+
+def scored_lex_items(size, seed=0):
+    """
+    (lex_item,) for _compute_average_frequencies(), with a score for
+    each decade.
+    """
+    rng = _rng('scores', seed)
+    output = []
+    for entry in frequency_entries(size, seed):
+        for lex_item in entry.lex_items:
+            for decade in DECADES:
+                lex_item.scores[decade] = rng.uniform(0, 100)
+                lex_item.est[decade] = rng.random() < 0.1
+            output.append((lex_item,))
+    return output[:size]
+
+
+def prediction_args(size, seed=0):
+    """
+    (wordclass, size) for FrequencyPredictor.predict().
+    """
+    rng = _rng('predictions', seed)
+    return [(rng.choice(('NN', 'NN', 'NP', 'JJ', 'VB', 'RB', 'UH', 'MD')),
+             math.exp(rng.uniform(-2, 7))) for _ in range(size)]
+
+
+def size_lookups(size, seed=0):
+    """
+    (id, eid, type, date) for WeightedSize.find_size(); includes IDs
+    which aren't in the index.
+    """
+    rng = _rng('sizes', seed)
+    output = []
+    for node in lemma_nodes(size, seed):
+        for instance in node.findall('lex/instance'):
+            if instance.get('xrid'):
+                output.append((instance.get('xrid'), instance.get('xnode'),
+                               rng.choice(('weighted', 'weighted', 'actual')),
+                               rng.choice(DECADES)))
+        if rng.random() < 0.1:
+            output.append(('99', '990', 'weighted', 2000))
+    return output[:size]
+
+
+def raw_ngram_args(size, seed=0):
+    """
+    (node, wordform, sortcode) for _parse_raw_ngrams().
+    """
+    return [(node, node.findtext('form'), node.get('sort'))
+            for node in lemma_nodes(size, seed)]
+
+
+def install_resources(size, seed=0):
+    """
+    Fill the frequency resources with made-up data covering the
+    fixtures of the given size and seed.
+    """
+    from frequency.frequencypredictor import FrequencyPredictor, DataSeries
+    from frequency.oedsize.oedentrysize import WeightedSize, EntryData, DATES
+    from frequency.wordclass.corpusprobability import (BncPosProbability,
+                                                       OecPosProbability,
+                                                       PosProbabilitySet)
+    rng = _rng('resources', seed)
+
+    # Size-to-frequency curves, rising steeply then levelling off
+    xp = [0.1 * 1.1 ** i for i in range(120)]
+    for category, factor in (('NN', 1.0), ('JJ', 0.8), ('VB', 1.5),
+                             ('RB', 0.6), ('FUNCWD', 20.0), ('MISC', 0.5)):
+        yp = [factor * 50 * math.log1p(x) for x in xp]
+        FrequencyPredictor.models[category] = DataSeries(xp, yp)
+
+    index = {}
+    for node in lemma_nodes(size, seed):
+        form = node.findtext('form')
+        instances = node.findall('lex/instance')
+        for instance in instances:
+            if not instance.get('xrid'):
+                continue
+            entry_id = int(instance.get('xrid'))
+            node_id = int(instance.get('xnode'))
+            base = rng.uniform(0.5, 200)
+            sizes = [(d, round(base * (0.5 + (d - 1600) / 800.0), 2))
+                     for d in DATES]
+            data = EntryData(entry_id, node_id, instance.get('wordclass'),
+                             rng.randint(0, 500), sizes,
+                             int(instance.get('start')), rng.random() < 0.5,
+                             False)
+            index.setdefault(entry_id, {})[node_id] = data
+
+        # BNC/OEC figures for about half the forms
+        if rng.random() < 0.5:
+            shares = [(i.get('wordclass'), rng.randint(1, 100))
+                      for i in instances]
+            total = sum([share for _, share in shares])
+            line = '\t'.join([form, '%0.2f' % rng.uniform(0.1, 500)] +
+                             ['%s=%0.1f' % (wordclass, share * 100 / total)
+                              for wordclass, share in shares])
+            BncPosProbability.words[form] = PosProbabilitySet(line)
+            if rng.random() < 0.5:
+                OecPosProbability.words[form] = PosProbabilitySet(line)
+    for entry_id, nodes in index.items():
+        WeightedSize.index[entry_id] = nodes
@@ -0,0 +1,234 @@
+"""
+gate - Fail if a benchmark run is slower, or uses more memory, than the
+baseline
+
+    python -m benchmarks.gate RESULTS --baseline BASELINE
+    python -m benchmarks.gate RESULTS --save-baseline BASELINE
+
+RESULTS is the output of benchmarks.run (stage benchmarks) or
+benchmarks.micro (microbenchmarks). Each figure is compared with the
+same figure in the baseline (a results file saved earlier from the same
+machine):
+
+ - stages, at each scale: wall time, CPU time and peak RSS;
+ - microbenchmarks: time per call and peak memory allocated per call.
+
+Timings are noisy, so figures are compared as medians over repeats
+(benchmarks.run --repeat, benchmarks.micro --repeat), and a figure only
+counts as a regression if it has grown by more than the allowed
+tolerance (a fraction of the baseline), more than IQR_FACTOR times the
+interquartile range of the samples on either side, and more than a
+small absolute amount (MINIMUM_CHANGE), so that tiny figures aren't
+flagged for jitter.
+
+The exit status is 1 if any figure has regressed, and the report lists
+every figure compared, along with any difference in the Python version,
+platform, gelconfig or lex fingerprints between the two runs (changes
+to gelconfig or lex being a likely cause of a sudden slow-down).
+"""
+
+import sys
+import json
+import shutil
+import argparse
+import statistics
+
+TIME_TOLERANCE = 0.10
+MEMORY_TOLERANCE = 0.10
+IQR_FACTOR = 2
+# Changes smaller than this are never counted as regressions
+MINIMUM_CHANGE = {
+    'seconds': 0.05,
+    'MB': 5,
+    'microseconds': 0.05,
+    'bytes': 64,
+    'blocks': 2,
+}
+# Properties of the runs which, if they differ, are reported
+CONTEXT = ('python', 'platform', 'processor', 'cpu_count', 'seed', 'size',
+           'fused', 'intermediate_format')
+
+
+class Figure(object):
+
+    """
+    One figure from a results file, with its samples; lower is better.
+    """
+
+    def __init__(self, name, kind, unit, samples):
+        self.name = name
+        self.kind = kind
+        self.unit = unit
+        self.samples = [value for value in samples if value is not None]
+
+    @property
+    def median(self):
+        return statistics.median(self.samples)
+
+    @property
+    def iqr(self):
+        if len(self.samples) < 2:
+            return 0
+        # (inclusive, so that with only a few samples the quartiles
+        #  aren't extrapolated beyond them)
+        quartiles = statistics.quantiles(self.samples, n=4,
+                                         method='inclusive')
+        return quartiles[2] - quartiles[0]
+
+
+def figures(results):
+    """
+    Return name -> Figure for every figure in a results file.
+    """
+    output = {}
+    if 'benchmarks' in results:
+        for name, values in results['benchmarks'].items():
+            # Calls/sec become microseconds per call, so that lower is
+            #  better for every figure
+            samples = values.get('samples') or [values['ops_per_sec']]
+            _add(output, Figure('%s: time/call' % name, 'time',
+                                'microseconds',
+                                [1e6 / s for s in samples if s]))
+            _add(output, Figure('%s: peak memory/call' % name, 'memory',
+                                'bytes', [values.get('peak_bytes_per_call')]))
+            _add(output, Figure('%s: allocations/call' % name, 'memory',
+                                'blocks',
+                                [values.get('allocations_per_call')]))
+    for run in results.get('runs', []):
+        for stage in run['stages']:
+            if stage.get('status', 'completed') != 'completed':
+                continue
+            prefix = 'scale %s: %s' % (run['scale'], stage['stage'])
+            for figure, kind, unit in (('wall_time', 'time', 'seconds'),
+                                       ('cpu_time', 'time', 'seconds'),
+                                       ('peak_rss_mb', 'memory', 'MB')):
+                samples = (stage.get(figure + '_samples') or
+                           [stage.get(figure)])
+                _add(output, Figure('%s: %s' % (prefix, figure), kind, unit,
+                                    samples))
+    return output
+
+
+def _add(output, figure):
+    if figure.samples:
+        output[figure.name] = figure
+
+
+def compare(baseline, current, time_tolerance=TIME_TOLERANCE,
+            memory_tolerance=MEMORY_TOLERANCE, iqr_factor=IQR_FACTOR):
+    """
+    Compare the figures in two results files; return a list of
+    (name, baseline median, current median, unit, verdict), where the
+    verdict is 'regression', 'improvement', 'ok', 'new' or 'missing'.
+    """
+    baseline_figures = figures(baseline)
+    current_figures = figures(current)
+    rows = []
+    for name in sorted(set(baseline_figures) | set(current_figures)):
+        old = baseline_figures.get(name)
+        new = current_figures.get(name)
+        if old is None:
+            rows.append((name, None, new.median, new.unit, 'new'))
+            continue
+        if new is None:
+            rows.append((name, old.median, None, old.unit, 'missing'))
+            continue
+        tolerance = time_tolerance if old.kind == 'time' else memory_tolerance
+        allowance = max(old.median * tolerance,
+                        iqr_factor * max(old.iqr, new.iqr),
+                        MINIMUM_CHANGE[old.unit])
+        if new.median > old.median + allowance:
+            verdict = 'regression'
+        elif new.median < old.median - allowance:
+            verdict = 'improvement'
+        else:
+            verdict = 'ok'
+        rows.append((name, old.median, new.median, old.unit, verdict))
+    return rows
+
+
+def context_changes(baseline, current):
+    """
+    Return a list of (property, baseline value, current value) for each
+    property of the two runs (Python version, gelconfig fingerprint,
+    etc.) which differs.
+    """
+    changes = []
+    for key in CONTEXT:
+        if baseline.get(key) != current.get(key):
+            changes.append((key, baseline.get(key), current.get(key)))
+    old_code = baseline.get('code') or {}
+    new_code = current.get('code') or {}
+    for key in sorted(set(old_code) | set(new_code)):
+        if old_code.get(key) != new_code.get(key):
+            changes.append((key, old_code.get(key), new_code.get(key)))
+    return changes
+
+
+def print_report(rows, changes):
+    if changes:
+        print('Differences from the baseline run:')
+        for key, old, new in changes:
+            print('  %-12s %s -> %s' % (key, old, new))
+        print()
+    width = max([len(row[0]) for row in rows] + [10])
+    for name, old, new, unit, verdict in rows:
+        if old and new is not None:
+            change = '%+6.1f%%' % ((new - old) * 100 / old)
+        else:
+            change = ''
+        print('%s %-*s %12s %12s %-12s %s' %
+              ('!!' if verdict == 'regression' else '  ', width, name,
+               _format(old), _format(new), unit, change or verdict))
+    regressions = [row for row in rows if row[4] == 'regression']
+    print()
+    if regressions:
+        print('%d regression(s):' % len(regressions))
+        for name, old, new, unit, _ in regressions:
+            print('  %s: %s -> %s %s' % (name, _format(old), _format(new),
+                                         unit))
+    else:
+        print('No regressions (%d figures compared)' % len(rows))
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return '%0.3f' % value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare benchmark results '
+                                     'with a stored baseline')
+    parser.add_argument('results',
+                        help='output of benchmarks.run or benchmarks.micro')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--baseline', help='baseline results to compare with')
+    group.add_argument('--save-baseline', metavar='BASELINE',
+                       help='store the results as the baseline')
+    parser.add_argument('--time-tolerance', type=float,
+                        default=TIME_TOLERANCE,
+                        help='allowed slow-down, as a fraction of the '
+                        'baseline (default: %(default)s)')
+    parser.add_argument('--memory-tolerance', type=float,
+                        default=MEMORY_TOLERANCE,
+                        help='allowed growth in memory use, as a fraction '
+                        'of the baseline (default: %(default)s)')
+    parser.add_argument('--iqr-factor', type=float, default=IQR_FACTOR,
+                        help='changes within this many interquartile ranges '
+                        'are treated as noise (default: %(default)s)')
+    args = parser.parse_args()
+    if args.save_baseline:
+        shutil.copyfile(args.results, args.save_baseline)
+        print('Baseline saved to %s' % args.save_baseline)
+        sys.exit(0)
+    with open(args.baseline) as filehandle:
+        baseline_results = json.load(filehandle)
+    with open(args.results) as filehandle:
+        current_results = json.load(filehandle)
+    rows = compare(baseline_results, current_results,
+                   time_tolerance=args.time_tolerance,
+                   memory_tolerance=args.memory_tolerance,
+                   iqr_factor=args.iqr_factor)
+    print_report(rows, context_changes(baseline_results, current_results))
+    sys.exit(1 if any([row[4] == 'regression' for row in rows]) else 0)
@@ -0,0 +1,118 @@
+"""
+harness - Run the benchmarked stages over a synthetic corpus
+
+Run by benchmarks.run in a fresh process for each scale, with the lex
+stand-ins on the path and GEL_BENCHMARK_DIR pointing at a scratch
+directory (so that gelconfig puts the whole build there):
+
+    GEL_BENCHMARK_DIR=/tmp/x PYTHONPATH=benchmarks/standins:. \\
+        python -m benchmarks.harness --scale 1 --output /tmp/x/result.json
+
+Each stage is run through pipeline.run_stage(), so its figures come from
+the ordinary run report (see buildmanager.runreport).
+"""
+
+import os
+import json
+import time
+import argparse
+
+import gelconfig
+
+# Stages which can run on the synthetic corpus, in pipeline order.
+#  generateBase needs the OED source, and the frequency-scoring stages
+#  need the GBN tables and corpus/regression data, so the corpus starts
+#  at 01_base, and types_with_frequency is generated.
+STAGES = ('mergeEntryPairs', 'addInflections', 'cleanAttributes',
+          'frequencyListLemmas', 'insertFrequency', 'alphabetizeOutput',
+          'indexOutput')
+# Alternative to mergeEntryPairs + addInflections + cleanAttributes
+FUSED_STAGES = ('processBaseChain', 'frequencyListLemmas', 'insertFrequency',
+                'alphabetizeOutput', 'indexOutput')
+
+
+def run(scale, seed=0, stages=STAGES, file_workers=1,
+        intermediate_format='xml'):
+    """
+    Generate the corpus at the given scale, run each stage over it, and
+    return the results.
+    """
+    # Every stage must actually run, and build nothing but the corpus
+    gelconfig.BUILD_CACHE = False
+    gelconfig.INCREMENTAL_FILES = False
+    gelconfig.RESOURCE_DAEMON = False
+    gelconfig.SNAPSHOTS = False
+    gelconfig.PIPELINE_WORKERS = 1
+    gelconfig.FILE_WORKERS = file_workers
+
+    import pipeline
+    from buildmanager import runreport
+    from benchmarks import corpus, run as benchmark_run
+
+    # 04_inflected_ext is where addOdoAdditions would put its ODE/NOAD
+    #  files (there are none here); processBaseChain looks for them
+    for directory in (gelconfig.BUILD_DIR, gelconfig.FINAL_DATA_DIR,
+                      os.path.join(gelconfig.FINAL_ANCILLARY_DIR, 'index'),
+                      os.path.join(gelconfig.FREQUENCY_BUILD_DIR, 'types'),
+                      os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext')):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    start = time.time()
+    entries = corpus.generate_base(os.path.join(gelconfig.BUILD_DIR, '01_base'),
+                                   scale=scale, seed=seed)
+    setup_time = time.time() - start
+
+    run_id = runreport.new_run_id()
+    options = {'resume': False, 'subset': None, 'memory_budget_mb': None,
+               'profile': None, 'memory_diagnostics': False,
+               'lookup_stats': False,
+               'intermediate_format': intermediate_format}
+    for stage_name in stages:
+        if stage_name == 'insertFrequency':
+            start = time.time()
+            corpus.add_frequency_data(
+                os.path.join(gelconfig.FREQUENCY_BUILD_DIR, 'types'),
+                os.path.join(gelconfig.FREQUENCY_BUILD_DIR,
+                             'types_with_frequency'),
+                seed=seed)
+            setup_time += time.time() - start
+        pipeline.run_stage(stage_name, run_id=run_id, options=options)
+    report = runreport.compile_report(run_id, list(stages))
+
+    return {
+        'scale': scale,
+        'seed': seed,
+        'entries': entries,
+        'file_workers': file_workers,
+        'intermediate_format': intermediate_format,
+        'setup_time': round(setup_time, 3),
+        'code': benchmark_run.describe_code(),
+        'stages': [_stage_result(stage) for stage in report['stages']],
+    }
+
+
+def _stage_result(stage):
+    keys = ('stage', 'status', 'wall_time', 'cpu_time', 'peak_rss_mb',
+            'worker_peak_rss_mb', 'workers_peak_rss_total_mb', 'files',
+            'entries', 'entries_per_sec', 'io')
+    return {key: stage[key] for key in keys if key in stage}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the benchmarked '
+                                     'stages over a synthetic corpus')
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fused', action='store_true',
+                        help='run the fused base chain (processBaseChain)')
+    parser.add_argument('--file-workers', type=int, default=1)
+    parser.add_argument('--intermediate-format', default='xml')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+    result = run(args.scale, seed=args.seed,
+                 stages=FUSED_STAGES if args.fused else STAGES,
+                 file_workers=args.file_workers,
+                 intermediate_format=args.intermediate_format)
+    with open(args.output, 'w') as filehandle:
+        json.dump(result, filehandle, indent=2)
@@ -0,0 +1,268 @@
+"""
+micro - Microbenchmarks for the functions called once per entry or type
+
+    python -m benchmarks.micro --output micro.json [--only NAME ...]
+        [--size 2000] [--repeat 7]
+
+Each benchmark calls one function over a fixed list of inputs (see
+benchmarks.fixtures), several times over. Before each repeat the inputs
+are made afresh (untimed), so nothing is carried over from the repeat
+before except what the function itself keeps in a module-level cache;
+a warm-up pass first makes sure resources are loaded and such caches
+are in the same state for every repeat. For each benchmark the results
+give calls per second for each repeat ('samples'), their median, and,
+from separate passes with tracemalloc running:
+
+ - the mean peak memory allocated during a single call, and the memory
+    still held at the end of the pass, per call (in bytes);
+ - the mean number of memory blocks allocated by a single call, and the
+    number still held at the end of the pass, per call. These are
+    counted from the difference between tracemalloc snapshots taken
+    before and after each call (and the whole pass), so they include
+    whatever the call returns, but not temporary blocks which the call
+    frees again before it returns.
+
+Like the stage benchmarks, these run in a fresh process with the lex
+stand-ins on the path (see benchmarks.run).
+"""
+
+import os
+import gc
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks import run as benchmark_run
+
+NAMES = (
+    'split_closed_compound',
+    'unswung',
+    '_variant_date_node',
+    '_inflect_from_mmh',
+    '_compute_inflections',
+    '_dont_inflect',
+    'HomographScorer.estimate',
+    'WordclassRatios',
+    '_compute_average_frequencies',
+    'FrequencyPredictor.predict',
+    'WeightedSize.find_size',
+    '_parse_raw_ngrams',
+)
+
+
+def _benchmarks():
+    """
+    Return name -> (function, fixture function) for each benchmark.
+    """
+    from benchmarks import fixtures
+    from buildmanager import registry
+    from processors import generatebase, addinflections
+    from frequency import calculate_frequency, frequencyentry
+    from frequency.homographscorer import HomographScorer
+    from frequency.wordclass.wordclassratios import WordclassRatios
+
+    predictor = registry.get('frequency_predictor')
+    weighted_size = registry.get('weighted_size')
+
+    def estimate(homographs, frequency, year):
+        HomographScorer(homographs=homographs, frequency=frequency,
+                        year=year).estimate()
+
+    def wordclass_ratios(form, lex_items, ngram, tagged_ngrams):
+        WordclassRatios(form=form, lex_items=lex_items, ngram=ngram,
+                        tagged_ngrams=tagged_ngrams)
+
+    def predict(wordclass, size):
+        return predictor.predict(wordclass=wordclass, size=size)
+
+    def find_size(entry_id, node_id, mode, date):
+        return weighted_size.find_size(id=entry_id, eid=node_id, type=mode,
+                                       date=date)
+
+    return {
+        'split_closed_compound': (generatebase.split_closed_compound,
+                                  fixtures.compound_pairs),
+        'unswung': (generatebase.unswung, fixtures.ligature_lemmas),
+        '_variant_date_node': (generatebase._variant_date_node,
+                               fixtures.variant_dates),
+        '_inflect_from_mmh': (addinflections._inflect_from_mmh,
+                              fixtures.morphsets),
+        '_compute_inflections': (addinflections._compute_inflections,
+                                 fixtures.morphsets),
+        '_dont_inflect': (addinflections._dont_inflect,
+                          fixtures.inflectable_forms),
+        'HomographScorer.estimate': (estimate, fixtures.homograph_sets),
+        'WordclassRatios': (wordclass_ratios, fixtures.wordclass_ratio_args),
+        '_compute_average_frequencies': (
+            calculate_frequency._compute_average_frequencies,
+            fixtures.scored_lex_items),
+        'FrequencyPredictor.predict': (predict, fixtures.prediction_args),
+        'WeightedSize.find_size': (find_size, fixtures.size_lookups),
+        '_parse_raw_ngrams': (frequencyentry._parse_raw_ngrams,
+                              fixtures.raw_ngram_args),
+    }
+
+
+def measure(function, make_fixtures, repeat=7):
+    """
+    Time function(*args) for each args in make_fixtures(), `repeat`
+    times over; return calls/sec for each repeat and the memory and
+    allocation figures.
+    """
+    _timed_pass(function, make_fixtures())
+    samples = []
+    calls = 0
+    for _ in range(repeat):
+        fixtures = make_fixtures()
+        calls = len(fixtures)
+        samples.append(calls / max(_timed_pass(function, fixtures), 1e-9))
+    peak, retained = _traced_pass(function, make_fixtures())
+    allocations, retained_blocks = _allocation_pass(function, make_fixtures())
+    return {
+        'calls': calls,
+        'ops_per_sec': round(statistics.median(samples), 1),
+        'best_ops_per_sec': round(max(samples), 1),
+        'samples': [round(s, 1) for s in samples],
+        'peak_bytes_per_call': round(peak, 1),
+        'retained_bytes_per_call': round(retained, 1),
+        'allocations_per_call': round(allocations, 1),
+        'retained_blocks_per_call': round(retained_blocks, 1),
+    }
+
+
+def _timed_pass(function, fixtures):
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for args in fixtures:
+            function(*args)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def _traced_pass(function, fixtures):
+    """
+    Return the mean peak memory allocated during each call, and the
+    memory still held after all the calls, per call.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        peaks = 0
+        for args in fixtures:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function(*args)
+            peaks += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return peaks / max(len(fixtures), 1), retained / max(len(fixtures), 1)
+
+
+def _allocation_pass(function, fixtures):
+    """
+    Return the mean number of blocks allocated by each call (and still
+    held when it returns, including its result), and the number of
+    blocks still held after all the calls, per call.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = _snapshot()
+        allocations = 0
+        for args in fixtures:
+            before = _snapshot()
+            result = function(*args)
+            allocations += _new_blocks(_snapshot(), before)
+            del result
+        retained = _new_blocks(_snapshot(), start)
+    finally:
+        tracemalloc.stop()
+    return (allocations / max(len(fixtures), 1),
+            retained / max(len(fixtures), 1))
+
+
+def _snapshot():
+    # Leaving out the blocks held by earlier snapshots
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),))
+
+
+def _new_blocks(after, before):
+    return sum([max(stat.count_diff, 0)
+                for stat in after.compare_to(before, 'lineno')])
+
+
+def run_in_process(names, size, seed, repeat):
+    from benchmarks import fixtures
+    fixtures.install_resources(size, seed)
+    benchmarks = _benchmarks()
+    results = benchmark_run.describe_machine()
+    results.update({'size': size, 'seed': seed, 'repeat': repeat,
+                    'code': benchmark_run.describe_code(),
+                    'benchmarks': {}})
+    for name in names:
+        function, fixture_function = benchmarks[name]
+        figures = measure(function,
+                          lambda: fixture_function(size, seed),
+                          repeat=repeat)
+        results['benchmarks'][name] = figures
+        print('%-30s %12.1f ops/sec %10.1f bytes/call (peak) '
+              '%8.1f allocations/call' %
+              (name, figures['ops_per_sec'], figures['peak_bytes_per_call'],
+               figures['allocations_per_call']))
+    return results
+
+
+def run(names, size, seed, repeat, output):
+    """
+    Run the benchmarks in a fresh process, with the lex stand-ins on the
+    path; the results are written to output.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix='gel_micro_')
+    command = [sys.executable, '-m', 'benchmarks.micro', '--in-process',
+               '--size', str(size), '--seed', str(seed),
+               '--repeat', str(repeat),
+               '--output', os.path.abspath(output),
+               '--only'] + list(names)
+    try:
+        subprocess.check_call(command, cwd=benchmark_run.REPO_DIR,
+                              env=benchmark_run.child_environment(scratch_dir))
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run microbenchmarks for '
+                                     'the per-entry and per-type functions')
+    parser.add_argument('--only', nargs='+', choices=NAMES, default=NAMES,
+                        metavar='NAME', help='benchmarks to run (default: '
+                        'all): %s' % ', '.join(NAMES))
+    parser.add_argument('--size', type=int, default=2000,
+                        help='number of fixtures for each benchmark')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for generating the fixtures')
+    parser.add_argument('--repeat', type=int, default=7,
+                        help='number of timed passes over the fixtures')
+    parser.add_argument('--output', required=True,
+                        help='file to write the results to (JSON)')
+    parser.add_argument('--in-process', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.in_process:
+        results = run_in_process(args.only, args.size, args.seed, args.repeat)
+        with open(args.output, 'w') as filehandle:
+            json.dump(results, filehandle, indent=2)
+    else:
+        run(args.only, args.size, args.seed, args.repeat, args.output)
+        print('Results written to %s' % args.output)
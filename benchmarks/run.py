@@ -0,0 +1,185 @@
+"""
+run - Run the benchmark suite at one or more corpus scales
+
+    python -m benchmarks.run --scales 1 5 20 --repeat 5 --output results.json
+
+For each scale, a synthetic corpus (benchmarks.corpus) is generated in
+a scratch directory, and the benchmarked stages are run over it in a
+fresh process (benchmarks.harness), with the lex stand-ins in place of
+the real lex package. Wall time, CPU time, peak RSS, throughput and I/O
+figures for each stage are written to the output file, together with
+the Python version and platform, so that results from different
+machines or commits can be compared. With --repeat, each scale is run
+several times; the figures given for each stage are then the medians,
+and the figures from each repeat are kept as samples (see
+benchmarks.gate).
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+STANDINS_DIR = os.path.join(BENCHMARK_DIR, 'standins')
+
+
+# Figures for each stage which are given as medians over the repeats
+SAMPLED = ('wall_time', 'cpu_time', 'peak_rss_mb', 'entries_per_sec')
+
+
+def run(scales, seed=0, fused=False, file_workers=1, keep=False, repeat=1,
+        intermediate_format='xml'):
+    results = describe_machine()
+    results.update({
+        'seed': seed,
+        'fused': fused,
+        'intermediate_format': intermediate_format,
+        'repeat': repeat,
+        'runs': [],
+    })
+    for scale in scales:
+        print('Scale %s...' % (scale,))
+        repeats = [_run_scale(scale, seed, fused, file_workers, keep,
+                              intermediate_format)
+                   for _ in range(repeat)]
+        results['runs'].append(_summarize(repeats))
+        # Fingerprints of the code the stages were run with
+        results['code'] = results['runs'][-1].pop('code', None)
+        for stage in results['runs'][-1]['stages']:
+            print('\t%-22s %8.2fs %10s entries/sec' %
+                  (stage['stage'], stage.get('wall_time', 0),
+                   stage.get('entries_per_sec')))
+    return results
+
+
+def describe_machine():
+    """
+    Return the Python version, platform, etc., to be recorded with a set
+    of results.
+    """
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def describe_code():
+    """
+    Return fingerprints of gelconfig and of the lex package in use (in a
+    benchmark process, the stand-ins), so that a change in either can be
+    seen when comparing results.
+    """
+    import gelconfig
+    import lex
+    from buildmanager import fingerprint
+    hashes = fingerprint.HashCache(os.devnull)
+    return {
+        'gelconfig': hashes.path_hash(gelconfig.__file__),
+        'lex': hashes.path_hash(os.path.dirname(lex.__file__)),
+        'lex_path': os.path.dirname(lex.__file__),
+    }
+
+
+def _summarize(repeats):
+    """
+    Combine the results of several runs at the same scale: each figure
+    in SAMPLED becomes the median, with the values from each run kept
+    in <figure>_samples.
+    """
+    summary = repeats[0]
+    for i, stage in enumerate(summary['stages']):
+        for figure in SAMPLED:
+            samples = [run['stages'][i].get(figure) for run in repeats]
+            samples = [value for value in samples if value is not None]
+            if samples:
+                stage[figure] = round(statistics.median(samples), 3)
+                stage[figure + '_samples'] = samples
+    return summary
+
+
+def child_environment(scratch_dir):
+    """
+    Return the environment for a benchmark process: the lex stand-ins
+    ahead of anything else on the path, and the build in scratch_dir.
+    """
+    environment = dict(os.environ)
+    environment['GEL_BENCHMARK_DIR'] = scratch_dir
+    environment['PYTHONPATH'] = os.pathsep.join(
+        [STANDINS_DIR, REPO_DIR] +
+        [p for p in [os.environ.get('PYTHONPATH')] if p])
+    return environment
+
+
+def _run_scale(scale, seed, fused, file_workers, keep, intermediate_format):
+    scratch_dir = tempfile.mkdtemp(prefix='gel_benchmark_')
+    result_file = os.path.join(scratch_dir, 'result.json')
+    environment = child_environment(scratch_dir)
+    command = [sys.executable, '-m', 'benchmarks.harness',
+               '--scale', str(scale), '--seed', str(seed),
+               '--file-workers', str(file_workers),
+               '--intermediate-format', intermediate_format,
+               '--output', result_file]
+    if fused:
+        command.append('--fused')
+    try:
+        # The stages' own progress output goes to a log, not the console
+        with open(os.path.join(scratch_dir, 'benchmark.log'), 'w') as log:
+            subprocess.check_call(command, cwd=REPO_DIR, env=environment,
+                                  stdout=log, stderr=subprocess.STDOUT)
+        with open(result_file) as filehandle:
+            return json.load(filehandle)
+    except subprocess.CalledProcessError:
+        keep = True
+        print('Benchmark failed; see %s' %
+              os.path.join(scratch_dir, 'benchmark.log'))
+        raise
+    finally:
+        if keep:
+            print('\tBuild kept in %s' % scratch_dir)
+        else:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the GEL benchmark '
+                                     'suite on a synthetic corpus')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1],
+                        help='corpus sizes to run, in units of 2000 '
+                        'entries (see benchmarks.corpus)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for generating the corpus')
+    parser.add_argument('--fused', action='store_true',
+                        help='run the fused base chain (processBaseChain) '
+                        'in place of its three stages')
+    parser.add_argument('--file-workers', type=int, default=1,
+                        help='worker processes for sharded stages')
+    parser.add_argument('--intermediate-format', choices=('xml', 'packed'),
+                        default='xml',
+                        help='format for the intermediate build files (see '
+                        'buildmanager.packedxml)')
+    parser.add_argument('--output', required=True,
+                        help='file to write the results to (JSON)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='run each scale this many times, giving the '
+                        'median figures')
+    parser.add_argument('--keep', action='store_true',
+                        help="keep each scale's build directory")
+    args = parser.parse_args()
+    results = run(args.scales, seed=args.seed, fused=args.fused,
+                  file_workers=args.file_workers, keep=args.keep,
+                  repeat=args.repeat,
+                  intermediate_format=args.intermediate_format)
+    with open(args.output, 'w') as filehandle:
+        json.dump(results, filehandle, indent=2)
+    print('Results written to %s' % args.output)
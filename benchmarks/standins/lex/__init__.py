@@ -0,0 +1,6 @@
+"""
+Stand-ins for the parts of the lex library used by the benchmarked
+stages and functions (see benchmarks/__init__.py). These only need to be realistic
+enough to exercise the GEL build code; they are not a replacement for
+lex itself.
+"""
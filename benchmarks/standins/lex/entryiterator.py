@@ -0,0 +1,17 @@
+"""
+EntryIterator - Stand-in
+
+Iterates over the OED source, which isn't available to the benchmarks;
+present only so that modules which import it (generatebase, oedentrysize)
+can be imported.
+"""
+
+
+class EntryIterator(object):
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def iterate(self):
+        raise NotImplementedError('The OED source is not available '
+                                  'to the benchmarks')
@@ -0,0 +1,65 @@
+"""
+FrequencyTable - Stand-in
+"""
+
+import math
+
+from lxml import etree
+
+
+class FrequencyTable(object):
+
+    """
+    Frequency (per million words) for each period. Built either from a
+    dict of period -> {'fpm' or 'frequency': value, ...}, or from a
+    <frequency> node.
+    """
+
+    def __init__(self, data=None, node=None):
+        self.data = {}
+        if node is not None:
+            for period_node in node.findall('frq'):
+                self.data[period_node.get('period')] = {
+                    'fpm': float(period_node.get('fpm')),
+                    'estimate': period_node.get('estimate') == 'true'}
+        elif data:
+            for period, values in data.items():
+                fpm = values.get('fpm', values.get('frequency', 0))
+                self.data[period] = {'fpm': float(fpm),
+                                     'estimate': bool(values.get('estimate'))}
+
+    def frequency(self, period='modern'):
+        try:
+            return self.data[period]['fpm']
+        except KeyError:
+            return float(0)
+
+    def to_xml(self, band=True, log=True):
+        node = etree.Element('frequency')
+        for period in sorted(self.data):
+            fpm = self.data[period]['fpm']
+            period_node = etree.SubElement(node, 'frq', period=period,
+                                           fpm='%0.4g' % fpm)
+            if self.data[period]['estimate']:
+                period_node.set('estimate', 'true')
+            if band:
+                period_node.set('band', str(_band(fpm)))
+            if log:
+                period_node.set('log', '%0.3g' % math.log10(fpm + 1e-6))
+        return node
+
+
+def sum_frequency_tables(tables):
+    totals = {}
+    for table in tables:
+        for period in table.data:
+            totals[period] = totals.get(period, 0) + table.frequency(period)
+    return FrequencyTable(data={period: {'fpm': value}
+                                for period, value in totals.items()})
+
+
+def _band(fpm):
+    for band, threshold in enumerate((1000, 100, 10, 1, 0.1, 0.01, 0.001)):
+        if fpm >= threshold:
+            return band + 1
+    return 8
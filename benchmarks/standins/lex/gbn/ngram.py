@@ -0,0 +1,57 @@
+"""
+Ngram - Stand-in for a row of Google Books Ngram counts
+
+A row is a tab-separated line: sortcode, wordform, wordclass, then
+one 'decade:count' value per decade.
+"""
+
+# Words in the corpus for each decade (rough figures, in millions)
+CORPUS_SIZE = {decade: max(1, (decade - 1500) ** 2 // 2000)
+               for decade in range(1500, 2010, 10)}
+PENN = {'NOUN': 'NN', 'VERB': 'VB', 'ADJ': 'JJ', 'ADV': 'RB'}
+
+
+class Ngram(object):
+
+    def __init__(self, line, gramCount=None):
+        self.line = line
+        columns = line.strip().split('\t')
+        self.lemma = columns[1]
+        self.wordclass = columns[2]
+        self.gram_count = int(gramCount or 1)
+        self.counts = {}
+        for value in columns[3:]:
+            decade, count = value.split(':')
+            self.counts[int(decade)] = float(count)
+
+    @property
+    def decades(self):
+        return list(self.counts.keys())
+
+    def penn_wordclass(self):
+        return PENN.get(self.wordclass)
+
+    def decade_count(self, decade):
+        return self.counts.get(decade, 0)
+
+    def decade_frequency(self, decade):
+        return self.counts.get(decade, 0) / CORPUS_SIZE.get(decade, 1)
+
+    def frequency(self, period=2000):
+        """
+        Frequency for a decade, or the mean over a period ('1970-2000')
+        """
+        if isinstance(period, int):
+            return self.decade_frequency(period)
+        start, end = [int(year) for year in period.split('-')]
+        decades = range(start - start % 10, end, 10)
+        return (sum([self.decade_frequency(d) for d in decades]) /
+                max(len(decades), 1))
+
+    def multiply_values(self, ratio):
+        for decade in self.counts:
+            self.counts[decade] *= ratio
+
+    def merge(self, other):
+        for decade, count in other.counts.items():
+            self.counts[decade] = self.counts.get(decade, 0) + count
@@ -0,0 +1,182 @@
+"""
+Entry components - Stand-ins for lex's wrappers round the elements of a
+GEL build file:
+
+    <e> (Entry)
+      <lemma>...</lemma>
+      <wordclassSet> (WordclassSet)
+        <wordclass penn="..."/>
+        <date start="..." end="..."/>
+        <morphSetBlock>
+          <morphSet> (MorphSet)
+            <date .../>
+            <type> (TypeUnit)
+              <form>...</form>
+              <wordclass penn="..."/>
+"""
+
+from lxml import etree
+
+from lex.lemma import Lemma
+from lex.oed.daterange import DateRange
+
+# Date granularity used by fuzz_dates() (Middle English, Early Modern
+#  English, Modern English)
+GRANULARITY = ((1500, 100), (1750, 50), (10000, 50))
+
+
+class Component(object):
+
+    def __init__(self, node):
+        self.node = node
+        self._date = None
+
+    def attribute(self, name):
+        return self.node.get(name)
+
+    def date(self):
+        if self._date is None:
+            date_node = self.node.find('date')
+            if date_node is None:
+                return None
+            self._date = DateRange.from_node(date_node)
+        return self._date
+
+    def fuzz_dates(self):
+        date = self.date()
+        if date is None:
+            return
+        date.start = _fuzz(date.start, round_up=False)
+        if date.end < 2000:
+            date.end = _fuzz(date.end, round_up=True)
+        date_node = self.node.find('date')
+        date_node.set('start', str(date.start))
+        date_node.set('end', str(date.end))
+
+    def tostring(self):
+        return etree.tostring(self.node, encoding='unicode')
+
+
+class Entry(Component):
+
+    @property
+    def lemma(self):
+        return self.node.findtext('lemma')
+
+    @property
+    def sort(self):
+        return Lemma(self.lemma).lexical_sort()
+
+    def lemmas(self):
+        return [Lemma(n.text) for n in self.node.findall('lemma')]
+
+    def tag(self):
+        return self.node.get('tag')
+
+    def oed_id(self):
+        return self.node.get('oedId')
+
+    def oed_lexid(self):
+        return self.node.get('oedLexid')
+
+    def wordclass_sets(self):
+        return [WordclassSet(n) for n in self.node.findall('wordclassSet')]
+
+    def primary_wordclass(self):
+        wordclass_sets = self.wordclass_sets()
+        if wordclass_sets:
+            return wordclass_sets[0].wordclass()
+        return None
+
+    def types(self):
+        return [t for wcs in self.wordclass_sets() for t in wcs.types()]
+
+
+class WordclassSet(Component):
+
+    @property
+    def id(self):
+        return self.node.get('id')
+
+    def wordclass(self):
+        wordclass_node = self.node.find('wordclass')
+        if wordclass_node is None:
+            return None
+        return wordclass_node.get('penn')
+
+    def link(self, target='oed', asTuple=False):
+        resource = self.node.find('resourceSet/resource[@code="%s"]' % target)
+        if resource is None:
+            return (None, None) if asTuple else None
+        if asTuple:
+            return resource.get('xrid'), resource.get('xnode')
+        return resource.get('xrid')
+
+    def morphset_block(self):
+        return self.node.find('morphSetBlock')
+
+    def morphsets(self):
+        block = self.morphset_block()
+        if block is None:
+            return []
+        return [MorphSet(n) for n in block.findall('morphSet')]
+
+    def types(self):
+        return [t for morphset in self.morphsets() for t in morphset.types()]
+
+
+class MorphSet(Component):
+
+    def __init__(self, node):
+        Component.__init__(self, node)
+        self.inflections = None
+
+    @property
+    def form(self):
+        return self.node.findtext('type/form')
+
+    @property
+    def sort(self):
+        return Lemma(self.form).lexical_sort()
+
+    def types(self):
+        return [TypeUnit(n) for n in self.node.findall('type')]
+
+    def is_nonstandard(self):
+        return self.node.get('nonStandard') == 'true'
+
+    def is_oed_headword(self):
+        return self.node.get('oedHeadword') == 'true'
+
+
+class TypeUnit(Component):
+
+    @property
+    def id(self):
+        return self.node.get('id')
+
+    @property
+    def form(self):
+        return self.node.findtext('form')
+
+    @property
+    def sort(self):
+        return Lemma(self.form).lexical_sort()
+
+    def wordclass(self):
+        return self.node.find('wordclass').get('penn')
+
+    def is_computed(self):
+        return self.node.get('computed') == 'true'
+
+    def lemma_manager(self):
+        return Lemma(self.form)
+
+
+def _fuzz(year, round_up=False):
+    for limit, granularity in GRANULARITY:
+        if year < limit:
+            break
+    if round_up:
+        return -(-year // granularity) * granularity
+    return (year // granularity) * granularity
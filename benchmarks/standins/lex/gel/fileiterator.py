@@ -0,0 +1,60 @@
+"""
+FileIterator - Stand-in for the iterator over GEL build files
+
+Each file in in_dir is parsed and yielded as a FileContent; once the
+caller has finished with it, it's written (pretty-printed) to out_dir,
+if there is one. Any XML files already in out_dir are removed first.
+"""
+
+import os
+
+from lxml import etree
+
+from lex.gel.entrycomponents import Entry
+
+PARSER = etree.XMLParser(remove_blank_text=True)
+
+
+class FileContent(object):
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.entries = [Entry(n) for n in doc.getroot().findall('e')]
+
+    def entry_by_id(self, id):
+        return [e for e in self.entries if e.oed_id() == id]
+
+
+class FileIterator(object):
+
+    def __init__(self, in_dir=None, out_dir=None, verbosity=None):
+        self.in_dir = in_dir
+        self.out_dir = out_dir
+        self.verbosity = verbosity
+        self.in_file = None
+
+    def iterate(self):
+        if self.out_dir:
+            if not os.path.isdir(self.out_dir):
+                os.makedirs(self.out_dir)
+            for filename in os.listdir(self.out_dir):
+                if filename.endswith('.xml'):
+                    os.unlink(os.path.join(self.out_dir, filename))
+        filenames = sorted([f for f in os.listdir(self.in_dir)
+                            if f.endswith('.xml')])
+        for filename in filenames:
+            self.in_file = os.path.join(self.in_dir, filename)
+            if self.verbosity is not None:
+                print('\t%s' % self.in_file)
+            doc = etree.parse(self.in_file, PARSER)
+            yield FileContent(doc)
+            if self.out_dir:
+                with open(os.path.join(self.out_dir, filename), 'w') as filehandle:
+                    filehandle.write(etree.tounicode(doc, pretty_print=True))
+
+    def file_number(self):
+        stem = os.path.splitext(os.path.basename(self.in_file))[0]
+        try:
+            return int(stem)
+        except ValueError:
+            return stem
@@ -0,0 +1,77 @@
+"""
+Inflection, ArchaicEndings - Stand-ins: regular English inflection rules
+"""
+
+import re
+
+VOWEL = 'aeiou'
+SIBILANT = re.compile(r'(s|x|z|ch|sh)$')
+CONSONANT_Y = re.compile(r'[^aeiou]y$')
+DOUBLING = re.compile(r'[^aeiou][aeiou][bdgmnprt]$')
+PLURAL_FORMS = re.compile(r'(ics|ness|ss|us)$')
+
+
+class Inflection(object):
+
+    def compute_inflection(self, form, wordclass, archaic=False):
+        words = form.split(' ')
+        if wordclass in ('NNS', 'VBZ'):
+            # Inflect the head word of a phrase
+            if wordclass == 'NNS' and len(words) > 1:
+                return ' '.join([self._sibilant(words[0], archaic)] + words[1:])
+            return self._sibilant(form, archaic)
+        if wordclass in ('VBD', 'VBN'):
+            if form.endswith('e'):
+                return form + 'd'
+            if CONSONANT_Y.search(form):
+                return form[:-1] + 'ied'
+            if DOUBLING.search(form) and len(form) < 6:
+                return form + form[-1] + 'ed'
+            return form + 'ed'
+        if wordclass == 'VBG':
+            if form.endswith('e') and not form.endswith('ee'):
+                return form[:-1] + 'ing'
+            if DOUBLING.search(form) and len(form) < 6:
+                return form + form[-1] + 'ing'
+            return form + 'ing'
+        if wordclass in ('JJR', 'RBR'):
+            return self._grade(form, 'er')
+        if wordclass in ('JJS', 'RBS'):
+            return self._grade(form, 'est')
+        return form
+
+    def has_plural_form(self, form):
+        return bool(PLURAL_FORMS.search(form))
+
+    def _sibilant(self, form, archaic=False):
+        if archaic and form.endswith('x'):
+            return form + 'en'
+        if SIBILANT.search(form):
+            return form + 'es'
+        if CONSONANT_Y.search(form):
+            return form[:-1] + 'ies'
+        return form + 's'
+
+    def _grade(self, form, ending):
+        if form.endswith('e'):
+            return form + ending[1:]
+        if CONSONANT_Y.search(form):
+            return form[:-1] + 'i' + ending
+        return form + ending
+
+
+class ArchaicEndings(object):
+
+    ENDINGS = {
+        'VBZ': (re.compile(r'e?s$'), ('eth', 'ith')),
+        'VBD': (re.compile(r'ed$'), ('ede', 'id')),
+        'NNS': (re.compile(r'es$'), ('is',)),
+    }
+
+    def process(self, form, wordclass):
+        if wordclass not in self.ENDINGS:
+            return []
+        pattern, endings = self.ENDINGS[wordclass]
+        if not pattern.search(form):
+            return []
+        return [pattern.sub(ending, form) for ending in endings]
@@ -0,0 +1,67 @@
+"""
+MmhCache - Stand-in for the morphology hub
+
+The hub "contains" about three-quarters of all forms (chosen by a
+stable hash of the form); for these, inflect_fuzzy() returns one or more
+morphology sets built from the regular inflection rules, including a US
+variant set for verbs and adjectives with doubled consonants.
+"""
+
+import zlib
+
+from lex.inflections.inflection import Inflection, DOUBLING
+
+# Proportion of forms found in the hub, out of 100
+COVERAGE = 75
+PARADIGMS = {
+    'NN': ('NN', 'NNS'),
+    'VB': ('VB', 'VBZ', 'VBG', 'VBD', 'VBN'),
+    'JJ': ('JJ', 'JJR', 'JJS'),
+    'RB': ('RB',),
+}
+
+
+class MorphUnit(object):
+
+    def __init__(self, form, wordclass):
+        self.form = form
+        self.wordclass = wordclass
+
+
+class MorphSet(object):
+
+    def __init__(self, lemma, morphunits, variant_type=None, computed=False):
+        self.lemma = lemma
+        self.morphunits = morphunits
+        self.variant_type = variant_type
+        self.computed = computed
+
+    def contains(self, wordclass):
+        return any([unit.wordclass == wordclass for unit in self.morphunits])
+
+
+class MmhCache(object):
+
+    def __init__(self):
+        self.inflector = Inflection()
+        self.cache = {}
+
+    def inflect_fuzzy(self, form, wordclass=None):
+        key = (form, wordclass)
+        if key not in self.cache:
+            self.cache[key] = self._lookup(form, wordclass)
+        return self.cache[key]
+
+    def _lookup(self, form, wordclass):
+        if (wordclass not in PARADIGMS or
+                zlib.crc32(form.encode('utf8')) % 100 >= COVERAGE):
+            return []
+        units = [MorphUnit(self.inflector.compute_inflection(form, wc), wc)
+                 for wc in PARADIGMS[wordclass]]
+        sets = [MorphSet(form, units)]
+        if wordclass in ('VB', 'JJ') and DOUBLING.search(form):
+            # US spelling: no doubled consonant
+            us_units = [MorphUnit(unit.form.replace(form + form[-1], form),
+                                  unit.wordclass) for unit in units]
+            sets.append(MorphSet(form, us_units, variant_type='us'))
+        return sets
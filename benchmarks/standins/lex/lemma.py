@@ -0,0 +1,35 @@
+"""
+Lemma - Stand-in
+"""
+
+import re
+import unicodedata
+
+NON_ALPHA = re.compile(r'[^a-z0-9]')
+WORD_BREAK = re.compile(r'[ -]+')
+AFFIX = re.compile(r'(^-|-$)')
+
+
+class Lemma(object):
+
+    def __init__(self, lemma):
+        self.lemma = lemma
+
+    def asciified(self):
+        return (unicodedata.normalize('NFKD', self.lemma)
+                .encode('ascii', 'ignore').decode('ascii'))
+
+    def lexical_sort(self):
+        return NON_ALPHA.sub('', self.asciified().lower())
+
+    def words(self):
+        return [w for w in WORD_BREAK.split(self.lemma) if w]
+
+    def num_words(self):
+        return len(self.words())
+
+    def is_affix(self):
+        return bool(AFFIX.search(self.lemma))
+
+    def is_compound(self):
+        return self.num_words() > 1 or '~' in self.lemma
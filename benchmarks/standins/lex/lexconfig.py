@@ -0,0 +1,10 @@
+"""
+lexconfig - Stand-in; everything lives under the benchmark's scratch
+directory, given by the GEL_BENCHMARK_DIR environment variable
+"""
+
+import os
+
+GEL_DIR = os.environ.get('GEL_BENCHMARK_DIR', '/tmp/gel_benchmark')
+ODO_LINKS_DIR = os.path.join(GEL_DIR, 'odo_links')
+NGRAMS_TABLES_DIR = os.path.join(GEL_DIR, 'ngrams')
@@ -0,0 +1,53 @@
+"""
+DateRange - Stand-in
+"""
+
+from lxml import etree
+
+PROJECTED_END = 2050
+
+
+class DateRange(object):
+
+    def __init__(self, **kwargs):
+        self.start = int(kwargs.get('start') or 0)
+        self.end = int(kwargs.get('end') or 0)
+        self.hard_end = kwargs.get('hardEnd', False)
+        self.is_estimated = kwargs.get('estimated', False)
+        self.obsolete = kwargs.get('obsolete', False)
+        self.last_documented = self.end
+
+    @classmethod
+    def from_node(cls, node):
+        return cls(start=node.get('start'),
+                   end=node.get('end'),
+                   estimated=node.get('estimated') == 'true',
+                   obsolete=node.get('obs') == 'true')
+
+    def is_marked_obsolete(self):
+        return self.obsolete
+
+    def exact(self, key):
+        return getattr(self, key)
+
+    def projected_end(self):
+        if self.obsolete:
+            return self.end
+        return max(self.end, PROJECTED_END)
+
+    def reset(self, key, value):
+        setattr(self, key, int(value))
+
+    def constrain(self, limits):
+        start, end = limits
+        return max(self.start, start), min(self.end, end)
+
+    def to_xml(self, omitProjected=False):
+        node = etree.Element('date', start=str(self.start), end=str(self.end))
+        if self.obsolete:
+            node.set('obs', 'true')
+        if self.is_estimated:
+            node.set('estimated', 'true')
+        if not omitProjected:
+            node.set('projected', str(self.projected_end()))
+        return node
@@ -0,0 +1,12 @@
+"""
+LemmaWithVariants - Stand-in
+
+Present only so that generatebase can be imported (see EntryIterator).
+"""
+
+
+class LemmaWithVariants(object):
+
+    def __init__(self, *args, **kwargs):
+        raise NotImplementedError('The OED source is not available '
+                                  'to the benchmarks')
@@ -0,0 +1,60 @@
+"""
+VariantsCache - Stand-in
+
+About a third of OED entry IDs (chosen by a stable hash) have recorded
+variant inflections: archaic plurals for nouns, and archaic verb forms.
+"""
+
+import zlib
+
+from lex.lemma import Lemma
+from lex.oed.daterange import DateRange
+
+# Proportion of entries with recorded variants, out of 100
+COVERAGE = 33
+
+
+class VariantForm(object):
+
+    def __init__(self, form, wordclass, start, end, irregular=False):
+        self.form = form
+        self.sort = Lemma(form).lexical_sort()
+        self.wordclass = wordclass
+        self.date = DateRange(start=start, end=end)
+        self.regional = False
+        self.irregular = irregular
+
+
+class VariantSet(object):
+
+    def __init__(self, variants):
+        self.variants = variants
+
+
+class VariantsCache(object):
+
+    def __init__(self, wordclasses=()):
+        self.wordclasses = wordclasses
+
+    def id_exists(self, id):
+        return zlib.crc32(str(id).encode('utf8')) % 100 < COVERAGE
+
+    def find(self, id=None, wordclass=None):
+        if not self.id_exists(id):
+            return None
+        seed = zlib.crc32(str(id).encode('utf8'))
+        stem = 'v%x' % (seed % 4096)
+        start = 1200 + (seed % 400)
+        end = start + 150 + (seed % 300)
+        if wordclass == 'NN':
+            variants = {'NNS': [VariantForm(stem + 'en', 'NNS', start, end,
+                                            irregular=True),
+                                VariantForm(stem + 'is', 'NNS', start, end)]}
+        elif wordclass == 'VB':
+            variants = {'VBZ': [VariantForm(stem + 'eth', 'VBZ', start, end)],
+                        'VBD': [VariantForm(stem + 'ede', 'VBD', start, end)],
+                        'VBN': [VariantForm('y' + stem + 'ed', 'VBN', start,
+                                            end, irregular=True)]}
+        else:
+            variants = {}
+        return VariantSet(variants)
@@ -0,0 +1,12 @@
+"""
+VariantsComputer - Stand-in
+
+Present only so that generatebase can be imported (see EntryIterator).
+"""
+
+
+class VariantsComputer(object):
+
+    def __init__(self, **kwargs):
+        raise NotImplementedError('The OED source is not available '
+                                  'to the benchmarks')
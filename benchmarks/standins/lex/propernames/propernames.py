@@ -0,0 +1,11 @@
+"""
+propernames - Stand-in
+"""
+
+import re
+
+CAPITALIZED = re.compile(r'^[A-Z][a-z]+( [A-Z][a-z]+)*$')
+
+
+def is_proper_name(form):
+    return bool(CAPITALIZED.search(form))
@@ -0,0 +1,28 @@
+"""
+Wordclass - Stand-in
+"""
+
+from lxml import etree
+
+DESCRIPTIONS = {
+    'NN': 'noun', 'NNS': 'plural noun', 'NP': 'proper noun',
+    'JJ': 'adjective', 'JJR': 'comparative adjective',
+    'JJS': 'superlative adjective', 'RB': 'adverb', 'VB': 'verb',
+    'VBZ': 'verb (3rd person singular)', 'VBG': 'verb (present participle)',
+    'VBD': 'verb (past tense)', 'VBN': 'verb (past participle)',
+    'UH': 'interjection', 'MD': 'modal verb',
+}
+
+
+class Wordclass(object):
+
+    def __init__(self, penn):
+        self.penn = penn
+
+    def equivalent(self, scheme, default=None):
+        if scheme == 'description':
+            return DESCRIPTIONS.get(self.penn, default)
+        return default
+
+    def to_xml(self):
+        return etree.Element('wordclass', penn=self.penn)
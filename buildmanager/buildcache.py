@@ -0,0 +1,222 @@
+"""
+buildcache - Skip pipeline stages whose inputs haven't changed
+
+When a stage completes, a fingerprint of everything it depends on is
+recorded: the contents of its input files and directories, the values
+of the gelconfig settings it uses, and the source code of the modules
+that implement it. Next time round, if the fingerprint is the same and
+the stage's outputs haven't been touched since, the stage is skipped.
+
+Build directories are hashed by content; resources outside the build
+directory (ngram tables, link tables, etc.) are checked by file size
+and modification time. A resource which is managed internally by the
+lex library, but produced by another stage (e.g. the morphology hub),
+is checked by the time that stage last completed.
+
+Source data which the lex library manages itself (the OED and ODO
+sources, the morphology data) can't be inspected at all, so a stage
+which reads any of it is never skipped (see is_cacheable()). Incremental
+stages still skip unchanged files, though (see buildmanager.incremental);
+after a data refresh, run the pipeline with --force to rebuild
+everything.
+"""
+
+import os
+import json
+import time
+
+import gelconfig
+from buildmanager.stages import STAGES, RESOURCES
+from buildmanager.fingerprint import HashCache, hash_text
+
+CACHE_DIR = os.path.join(gelconfig.BUILD_DIR, '.buildcache')
+HASH_CACHE_FILE = os.path.join(CACHE_DIR, 'hashes.json')
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def is_current(stage_name):
+    """
+    Return True if the stage's recorded fingerprint matches its current
+    fingerprint, and its outputs are still as they were left.
+    """
+    if not is_cacheable(stage_name):
+        return False
+    record = _load_record(stage_name)
+    if record is None:
+        return False
+    hash_cache = open_hash_cache()
+    current = (record['fingerprint'] == fingerprint(stage_name, hash_cache) and
+               record['outputs'] == _output_hashes(stage_name, hash_cache))
+    hash_cache.save()
+    return current
+
+
+def record(stage_name):
+    """
+    Record the fingerprint of a stage which has just completed
+    successfully.
+    """
+    hash_cache = open_hash_cache()
+    data = {
+        'fingerprint': fingerprint(stage_name, hash_cache),
+        'outputs': _output_hashes(stage_name, hash_cache),
+        'completed': time.time(),
+    }
+    hash_cache.save()
+    _save_record(stage_name, data)
+
+    # Earlier stages which write to the same outputs (e.g. addInflections
+    #  and addOdoContent both write to 04_inflected_ext) would otherwise
+    #  think their outputs have been tampered with.
+    for earlier in _earlier_stages(stage_name):
+        shared = set(STAGES[earlier].outputs) & set(data['outputs'])
+        earlier_record = _load_record(earlier)
+        if shared and earlier_record is not None:
+            for resource in shared:
+                earlier_record['outputs'][resource] = data['outputs'][resource]
+            _save_record(earlier, earlier_record)
+
+
+def is_cacheable(stage_name):
+    """
+    Return False if any of the stage's inputs can't be fingerprinted:
+    something managed by the lex library which isn't produced by any
+    stage (e.g. the OED source).
+    """
+    return not any([_is_opaque_source(resource)
+                    for resource in STAGES[stage_name].inputs])
+
+
+def _is_opaque_source(resource):
+    return (RESOURCES[resource] is None and
+            not any([resource in stage.outputs for stage in STAGES.values()]))
+
+
+def invalidate(stage_name=None):
+    """
+    Forget the recorded fingerprint for a stage (or for every stage, if
+    no stage name is given), so that it will be run next time.
+    """
+    if stage_name is None:
+        stage_names = list(STAGES.keys())
+    else:
+        stage_names = [stage_name, ]
+    for name in stage_names:
+        if os.path.isfile(_record_file(name)):
+            os.unlink(_record_file(name))
+
+
+def fingerprint(stage_name, hash_cache):
+    stage = STAGES[stage_name]
+    components = _settings_components(stage_name, hash_cache)
+    components['inputs'] = {resource: _resource_hash(resource, hash_cache)
+                            for resource in stage.inputs}
+    return hash_text(json.dumps(components, sort_keys=True))
+
+
+def settings_hash(stage_name, hash_cache):
+    """
+    Return a hash of just the gelconfig settings and source code which
+    a stage depends on (i.e. its fingerprint without the inputs).
+    """
+    components = _settings_components(stage_name, hash_cache)
+    return hash_text(json.dumps(components, sort_keys=True))
+
+
+def opaque_input_hashes(stage_name, hash_cache):
+    """
+    Return resource -> fingerprint for each of a stage's inputs which
+    isn't a file or directory (e.g. the morphology hub). Stages which
+    keep track of their own input files (see buildmanager.incremental)
+    need to know when any of these has changed, since it affects every
+    output file.
+    """
+    return {resource: _resource_hash(resource, hash_cache)
+            for resource in STAGES[stage_name].inputs
+            if RESOURCES[resource] is None}
+
+
+def source_version(resource):
+    """
+    Return a quick signature of a resource, which changes whenever it's
+    rebuilt: the names, sizes and modification times of its files, or
+    (if it's managed by the lex library) the time the stage producing it
+    last completed. None if neither can be told. Nothing is read, so
+    this is cheap enough to check every time a process starts.
+    """
+    path = RESOURCES[resource]
+    if path is None:
+        return _producer_completed(resource)
+    return HashCache().path_hash(path, content=False)
+
+
+def _settings_components(stage_name, hash_cache):
+    stage = STAGES[stage_name]
+    return {
+        'config': {key: repr(getattr(gelconfig, key))
+                   for key in stage.config},
+        'code': {path: hash_cache.path_hash(os.path.join(REPOSITORY_DIR, path))
+                 for path in stage.code},
+    }
+
+
+def _resource_hash(resource, hash_cache):
+    path = RESOURCES[resource]
+    if path is None:
+        # Can't look inside this resource; if it's produced by another
+        #  stage, use the time that stage last completed.
+        return _producer_completed(resource)
+    return hash_cache.path_hash(path, content=_in_build_dir(path))
+
+
+def _producer_completed(resource):
+    for stage in STAGES.values():
+        if resource in stage.outputs:
+            producer_record = _load_record(stage.name)
+            if producer_record is not None:
+                return str(producer_record['completed'])
+    return None
+
+
+def _output_hashes(stage_name, hash_cache):
+    return {resource: _resource_hash(resource, hash_cache)
+            for resource in STAGES[stage_name].outputs
+            if RESOURCES[resource] is not None}
+
+
+def _earlier_stages(stage_name):
+    stage_names = list(STAGES.keys())
+    return stage_names[:stage_names.index(stage_name)]
+
+
+def _in_build_dir(path):
+    build_dir = os.path.abspath(gelconfig.BUILD_DIR)
+    return os.path.abspath(path).startswith(build_dir + os.sep)
+
+
+def open_hash_cache():
+    """
+    Return the HashCache shared by the build cache and the incremental
+    file stages (remember to save() it afterwards).
+    """
+    if not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    return HashCache(HASH_CACHE_FILE)
+
+
+def _record_file(stage_name):
+    return os.path.join(CACHE_DIR, stage_name + '.json')
+
+
+def _save_record(stage_name, data):
+    tmp_file = _record_file(stage_name) + '.tmp'
+    with open(tmp_file, 'w') as filehandle:
+        json.dump(data, filehandle, indent=2)
+    os.replace(tmp_file, _record_file(stage_name))
+
+
+def _load_record(stage_name):
+    if not os.path.isfile(_record_file(stage_name)):
+        return None
+    with open(_record_file(stage_name)) as filehandle:
+        return json.load(filehandle)
@@ -0,0 +1,90 @@
+"""
+checkpoint - Progress manifests for long-running stages
+
+A stage such as generateBase or frequencyComputeScores records each unit
+of work (an output file, a letter) as it's completed. If the stage dies
+part-way through, running the pipeline again with --resume lets it carry
+on from the last completed unit, rather than starting from scratch.
+
+Output files should be written with write_atomically(), so that a unit
+is never left half-written.
+"""
+
+import os
+import json
+
+import gelconfig
+
+CHECKPOINT_DIR = os.path.join(gelconfig.BUILD_DIR, '.checkpoints')
+
+
+class Checkpoint(object):
+
+    """
+    Progress manifest for a single stage.
+
+    If resume is False, any progress recorded by an earlier (interrupted)
+    run is discarded, and the stage starts from scratch. Once the stage
+    has finished, call finish() to remove the manifest.
+    """
+
+    def __init__(self, name, resume=False):
+        self.name = name
+        self.filepath = os.path.join(CHECKPOINT_DIR, name + '.json')
+        self.completed = []
+        self.state = {}
+        if resume:
+            self.load()
+        else:
+            self.finish()
+
+    @property
+    def resuming(self):
+        return bool(self.completed)
+
+    def is_done(self, unit):
+        return unit in self.completed
+
+    def mark_done(self, unit, **state):
+        """
+        Record that a unit has been completed, along with any state
+        that the stage will need in order to resume after this unit.
+        """
+        self.completed.append(unit)
+        self.state.update(state)
+        self.save()
+
+    def load(self):
+        if os.path.isfile(self.filepath):
+            with open(self.filepath) as filehandle:
+                data = json.load(filehandle)
+            self.completed = data['completed']
+            self.state = data['state']
+            print('\tResuming "%s" after %d completed units' %
+                  (self.name, len(self.completed)))
+
+    def save(self):
+        if not os.path.isdir(CHECKPOINT_DIR):
+            os.makedirs(CHECKPOINT_DIR)
+        write_atomically(self.filepath,
+                         json.dumps({'completed': self.completed,
+                                     'state': self.state}))
+
+    def finish(self):
+        self.completed = []
+        self.state = {}
+        if os.path.isfile(self.filepath):
+            os.unlink(self.filepath)
+
+
+def write_atomically(filepath, text):
+    """
+    Write text (or bytes) to a file via a temporary file in the same
+    directory, so that the file is either written in full or not at all.
+    """
+    directory, filename = os.path.split(filepath)
+    tmp_file = os.path.join(directory, '.%s.%d.tmp' % (filename, os.getpid()))
+    mode = 'wb' if isinstance(text, bytes) else 'w'
+    with open(tmp_file, mode) as filehandle:
+        filehandle.write(text)
+    os.replace(tmp_file, filepath)
@@ -0,0 +1,497 @@
+"""
+daemon - Resident resource daemon shared by stage workers
+
+Each worker process in a sharded stage would otherwise load its own copy
+of the morphology hub, the variants cache, the ODO link tables, the
+weighted-size index, etc. The resource daemon is a long-lived local
+process which loads each of these once and answers lookups on them over
+a UNIX socket; the workers are thin clients.
+
+Start it by hand:
+
+    python -m buildmanager.daemon [--preload morphology variants_cache ...]
+
+or set gelconfig.RESOURCE_DAEMON, in which case the pipeline starts it
+(if it's not already running) and stops it again at the end of the run.
+While the daemon is running, registry.get() returns a RemoteResource in
+place of any resource listed in SERVED, so module-level lazy resources
+(MORPHOLOGY, VARIANTS_CACHE, LINK_MANAGERS, etc.) use it without any
+change to the code that calls them. If the daemon isn't running, the
+resources are loaded locally as usual.
+
+Requests and responses are pickled and length-prefixed. Each request
+carries a batch of calls, so a client can send many lookups (e.g. the
+frequencies of every type in a file) in a single round trip; see
+call_many(), and prefetched() for code which makes its lookups one at a
+time.
+
+The daemon notes the version of each resource's source data (see
+buildcache.source_version()) when it loads it. Whenever a client process
+starts using a resource, it checks that version against the current one,
+and has the daemon reload the resource if it's been rebuilt since (e.g.
+by generateMorphologyHub or indexOedSize). The variants cache is
+compiled by the lex library itself, so changes to it can't be seen;
+running the pipeline with --force has the daemon reload everything.
+"""
+
+import os
+import sys
+import time
+import socket
+import pickle
+import struct
+import argparse
+import contextlib
+import threading
+import traceback
+import subprocess
+import socketserver
+
+import gelconfig
+from buildmanager import registry, buildcache
+from buildmanager.lookupstats import CountingResource
+
+SOCKET_PATH = os.path.join(gelconfig.BUILD_DIR, '.resources.sock')
+# Seconds to wait for a newly-started daemon to start answering
+STARTUP_TIMEOUT = 60
+LENGTH = struct.Struct('<Q')
+
+# Resources served by the daemon, and the lookup methods that clients
+#  may call on each
+SERVED = {
+    'morphology': ('inflect_fuzzy',),
+    'variants_cache': ('id_exists', 'find'),
+    'link_manager.ode': ('parse_link_file', 'translate_id', 'find_content',
+                         'find_definition', 'find_derivative', 'find_lemma'),
+    'link_manager.noad': ('parse_link_file', 'translate_id', 'find_content',
+                          'find_definition', 'find_derivative', 'find_lemma'),
+    'weighted_size': ('find_size',),
+    'frequency_memo': ('find_frequencies',),
+}
+
+# The pipeline resource (see buildmanager.stages) that each served
+#  resource is loaded from
+SOURCES = {
+    'morphology': 'morphology_hub',
+    'variants_cache': 'oed_source',
+    'link_manager.ode': 'link_tables',
+    'link_manager.noad': 'link_tables',
+    'weighted_size': 'weighted_size_index',
+    'frequency_memo': 'frequency_scores',
+}
+
+# Set in the daemon process itself, so that it loads resources locally
+#  rather than asking itself for them
+SERVING = False
+# Client connection for this process: (pid, socket); the pid is checked
+#  so that a forked child never shares its parent's socket
+CONNECTION = {'pid': None, 'socket': None}
+# Results of lookups sent ahead by prefetched(), keyed by call; each is
+#  kept pickled, so that every lookup gets its own copy just as if it
+#  had been sent to the daemon
+PREFETCHED = {}
+
+
+#=====================================================================
+# Client side
+#=====================================================================
+
+def remote(name):
+    """
+    Return a RemoteResource for the named resource if the daemon is
+    enabled (gelconfig.RESOURCE_DAEMON), running, and serves it;
+    otherwise return None.
+    """
+    if not _serves(name):
+        return None
+    _check_version(name)
+    return RemoteResource(name)
+
+
+def _serves(name):
+    return (gelconfig.RESOURCE_DAEMON and not SERVING and name in SERVED and
+            _connection() is not None)
+
+
+def reload(names=None):
+    """
+    Have the daemon drop the named resources (or all of them), so that
+    they're loaded afresh when next asked for.
+    """
+    if _connection() is None:
+        return
+    if names is None:
+        names = list(SERVED.keys())
+    _request(('reload', {name: None for name in names}), _connection())
+
+
+def _check_version(name):
+    # If the daemon's copy of the resource was loaded from data which
+    #  has since been rebuilt, have it reload the resource. (The version
+    #  it was loaded from is sent back, so that if several workers find
+    #  it stale at once, it's only reloaded once.)
+    loaded = _request(('versions',), _connection())
+    if name in loaded:
+        current = buildcache.source_version(SOURCES[name])
+        if loaded[name] != current:
+            print('\tResource daemon has an out-of-date copy of %s; '
+                  'reloading' % name)
+            _request(('reload', {name: loaded[name]}), _connection())
+
+
+def is_running():
+    try:
+        client = _connect()
+    except OSError:
+        return False
+    try:
+        return _request(('ping',), client) == 'pong'
+    except (OSError, EOFError):
+        return False
+    finally:
+        client.close()
+
+
+def call_many(resource, method, arguments):
+    """
+    Call resource.method(*args) for each tuple of args in arguments, and
+    return a list of the results. If resource is a RemoteResource, the
+    calls are sent to the daemon in a single batch.
+    """
+    if isinstance(resource, RemoteResource):
+        return resource.call_many(method, arguments)
+    if isinstance(resource, CountingResource):
+        # Counts the lookups, then calls back here with the resource
+        #  itself
+        return resource.call_many(method, arguments)
+    function = getattr(resource, method)
+    return [function(*args) for args in arguments]
+
+
+@contextlib.contextmanager
+def prefetched(resource, method, lookups):
+    """
+    Send resource.method(*args, **kwargs) for each (args, kwargs) pair
+    returned by lookups() to the daemon in a single batch, and answer
+    those lookups from the results until the end of the with-block, so
+    that code which makes its lookups one at a time needn't make a
+    round trip for each:
+
+        def _lookups():
+            return [((form,), {'wordclass': wordclass}), ...]
+
+        with daemon.prefetched(MORPHOLOGY, 'inflect_fuzzy', _lookups):
+            ...MORPHOLOGY.inflect_fuzzy(form, wordclass=wordclass)...
+
+    The arguments must be given just as the lookup will be called (and
+    must be hashable). Other lookups are sent to the daemon as usual. If
+    the resource isn't held by the daemon, this does nothing: lookups()
+    isn't called, and the resource isn't loaded.
+    """
+    remote_resource = _remote_instance(resource)
+    keys = []
+    if remote_resource is not None:
+        batch = {}
+        for args, kwargs in lookups():
+            key = _call_key(remote_resource._resource_name, method, args,
+                            kwargs)
+            if key not in PREFETCHED:
+                batch[key] = (remote_resource._resource_name, method, args,
+                              kwargs)
+        keys = list(batch.keys())
+        results = _request(('call', list(batch.values())), _connection())
+        for key, (ok, value) in zip(keys, results):
+            # A lookup which failed is left to fail again when it's
+            #  actually made
+            if ok:
+                PREFETCHED[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    try:
+        yield
+    finally:
+        for key in keys:
+            PREFETCHED.pop(key, None)
+
+
+def _remote_instance(resource):
+    # Only a lazy resource which is already loaded, or which would be
+    #  looked up in the daemon, is resolved: anything else would have to
+    #  be loaded locally just to find out that it isn't remote
+    if isinstance(resource, registry.LazyResource):
+        name = resource._resource_name
+        if not registry.is_loaded(name) and not _serves(name):
+            return None
+        resource = registry.get(name)
+    if isinstance(resource, CountingResource):
+        resource = resource._resource
+    if isinstance(resource, RemoteResource):
+        return resource
+    return None
+
+
+def _call_key(name, method, args, kwargs):
+    return (name, method, args, tuple(sorted(kwargs.items())))
+
+
+class RemoteResource(object):
+
+    """
+    Client-side stand-in for a resource held by the daemon; calling one
+    of its served methods sends the call to the daemon and returns the
+    result.
+    """
+
+    def __init__(self, name):
+        self._resource_name = name
+
+    def __getattr__(self, method):
+        if method not in SERVED.get(self._resource_name, ()):
+            raise AttributeError('%s.%s is not served by the resource daemon'
+                                 % (self._resource_name, method))
+
+        def lookup(*args, **kwargs):
+            if PREFETCHED:
+                try:
+                    return pickle.loads(PREFETCHED[_call_key(
+                        self._resource_name, method, args, kwargs)])
+                except (KeyError, TypeError):
+                    pass
+            return self._send([(self._resource_name, method, args, kwargs)])[0]
+        return lookup
+
+    def call_many(self, method, arguments):
+        return self._send([(self._resource_name, method, args, {})
+                           for args in arguments])
+
+    def _send(self, calls):
+        results = _request(('call', calls), _connection())
+        values = []
+        for ok, value in results:
+            if not ok:
+                raise RuntimeError('Resource daemon lookup failed:\n%s'
+                                   % value)
+            values.append(value)
+        return values
+
+    def __repr__(self):
+        return '<remote resource %s>' % self._resource_name
+
+
+def _connect():
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(SOCKET_PATH)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def _connection():
+    """
+    Return this process's connection to the daemon, or None if the
+    daemon isn't running.
+    """
+    if CONNECTION['pid'] != os.getpid():
+        CONNECTION['pid'] = os.getpid()
+        try:
+            CONNECTION['socket'] = _connect()
+        except OSError:
+            CONNECTION['socket'] = None
+    return CONNECTION['socket']
+
+
+def _request(message, client):
+    _send_message(client, message)
+    return _receive_message(client)
+
+
+def _send_message(connection, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    connection.sendall(LENGTH.pack(len(data)) + data)
+
+
+def _receive_message(connection):
+    length, = LENGTH.unpack(_receive_exactly(connection, LENGTH.size))
+    return pickle.loads(_receive_exactly(connection, length))
+
+
+def _receive_exactly(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1048576))
+        if not chunk:
+            raise EOFError('Resource daemon connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+#=====================================================================
+# Starting and stopping
+#=====================================================================
+
+def start():
+    """
+    Start the daemon in the background, unless it's already running;
+    return the process if a new daemon was started, or None.
+    """
+    if is_running():
+        return None
+    print('Starting resource daemon...')
+    process = subprocess.Popen([sys.executable, '-m', 'buildmanager.daemon'],
+                               cwd=os.path.dirname(os.path.dirname(
+                                   os.path.abspath(__file__))))
+    deadline = time.time() + STARTUP_TIMEOUT
+    while not is_running():
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            raise RuntimeError('Resource daemon failed to start')
+        time.sleep(0.2)
+    return process
+
+
+def stop(process=None):
+    """
+    Ask the daemon to shut down (and wait for it, if it was started by
+    start()).
+    """
+    try:
+        client = _connect()
+    except OSError:
+        client = None
+    if client is not None:
+        try:
+            _request(('stop',), client)
+        except (OSError, EOFError):
+            pass
+        client.close()
+    if process is not None:
+        process.wait()
+
+
+#=====================================================================
+# Server side
+#=====================================================================
+
+class ResourceServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+
+    """
+    Holds the served resources, and answers batches of lookups on them.
+    The resources aren't written to be thread-safe, so each has a lock,
+    and lookups on any one resource are run one at a time; lookups on
+    different resources (e.g. from workers in different stages) run
+    side by side.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        socketserver.UnixStreamServer.__init__(self, socket_path,
+                                               ResourceHandler)
+        self.locks = {name: threading.Lock() for name in SERVED}
+        # Version of the source data each loaded resource was loaded from
+        self.versions = {}
+
+    def server_bind(self):
+        # Requests are unpickled, so only the user running the daemon may
+        #  connect to it, whatever the umask; the socket is created with
+        #  no group or other permissions
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+    def run_calls(self, calls):
+        results = []
+        for name, method, args, kwargs in calls:
+            try:
+                if method not in SERVED.get(name, ()):
+                    raise AttributeError('%s.%s is not served' %
+                                         (name, method))
+                with self.locks[name]:
+                    function = getattr(self._resource(name), method)
+                    results.append((True, function(*args, **kwargs)))
+            except Exception:
+                results.append((False, traceback.format_exc()))
+        return results
+
+    def reload(self, stale_versions):
+        """
+        Drop each named resource, unless it's been reloaded since the
+        given version was seen (a version of None drops it regardless).
+        """
+        for name, version in stale_versions.items():
+            if name not in self.locks:
+                continue
+            with self.locks[name]:
+                if name in self.versions and (
+                        version is None or self.versions[name] == version):
+                    registry.release([name])
+                    del self.versions[name]
+                    print('Released %s' % name)
+
+    def _resource(self, name):
+        if not registry.is_loaded(name):
+            # Noted before loading, so that anything rebuilt while the
+            #  resource is being loaded shows up as a change
+            self.versions[name] = buildcache.source_version(SOURCES[name])
+        return registry.get(name)
+
+
+class ResourceHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                message = _receive_message(self.request)
+            except (OSError, EOFError):
+                return
+            if message[0] == 'call':
+                _send_message(self.request, self.server.run_calls(message[1]))
+            elif message[0] == 'versions':
+                _send_message(self.request, dict(self.server.versions))
+            elif message[0] == 'reload':
+                self.server.reload(message[1])
+                _send_message(self.request, 'reloaded')
+            elif message[0] == 'ping':
+                _send_message(self.request, 'pong')
+            elif message[0] == 'stop':
+                _send_message(self.request, 'stopping')
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+def serve(preload=()):
+    global SERVING
+    SERVING = True
+    if os.path.exists(SOCKET_PATH):
+        if is_running():
+            print('Resource daemon is already running')
+            return
+        # Left over from a daemon which didn't shut down cleanly
+        os.unlink(SOCKET_PATH)
+    if not os.path.isdir(os.path.dirname(SOCKET_PATH)):
+        os.makedirs(os.path.dirname(SOCKET_PATH))
+    server = ResourceServer(SOCKET_PATH)
+    for name in preload:
+        server._resource(name)
+    print('Resource daemon listening on %s' % SOCKET_PATH)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the GEL resource daemon')
+    parser.add_argument('--preload', nargs='*', default=[],
+                        choices=sorted(SERVED.keys()),
+                        help='load these resources now, rather than when '
+                        'they are first asked for')
+    args = parser.parse_args()
+    serve(preload=args.preload)
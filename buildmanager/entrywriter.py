@@ -0,0 +1,153 @@
+"""
+entrywriter - Write a file of entries one entry at a time
+
+Stages which produce files of entries (GenerateBase, OdoAdditions,
+LemmaLister, AlphaSort) used to build each file as an <entries> element
+and serialize the whole tree once it was full. EntryWriter instead
+serializes each entry as soon as it's finished, and streams it to disk,
+so the stage never holds more than one entry's worth of output:
+
+    writer = EntryWriter(out_dir)
+    for ...:
+        writer.write(entry_node)
+        if len(writer) >= FILE_SIZE:
+            writer.close(next_filename())
+            writer = EntryWriter(out_dir)
+
+The file written is byte-for-byte what pretty-printing the whole
+<entries> element would have produced (or, with packed=True, what
+buildmanager.packedxml.pack() would have produced). lxml's
+etree.xmlfile() can't be used for this, since it doesn't indent an
+element to the depth at which it's written; instead, each entry is
+pretty-printed inside an otherwise-empty <entries> element, which is
+then cut away.
+
+This relies on the entries having no tail text (as is the case for
+anything built, or parsed with remove_blank_text), since the
+pretty-printer leaves the whole file unindented if there's any text
+between the entries.
+
+The file is written to a temporary file in the same directory (opened
+when the first entry is written), and only moved into place by
+close(), so a file is either written in full or not at all.
+"""
+
+import os
+import time
+import itertools
+
+from lxml import etree
+
+from buildmanager import iostats, packedxml
+
+_counter = itertools.count()
+
+
+class EntryWriter(object):
+
+    """
+    Writes entries to a file in the given directory, as children of a
+    root element (<entries>), optionally preceded by a processing
+    instruction (e.g. an XSL stylesheet link).
+    """
+
+    def __init__(self, directory, tag='entries', packed=False,
+                 preamble=None):
+        self.directory = directory
+        self.tag = tag
+        self.packed = packed
+        self.preamble = preamble
+        self.count = 0
+        self.tmp_file = None
+        self.filehandle = None
+        self.write_seconds = 0
+        # Serialized text not yet compressed (if packed)
+        self.pending = bytearray()
+        self.wrapper = etree.Element(tag)
+        # Pretty-printing puts each tag at the top level on a line of its
+        #  own
+        self.newline = b'' if packed else b'\n'
+        self.open_tag = ('<%s>' % tag).encode('UTF-8')
+        self.close_tag = ('</%s>' % tag).encode('UTF-8')
+        self.empty_tag = ('<%s/>' % tag).encode('UTF-8')
+
+    def __len__(self):
+        return self.count
+
+    def write(self, node):
+        """
+        Serialize an entry, and add it to the file. (If the file is
+        pretty-printed, the node is detached from any tree it belonged
+        to.)
+        """
+        start = time.perf_counter()
+        if self.packed:
+            text = etree.tostring(node, encoding='UTF-8')
+        else:
+            self.wrapper.append(node)
+            wrapped = etree.tostring(self.wrapper, pretty_print=True,
+                                     encoding='UTF-8')
+            self.wrapper.remove(node)
+            text = wrapped[len(self.open_tag) + 1:-len(self.close_tag) - 1]
+        iostats.serialized(text, time.perf_counter() - start,
+                           pretty_print=not self.packed)
+        if not self.count:
+            self._open()
+            self._emit(self.open_tag + self.newline)
+        self._emit(text)
+        self.count += 1
+
+    def close(self, filepath):
+        """
+        Finish the file, and move it into place as filepath.
+        """
+        if not self.count:
+            self._open()
+            self._emit(self.empty_tag + self.newline)
+        else:
+            self._emit(self.close_tag + self.newline)
+        start = time.perf_counter()
+        if self.packed:
+            self._flush_records(final=True)
+        self.filehandle.close()
+        os.replace(self.tmp_file, filepath)
+        self.write_seconds += time.perf_counter() - start
+        iostats.file_written(filepath, self.write_seconds)
+        self.filehandle = None
+        self.tmp_file = None
+
+    def discard(self):
+        """
+        Abandon the file (if anything has been written to it).
+        """
+        if self.filehandle is not None:
+            self.filehandle.close()
+            os.unlink(self.tmp_file)
+            self.filehandle = None
+            self.tmp_file = None
+
+    def _open(self):
+        self.tmp_file = os.path.join(self.directory, '.entries.%d.%d.tmp' %
+                                     (os.getpid(), next(_counter)))
+        self.filehandle = open(self.tmp_file, 'wb')
+        if self.packed:
+            self.filehandle.write(packedxml.MAGIC)
+        if self.preamble is not None:
+            self._emit(etree.tostring(self.preamble, encoding='UTF-8') +
+                       self.newline)
+
+    def _emit(self, text):
+        start = time.perf_counter()
+        if self.packed:
+            # Compressed a record at a time, just as pack() would
+            self.pending += text
+            self._flush_records()
+        else:
+            self.filehandle.write(text)
+        self.write_seconds += time.perf_counter() - start
+
+    def _flush_records(self, final=False):
+        size = packedxml.RECORD_SIZE
+        while len(self.pending) >= size or (final and self.pending):
+            self.filehandle.write(packedxml.pack_record(self.pending[:size]))
+            del self.pending[:size]
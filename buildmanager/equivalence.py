@@ -0,0 +1,266 @@
+"""
+equivalence - Check that two builds produce the same output
+
+Any parallel, fused or cached way of running the pipeline has to
+produce the same output as running it sequentially. compare_dirs()
+compares two build directories - any of the 0N_* stage directories, the
+frequency build directories, or the final data directory (with its
+subdirectory for each letter) - file by file:
+
+ - files which are byte-for-byte identical are passed without being
+    parsed;
+ - otherwise, each file is read an entry (i.e. a child of the root
+    element) at a time, so that a file is never held in memory in full;
+    files may be XML or packed (see buildmanager.packedxml);
+ - each entry is canonicalized: whitespace-only text is dropped,
+    attributes are sorted, and ID attributes (see ID_ATTRIBUTES) are
+    replaced by the order in which each ID first appears in the entry,
+    since builds with a different ID seed or block size, or which have
+    rebuilt only some files, will have allocated different IDs (see
+    idgenerator);
+ - entries are matched by key (tag, sort code and lemma/form, and how
+    many entries with the same key came before), so entries which have
+    merely moved within a file are still matched up;
+ - files are compared in parallel, in a pool of worker processes.
+
+The first few differences in each file are reported, as a short diff
+of the two canonicalized entries:
+
+    python -m buildmanager.equivalence DIR1 DIR2 [--max-differences 10]
+        [--workers 8] [--exact-ids]
+
+The exit status is 1 if there are any differences. Use --exact-ids for
+stages before cleanAttributes, where the IDs are OED IDs, or for two
+full builds with the same ID settings, which should give the same IDs.
+"""
+
+import os
+import sys
+import filecmp
+import difflib
+import argparse
+import itertools
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from buildmanager import packedxml
+
+# Attributes holding IDs allocated by idgenerator (or referring to them)
+ID_ATTRIBUTES = ('id', 'wordclassId', 'typeId')
+# Child elements whose text identifies an entry
+KEY_ELEMENTS = ('lemma', 'form')
+MAX_DIFFERENCES = 10
+# Lines of diff shown for each entry that differs
+DIFF_LINES = 12
+
+
+def compare_dirs(dir1, dir2, max_differences=MAX_DIFFERENCES, workers=None,
+                 normalize_ids=True):
+    """
+    Compare every XML file in dir1 and dir2 (and their subdirectories);
+    return a list of results, one for each file which differs.
+
+    Each result is a dict: 'file' (path relative to the directories),
+    'differences' (total number of entries which differ), and 'details'
+    (up to max_differences descriptions of the differences).
+    """
+    files1 = set(_xml_files(dir1))
+    files2 = set(_xml_files(dir2))
+    results = []
+    for filename in sorted(files1 ^ files2):
+        side = 'first' if filename in files1 else 'second'
+        results.append({'file': filename, 'differences': 1,
+                        'details': ['file only in %s directory' % side]})
+
+    pairs = [(os.path.join(dir1, f), os.path.join(dir2, f), f)
+             for f in sorted(files1 & files2)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(pairs) > 1:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(pairs)),
+                                 mp_context=context) as executor:
+            compared = list(executor.map(
+                _compare_pair, pairs,
+                itertools.repeat(max_differences),
+                itertools.repeat(normalize_ids),
+                chunksize=max(1, len(pairs) // (workers * 4))))
+    else:
+        compared = [_compare_pair(pair, max_differences, normalize_ids)
+                    for pair in pairs]
+    results.extend([result for result in compared if result['differences']])
+    return sorted(results, key=lambda result: result['file'])
+
+
+def _compare_pair(pair, max_differences, normalize_ids):
+    path1, path2, filename = pair
+    if filecmp.cmp(path1, path2, shallow=False):
+        return {'file': filename, 'differences': 0, 'details': []}
+    result = compare_files(path1, path2, max_differences=max_differences,
+                           normalize_ids=normalize_ids)
+    result['file'] = filename
+    return result
+
+
+def compare_files(path1, path2, max_differences=MAX_DIFFERENCES,
+                  normalize_ids=True):
+    """
+    Compare two XML files entry by entry; return a dict with the number
+    of entries which differ, and up to max_differences descriptions.
+    """
+    result = {'file': path1, 'differences': 0, 'details': []}
+
+    def record(description):
+        result['differences'] += 1
+        if len(result['details']) < max_differences:
+            result['details'].append(description)
+
+    # Entries from either file which haven't been matched yet; as long as
+    #  the two files are in the same order, these stay (nearly) empty
+    pending = ({}, {})
+    for items in itertools.zip_longest(read_entries(path1, normalize_ids),
+                                       read_entries(path2, normalize_ids)):
+        if (items[0] is not None and items[1] is not None and
+                items[0][0] == items[1][0]):
+            if items[0][1] != items[1][1]:
+                record(_describe_change(items[0][0], items[0][1],
+                                        items[1][1]))
+            continue
+        for side, item in enumerate(items):
+            if item is None:
+                continue
+            key, lines = item
+            other = pending[1 - side]
+            if key in other:
+                other_lines = other.pop(key)
+                pair = (lines, other_lines) if side == 0 else (other_lines,
+                                                               lines)
+                if pair[0] != pair[1]:
+                    record(_describe_change(key, *pair))
+            else:
+                pending[side][key] = lines
+    for side, name in ((0, 'first'), (1, 'second')):
+        for key in pending[side]:
+            record('%s: only in %s file' % (_format_key(key), name))
+    return result
+
+
+def read_entries(filepath, normalize_ids=True):
+    """
+    Yield (key, canonical lines) for the root element (without its
+    children), and then for each entry in the file.
+    """
+    occurrences = defaultdict(int)
+    depth = 0
+    for event, node in packedxml.iterparse(filepath, events=('start', 'end'),
+                                           remove_blank_text=True,
+                                           remove_comments=True):
+        if event == 'start':
+            if depth == 0:
+                yield (('root',), [_element_line(node, 0, {}, False)])
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        base_key = _entry_key(node)
+        occurrences[base_key] += 1
+        lines = []
+        _canonicalize(node, 0, lines, {}, normalize_ids)
+        yield (base_key + (occurrences[base_key],), lines)
+        # Free the entry (and any before it) now that it's been read
+        node.clear()
+        while node.getprevious() is not None:
+            del node.getparent()[0]
+
+
+def _entry_key(node):
+    text = None
+    for tag in KEY_ELEMENTS:
+        text = node.findtext(tag)
+        if text is not None:
+            break
+    return (node.tag, node.get('sort') or '', text or '')
+
+
+def _canonicalize(node, depth, lines, ids, normalize_ids):
+    lines.append(_element_line(node, depth, ids, normalize_ids))
+    for child in node:
+        if isinstance(child.tag, str):
+            _canonicalize(child, depth + 1, lines, ids, normalize_ids)
+
+
+def _element_line(node, depth, ids, normalize_ids):
+    attributes = []
+    for name, value in sorted(node.attrib.items()):
+        if normalize_ids and name in ID_ATTRIBUTES:
+            value = ids.setdefault(value, '#%d' % (len(ids) + 1))
+        attributes.append(' %s="%s"' % (name, value))
+    line = '%s<%s%s>' % ('  ' * depth, node.tag, ''.join(attributes))
+    if node.text and node.text.strip():
+        line += node.text
+    if node.tail and node.tail.strip():
+        line += ' +' + node.tail
+    return line
+
+
+def _describe_change(key, lines1, lines2):
+    diff = list(difflib.unified_diff(lines1, lines2, 'first', 'second',
+                                     n=1, lineterm=''))[2:]
+    if len(diff) > DIFF_LINES:
+        diff = diff[:DIFF_LINES] + ['...']
+    return '%s: differs\n%s' % (_format_key(key),
+                                '\n'.join(['    ' + l for l in diff]))
+
+
+def _format_key(key):
+    if key == ('root',):
+        return 'root element'
+    tag, sort, text, occurrence = key
+    return '<%s> "%s" (sort=%s, #%d)' % (tag, text, sort, occurrence)
+
+
+def _xml_files(directory):
+    filenames = []
+    for dirpath, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith('.xml'):
+                filenames.append(os.path.relpath(
+                    os.path.join(dirpath, filename), directory))
+    return filenames
+
+
+def print_report(results, dir1, dir2):
+    if not results:
+        print('No differences between %s and %s' % (dir1, dir2))
+        return
+    for result in results:
+        print('%s: %d difference(s)' % (result['file'],
+                                        result['differences']))
+        for description in result['details']:
+            print('  ' + description)
+        if result['differences'] > len(result['details']):
+            print('  ...')
+    print('%d file(s) differ' % len(results))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the output of two '
+                                     'GEL builds')
+    parser.add_argument('dir1')
+    parser.add_argument('dir2')
+    parser.add_argument('--max-differences', type=int,
+                        default=MAX_DIFFERENCES,
+                        help='number of differences to report for each file')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--exact-ids', action='store_true',
+                        help='compare IDs as they are, rather than '
+                        'normalizing them')
+    args = parser.parse_args()
+    results = compare_dirs(args.dir1, args.dir2,
+                           max_differences=args.max_differences,
+                           workers=args.workers,
+                           normalize_ids=not args.exact_ids)
+    print_report(results, args.dir1, args.dir2)
+    sys.exit(1 if results else 0)
@@ -0,0 +1,88 @@
+"""
+FileIterator - Iterator for GEL build files, with run-report counts
+"""
+
+import os
+import time
+
+from lex.gel.fileiterator import FileIterator as LexFileIterator
+from lex.gel.fileiterator import FileContent
+
+from buildmanager import runreport, iostats, packedxml
+
+# The file currently being processed (used to report errors)
+CURRENT = {'file': None}
+
+
+class FileIterator(LexFileIterator):
+
+    """
+    Drop-in replacement for lex.gel.fileiterator.FileIterator, which also
+    counts the files and entries processed (see buildmanager.runreport),
+    and the files and bytes read and written (see buildmanager.iostats).
+
+    Each file is parsed, and the previous file written out, while
+    the underlying iterator moves on to the next file; the time this
+    takes is recorded as iterator time.
+
+    If build files are being written in packed format (see
+    buildmanager.packedxml), files are read and written here rather
+    than by lex.gel.fileiterator.
+    """
+
+    def iterate(self):
+        if packedxml.output_format() == 'packed':
+            filecontents = self._iterate_packed()
+        else:
+            filecontents = LexFileIterator.iterate(self)
+        previous = None
+        while True:
+            start = time.perf_counter()
+            try:
+                filecontent = next(filecontents)
+            except StopIteration:
+                break
+            finally:
+                iostats.add(iterator_seconds=time.perf_counter() - start)
+            self._account_output(previous)
+            previous = getattr(self, 'in_file', None)
+            iostats.file_read(previous)
+            CURRENT['file'] = previous
+            runreport.count(files=1, entries=len(filecontent.entries))
+            yield filecontent
+        self._account_output(previous)
+        CURRENT['file'] = None
+
+    def _iterate_packed(self):
+        """
+        As LexFileIterator.iterate(), but reading files in either format,
+        and writing them packed.
+        """
+        if self.out_dir:
+            if not os.path.isdir(self.out_dir):
+                os.makedirs(self.out_dir)
+            for filename in os.listdir(self.out_dir):
+                if filename.endswith('.xml'):
+                    os.unlink(os.path.join(self.out_dir, filename))
+        filenames = sorted([f for f in os.listdir(self.in_dir)
+                            if f.endswith('.xml')])
+        for filename in filenames:
+            self.in_file = os.path.join(self.in_dir, filename)
+            if self.verbosity is not None:
+                print('\t%s' % self.in_file)
+            doc = packedxml.parse(self.in_file)
+            yield FileContent(doc)
+            if self.out_dir:
+                with open(os.path.join(self.out_dir, filename),
+                          'wb') as filehandle:
+                    filehandle.write(packedxml.pack(doc))
+
+    def _account_output(self, in_file):
+        out_dir = getattr(self, 'out_dir', None)
+        if in_file and out_dir:
+            iostats.file_written(os.path.join(out_dir,
+                                              os.path.basename(in_file)))
+
+
+def current_file():
+    return CURRENT['file']
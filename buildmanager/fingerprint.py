@@ -0,0 +1,103 @@
+"""
+fingerprint - Hashes of files and directories used by the build cache
+"""
+
+import os
+import json
+import hashlib
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class HashCache(object):
+
+    """
+    Compute content hashes of files and directories, remembering the
+    size and modification time of each file hashed so that unchanged
+    files don't need to be read again next time.
+
+    Hidden files and directories (e.g. the build cache itself) are
+    ignored when hashing a directory. If no filepath is given, nothing
+    is remembered beyond the life of the HashCache.
+    """
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.hashes = {}
+        self.modified = False
+        if filepath is not None and os.path.isfile(filepath):
+            with open(filepath) as filehandle:
+                self.hashes = json.load(filehandle)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.hashes.get(key)
+        if cached and cached[:2] == signature:
+            return cached[2]
+        digest = hash_file(path)
+        self.hashes[key] = signature + [digest]
+        self.modified = True
+        return digest
+
+    def path_hash(self, path, content=True):
+        """
+        Return a hash for a file or directory (or None if the path
+        doesn't exist).
+
+        If content is False, the hash is based only on the names, sizes
+        and modification times of the files, so that very large resource
+        directories don't have to be read in full.
+        """
+        if path is None or not os.path.exists(path):
+            return None
+        if os.path.isfile(path):
+            return self._member_hash(path, content)
+        digest = hashlib.sha1()
+        for filepath in _walk(path):
+            digest.update(os.path.relpath(filepath, path).encode('utf8'))
+            digest.update(self._member_hash(filepath, content).encode('utf8'))
+        return digest.hexdigest()
+
+    def _member_hash(self, path, content):
+        if content:
+            return self.file_hash(path)
+        stat = os.stat(path)
+        return '%d:%d' % (stat.st_size, stat.st_mtime_ns)
+
+    def save(self):
+        if not self.modified or self.filepath is None:
+            return
+        # Several stages may be saving at once, so merge in anything
+        #  saved by the others, and write via a temporary file.
+        if os.path.isfile(self.filepath):
+            with open(self.filepath) as filehandle:
+                saved = json.load(filehandle)
+            saved.update(self.hashes)
+            self.hashes = saved
+        tmp_file = '%s.%d.tmp' % (self.filepath, os.getpid())
+        with open(tmp_file, 'w') as filehandle:
+            json.dump(self.hashes, filehandle)
+        os.replace(tmp_file, self.filepath)
+        self.modified = False
+
+
+def hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as filehandle:
+        for block in iter(lambda: filehandle.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text):
+    return hashlib.sha1(text.encode('utf8')).hexdigest()
+
+
+def _walk(path):
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted([d for d in dirnames if not d.startswith('.')])
+        for filename in sorted(filenames):
+            if not filename.startswith('.'):
+                yield os.path.join(dirpath, filename)
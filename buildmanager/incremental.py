@@ -0,0 +1,223 @@
+"""
+incremental - Reprocess only the build files which have changed
+
+Stages such as merge_entries or clean_attributes turn each input file
+(0001.xml, 0002.xml, ...) into an output file of the same name. Each
+time such a stage runs through run_per_file(), a manifest is written to
+its output directory recording the hash of every input file consumed
+and every output file produced. Next time, only input files whose hash
+has changed (or whose output has gone missing) are passed through the
+processor; the other outputs are kept as they are. (If the pipeline is
+run with --force, every file is reprocessed.)
+
+Since each stage records the hashes of its outputs, the next stage
+along can pick them up from the manifest rather than reading the files
+again - and an input change which doesn't change the output stops
+propagating at that point.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+import gelconfig
+from buildmanager.fingerprint import hash_file
+from buildmanager.buildcache import (open_hash_cache, settings_hash,
+                                     opaque_input_hashes)
+from buildmanager import subset, runoptions
+
+MANIFEST_NAME = '.manifest.json'
+
+
+def run_per_file(processor, in_dir, out_dir, *args, **kwargs):
+    """
+    Run processor(in_dir, out_dir, *args), reprocessing only the input
+    files which have changed since the last run.
+
+    Keyword arguments:
+     - stage: the name of the pipeline stage; if the settings or code
+        for the stage have changed, or any of its inputs which aren't
+        files (e.g. the morphology hub: see stages.RESOURCES), every
+        file is reprocessed;
+     - dependencies: other files or directories which affect every
+        output file (e.g. the frequency tables for insert_frequency);
+        if any of these change, every file is reprocessed;
+     - sharded: if True, and gelconfig.FILE_WORKERS is more than 1, the
+        files are spread across several worker processes (see
+        buildmanager.sharding); only for processors which treat each
+        file independently;
+     - resources: module-level resources which each worker process
+        should load (see sharding.run_sharded()).
+    """
+    if subset.is_active():
+        _run_subset(processor, in_dir, out_dir, args, kwargs)
+        return
+
+    input_hashes = directory_hashes(in_dir)
+    dependency_hash = _dependency_hash(kwargs.get('stage'),
+                                       kwargs.get('dependencies', ()))
+    manifest = load_manifest(out_dir)
+
+    if (not gelconfig.INCREMENTAL_FILES or
+            runoptions.get_option('force') or
+            manifest is None or
+            manifest.get('dependencies') != dependency_hash):
+        _run_processor(processor, in_dir, out_dir, args, kwargs)
+        changed = list(input_hashes.keys())
+        removed = []
+    else:
+        output_hashes = directory_hashes(out_dir)
+        changed = [filename for filename, digest in input_hashes.items()
+                   if manifest['inputs'].get(filename) != digest or
+                   manifest['outputs'].get(filename) is None or
+                   output_hashes.get(filename) != manifest['outputs'][filename][2]]
+        removed = [filename for filename in manifest['inputs']
+                   if filename not in input_hashes]
+        if not changed and not removed:
+            print('\tNo changes in %s' % in_dir)
+            return
+        print('\t%d changed and %d removed files in %s' %
+              (len(changed), len(removed), in_dir))
+        if changed:
+            _process_subset(processor, in_dir, out_dir, sorted(changed),
+                            args, kwargs)
+        for filename in removed:
+            if os.path.isfile(os.path.join(out_dir, filename)):
+                os.unlink(os.path.join(out_dir, filename))
+
+    write_manifest(out_dir, input_hashes, dependency_hash)
+
+
+def directory_hashes(directory):
+    """
+    Return a dict of filename -> hash for each XML file in a directory.
+
+    Hashes are taken from the directory's own manifest (written by the
+    stage which produced it) wherever the file's size and modification
+    time still match; anything else is hashed afresh.
+    """
+    return {filename: record[2] for filename, record
+            in _file_records(directory).items()}
+
+
+def load_manifest(directory):
+    filepath = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath) as filehandle:
+        return json.load(filehandle)
+
+
+def write_manifest(directory, input_hashes, dependency_hash=None):
+    manifest = {'inputs': input_hashes,
+                'outputs': _file_records(directory),
+                'dependencies': dependency_hash}
+    tmp_file = os.path.join(directory, MANIFEST_NAME + '.tmp')
+    with open(tmp_file, 'w') as filehandle:
+        json.dump(manifest, filehandle)
+    os.replace(tmp_file, os.path.join(directory, MANIFEST_NAME))
+
+
+def stage_files(in_dir, filenames, scratch_dir):
+    """
+    Make a directory containing (links to) just the named files from
+    in_dir, so that a processor can be run over a subset of files.
+    """
+    if not os.path.isdir(scratch_dir):
+        os.makedirs(scratch_dir)
+    for filename in filenames:
+        os.symlink(os.path.abspath(os.path.join(in_dir, filename)),
+                   os.path.join(scratch_dir, filename))
+
+
+def collect_files(scratch_dir, out_dir):
+    """
+    Move every file written to a scratch output directory into the
+    real output directory, replacing any older versions.
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    for filename in xml_files(scratch_dir):
+        os.replace(os.path.join(scratch_dir, filename),
+                   os.path.join(out_dir, filename))
+
+
+def scratch_directory():
+    return tempfile.mkdtemp(prefix='.scratch-', dir=gelconfig.BUILD_DIR)
+
+
+def _run_subset(processor, in_dir, out_dir, args, options):
+    """
+    Run the processor over the first N input files (or all of them, if
+    the subset doesn't limit the number of files). Since the output is
+    partial, no manifest is kept.
+    """
+    if os.path.isfile(os.path.join(out_dir, MANIFEST_NAME)):
+        os.unlink(os.path.join(out_dir, MANIFEST_NAME))
+    if subset.max_files():
+        for filename in xml_files(out_dir):
+            os.unlink(os.path.join(out_dir, filename))
+        filenames = xml_files(in_dir)[:subset.max_files()]
+        _process_subset(processor, in_dir, out_dir, filenames, args, options)
+    else:
+        _run_processor(processor, in_dir, out_dir, args, options)
+
+
+def _run_processor(processor, in_dir, out_dir, args, options):
+    if options.get('sharded') and gelconfig.FILE_WORKERS > 1:
+        from buildmanager.sharding import run_sharded
+        run_sharded(processor, in_dir, out_dir, *args,
+                    resources=options.get('resources', ()))
+    else:
+        processor(in_dir, out_dir, *args)
+
+
+def _process_subset(processor, in_dir, out_dir, filenames, args, options):
+    if options.get('sharded') and gelconfig.FILE_WORKERS > 1:
+        from buildmanager.sharding import run_sharded
+        run_sharded(processor, in_dir, out_dir, *args,
+                    filenames=filenames,
+                    resources=options.get('resources', ()))
+        return
+    scratch = scratch_directory()
+    try:
+        scratch_in = os.path.join(scratch, 'in')
+        scratch_out = os.path.join(scratch, 'out')
+        stage_files(in_dir, filenames, scratch_in)
+        os.mkdir(scratch_out)
+        processor(scratch_in, scratch_out, *args)
+        collect_files(scratch_out, out_dir)
+    finally:
+        shutil.rmtree(scratch)
+
+
+def _file_records(directory):
+    manifest = load_manifest(directory)
+    recorded = manifest['outputs'] if manifest else {}
+    records = {}
+    for filename in xml_files(directory):
+        filepath = os.path.join(directory, filename)
+        stat = os.stat(filepath)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        if filename in recorded and recorded[filename][:2] == signature:
+            records[filename] = recorded[filename]
+        else:
+            records[filename] = signature + [hash_file(filepath)]
+    return records
+
+
+def _dependency_hash(stage_name, dependencies):
+    hash_cache = open_hash_cache()
+    hashes = [hash_cache.path_hash(path) for path in dependencies]
+    if stage_name is not None:
+        hashes.append(settings_hash(stage_name, hash_cache))
+        hashes.append(opaque_input_hashes(stage_name, hash_cache))
+    hash_cache.save()
+    return hashes
+
+
+def xml_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted([f for f in os.listdir(directory) if f.endswith('.xml')])
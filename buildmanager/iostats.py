@@ -0,0 +1,195 @@
+"""
+iostats - Account for the reading and writing done by each stage
+
+Most stages read every build file, and rewrite it pretty-printed (or
+packed: see buildmanager.packedxml). The readers and writers which
+stages use report what they do here:
+ - buildmanager.fileiterator.FileIterator and FrequencyIterator: files
+    and bytes read and written;
+ - buildmanager.entrywriter.EntryWriter, which the writers that
+    build up files of entries (GenerateBase, OdoAdditions, LemmaLister,
+    AlphaSort's LetterSet) use to stream each entry to disk;
+ - anything else that serializes with serialize() and writes with
+    write_file().
+
+For each stage, the run report then includes the number of files and
+bytes read and written, the time spent parsing, serializing and writing
+(and, for FileIterator, whose parsing and writing happen inside
+lex.gel.fileiterator, the two together), the time left over for the
+stage's own processing, and the number of bytes of whitespace added by
+pretty-printing. Figures from the worker processes of a sharded stage
+are added to the stage's own (see buildmanager.sharding).
+"""
+
+import os
+import re
+import time
+
+from lxml import etree
+
+from buildmanager import runreport
+
+MEGABYTE = 1024 * 1024
+# Whitespace between tags, as added by pretty-printing
+INDENTATION = re.compile(r'>\s+<')
+INDENTATION_BYTES = re.compile(rb'>\s+<')
+
+FIELDS = (
+    'files_read',
+    'bytes_read',
+    'files_written',
+    'bytes_written',
+    'parse_seconds',
+    'serialize_seconds',
+    'write_seconds',
+    # Parsing + writing done inside lex.gel.fileiterator.FileIterator
+    'iterator_seconds',
+    # Characters of pretty-print whitespace in the text serialized
+    'whitespace_chars',
+    'serialized_chars',
+    # Time the stage spent waiting for sharded workers, and the time
+    #  the workers were busy
+    'pool_wait_seconds',
+    'worker_seconds',
+)
+STATS = dict.fromkeys(FIELDS, 0)
+
+
+def add(**kwargs):
+    for field, value in kwargs.items():
+        STATS[field] += value
+
+
+def reset():
+    for field in FIELDS:
+        STATS[field] = 0
+
+
+def collect():
+    """
+    Return the figures for the current process (in a form that can be
+    passed back from a worker process).
+    """
+    return dict(STATS)
+
+
+def merge(stats):
+    add(**stats)
+
+
+def file_read(filepath, parse_seconds=0):
+    """
+    Record that a file has been read (and how long it took to parse).
+    """
+    add(files_read=1, bytes_read=_size(filepath), parse_seconds=parse_seconds)
+
+
+def file_written(filepath, write_seconds=0):
+    add(files_written=1, bytes_written=_size(filepath),
+        write_seconds=write_seconds)
+
+
+def serialize(node, pretty_print=True):
+    """
+    Serialize an element (or element tree) to a string, as
+    etree.tostring(node, encoding='unicode') would, recording the time
+    taken and the amount of pretty-print whitespace.
+    """
+    start = time.perf_counter()
+    text = etree.tostring(node, pretty_print=pretty_print, encoding='unicode')
+    serialized(text, time.perf_counter() - start, pretty_print=pretty_print)
+    return text
+
+
+def serialized(text, seconds, pretty_print=True):
+    """
+    Record the time taken to serialize some text (or UTF-8 bytes), and
+    the amount of pretty-print whitespace in it.
+    """
+    add(serialize_seconds=seconds, serialized_chars=len(text))
+    if pretty_print:
+        if isinstance(text, bytes):
+            stripped = INDENTATION_BYTES.sub(b'><', text)
+        else:
+            stripped = INDENTATION.sub('><', text)
+        add(whitespace_chars=len(text) - len(stripped))
+
+
+def write_file(filepath, text, writer=None):
+    """
+    Write text (or bytes) to a file, using writer(filepath, text) if
+    supplied (e.g. write_atomically), and record the time taken.
+    """
+    start = time.perf_counter()
+    if writer is not None:
+        writer(filepath, text)
+    else:
+        mode = 'wb' if isinstance(text, bytes) else 'w'
+        with open(filepath, mode) as filehandle:
+            filehandle.write(text)
+    file_written(filepath, time.perf_counter() - start)
+
+
+def _size(filepath):
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+def summary(wall_time):
+    """
+    Return the figures for the current stage, suitable for the run
+    report; wall_time is the stage's elapsed time.
+    """
+    io_seconds = (STATS['parse_seconds'] + STATS['serialize_seconds'] +
+                  STATS['write_seconds'] + STATS['iterator_seconds'])
+    # Time spent by this process and by any workers, less the time this
+    #  process spent waiting for the workers
+    busy_seconds = (wall_time - STATS['pool_wait_seconds'] +
+                    STATS['worker_seconds'])
+    if STATS['serialized_chars']:
+        whitespace_share = round(STATS['whitespace_chars'] /
+                                 STATS['serialized_chars'], 3)
+    else:
+        whitespace_share = None
+    return {
+        'files_read': STATS['files_read'],
+        'mb_read': round(STATS['bytes_read'] / MEGABYTE, 1),
+        'files_written': STATS['files_written'],
+        'mb_written': round(STATS['bytes_written'] / MEGABYTE, 1),
+        'parse_seconds': round(STATS['parse_seconds'], 2),
+        'serialize_seconds': round(STATS['serialize_seconds'], 2),
+        'write_seconds': round(STATS['write_seconds'], 2),
+        'iterator_seconds': round(STATS['iterator_seconds'], 2),
+        'process_seconds': round(max(busy_seconds - io_seconds, 0), 2),
+        'whitespace_mb': round(STATS['whitespace_chars'] / MEGABYTE, 1),
+        'whitespace_share': whitespace_share,
+    }
+
+
+class IOAccount(object):
+
+    """
+    Context manager which starts each stage with clean figures, and adds
+    them to the stage's run report at the end.
+    """
+
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+        self.start = None
+
+    def __enter__(self):
+        reset()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        figures = summary(time.time() - self.start)
+        reset()
+        if figures['files_read'] or figures['files_written']:
+            print('\tRead %d files (%0.1f MB), wrote %d files (%0.1f MB)' %
+                  (figures['files_read'], figures['mb_read'],
+                   figures['files_written'], figures['mb_written']))
+        runreport.annotate('io', figures)
+        return False
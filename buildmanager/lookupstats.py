@@ -0,0 +1,268 @@
+"""
+lookupstats - Count the lookups made on each resource
+
+With lookup statistics switched on (pipeline.py --lookup-stats), each
+call to one of the lookup methods listed in LOOKUPS (on a resource from
+the registry), and to any function decorated with counted(), is counted
+as a hit or a miss and timed. At the end of each stage, a table of the
+calls, hits, misses and cumulative time for each lookup is printed and
+included in the stage's entry in the run report. For functions with an
+lru_cache, hits and misses are cache hits and misses, and the cache's
+size and limit are reported too - so an undersized cache shows up as a
+high miss rate with a full cache.
+
+A lookup counts as a miss if it returns None or an empty value. Calls
+made in the worker processes of a sharded stage are added to the
+stage's own figures (see buildmanager.sharding). Calls answered by the
+resource daemon are counted (and timed, including the round trip) in
+the process which made them.
+"""
+
+import time
+from functools import wraps
+
+from buildmanager.runoptions import get_option
+
+# Resource name -> lookup methods counted on that resource
+LOOKUPS = {
+    'morphology': ('inflect_fuzzy',),
+    'variants_cache': ('id_exists', 'find'),
+    'link_manager.ode': ('translate_id', 'find_content', 'find_definition',
+                         'find_derivative', 'find_lemma'),
+    'link_manager.noad': ('translate_id', 'find_content', 'find_definition',
+                          'find_derivative', 'find_lemma'),
+    'weighted_size': ('find_size',),
+    'frequency_memo': ('find_frequencies',),
+    'bnc_probability': ('find',),
+    'oec_pos_probability': ('find',),
+    'oec_lempos_probability': ('find',),
+}
+
+# Lookup name -> [calls, hits, misses, seconds], for the current stage
+STATS = {}
+# Lookup name -> lru-cached function, for functions decorated with counted()
+CACHES = {}
+
+
+def is_enabled():
+    return bool(get_option('lookup_stats'))
+
+
+def reset():
+    STATS.clear()
+
+
+def collect():
+    """
+    Return the figures for the current stage (in a form that can be
+    passed back from a worker process).
+    """
+    return {name: list(figures) for name, figures in STATS.items()}
+
+
+def merge(stats):
+    """
+    Add figures collected in another process to the current stage's.
+    """
+    for name, figures in stats.items():
+        totals = _figures(name)
+        for i, value in enumerate(figures):
+            totals[i] += value
+
+
+def record(name, seconds, results):
+    totals = _figures(name)
+    totals[0] += len(results)
+    misses = len([result for result in results if _is_miss(result)])
+    totals[1] += len(results) - misses
+    totals[2] += misses
+    totals[3] += seconds
+
+
+def _figures(name):
+    try:
+        return STATS[name]
+    except KeyError:
+        STATS[name] = [0, 0, 0, 0.0]
+        return STATS[name]
+
+
+def _is_miss(result):
+    if result is None:
+        return True
+    if isinstance(result, (int, float)):
+        return False
+    try:
+        return not result
+    except ValueError:
+        # e.g. a numpy array
+        return False
+
+
+def instrument(name, instance):
+    """
+    Wrap a resource so that its lookups are counted, if lookup
+    statistics are switched on and the resource has lookups to count;
+    otherwise return the resource itself.
+    """
+    if not is_enabled() or name not in LOOKUPS:
+        return instance
+    return CountingResource(name, instance)
+
+
+class CountingResource(object):
+
+    """
+    Stand-in for a resource which counts and times calls to its lookup
+    methods, and passes everything else straight through.
+    """
+
+    def __init__(self, name, instance):
+        self._resource_name = name
+        self._resource = instance
+
+    def __getattr__(self, attribute):
+        value = getattr(self._resource, attribute)
+        if attribute not in LOOKUPS[self._resource_name]:
+            return value
+        name = '%s.%s' % (self._resource_name, attribute)
+
+        def lookup(*args, **kwargs):
+            start = time.perf_counter()
+            result = value(*args, **kwargs)
+            record(name, time.perf_counter() - start, (result,))
+            return result
+        return lookup
+
+    def call_many(self, method, arguments):
+        # Batched lookups (see buildmanager.daemon.call_many)
+        from buildmanager import daemon
+        start = time.perf_counter()
+        results = daemon.call_many(self._resource, method, arguments)
+        record('%s.%s' % (self._resource_name, method),
+               time.perf_counter() - start, results)
+        return results
+
+    def __repr__(self):
+        return '<counted %r>' % (self._resource,)
+
+
+def counted(name):
+    """
+    Decorator which counts and times calls to a lookup function. If the
+    function has an lru_cache, hits and misses are the cache's.
+    """
+    def decorator(function):
+        cached = hasattr(function, 'cache_info')
+        if cached:
+            CACHES[name] = function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return function(*args, **kwargs)
+            if cached:
+                hits_before = function.cache_info().hits
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            if cached:
+                hit = function.cache_info().hits > hits_before
+                totals = _figures(name)
+                totals[0] += 1
+                totals[1 if hit else 2] += 1
+                totals[3] += seconds
+            else:
+                record(name, seconds, (result,))
+            return result
+
+        if cached:
+            wrapper.cache_info = function.cache_info
+            wrapper.cache_clear = function.cache_clear
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    Return the figures for the current stage as a dict of lookup name ->
+    figures, suitable for the run report.
+    """
+    lookups = {}
+    for name, (calls, hits, misses, seconds) in sorted(STATS.items()):
+        lookups[name] = {
+            'calls': calls,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / calls, 3) if calls else None,
+            'seconds': round(seconds, 3),
+            'usec_per_call': round(1e6 * seconds / calls, 1) if calls else None,
+        }
+        if name in CACHES:
+            info = CACHES[name].cache_info()
+            lookups[name]['cache_size'] = info.currsize
+            lookups[name]['cache_limit'] = info.maxsize
+    return lookups
+
+
+def print_table(lookups):
+    print('%-40s %10s %10s %10s %6s %9s' % ('lookup', 'calls', 'hits',
+          'misses', 'hit %', 'time (s)'))
+    print('-' * 90)
+    for name, figures in sorted(lookups.items(),
+                                key=lambda item: -item[1]['seconds']):
+        if figures['hit_rate'] is None:
+            hit_rate = '-'
+        else:
+            hit_rate = '%.1f' % (100 * figures['hit_rate'])
+        line = '%-40s %10d %10d %10d %6s %9.2f' % (
+            name, figures['calls'], figures['hits'], figures['misses'],
+            hit_rate, figures['seconds'])
+        if 'cache_limit' in figures:
+            line += '  (cache %d/%s)' % (figures['cache_size'],
+                                        figures['cache_limit'])
+        print(line)
+
+
+def stage_counter(stage_name):
+    """
+    Return a context manager which counts the stage's lookups, if
+    lookup statistics are switched on; otherwise one which does nothing.
+    """
+    if is_enabled():
+        return LookupCounter(stage_name)
+    return NullCounter()
+
+
+class NullCounter(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class LookupCounter(object):
+
+    """
+    Context manager which starts the stage with clean figures, and
+    prints and reports them at the end.
+    """
+
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+
+    def __enter__(self):
+        reset()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        from buildmanager import runreport
+        lookups = summary()
+        if lookups:
+            print('Lookups in "%s":' % self.stage_name)
+            print_table(lookups)
+        runreport.annotate('lookups', lookups)
+        reset()
+        return False
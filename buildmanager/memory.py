@@ -0,0 +1,209 @@
+"""
+memory - Keep buffering stages within a memory budget
+
+gelconfig.MEMORY_BUDGET_MB sets the amount of memory each stage may use.
+When several stages run at once, or a stage runs several worker
+processes, the budget is shared between them. Stages which hold large
+amounts of data check the budget as they go (see SpillWatch), and spill
+to disk or flush their buffers before they run into the OOM killer:
+
+ - LemmaLister spills the forms collected so far to disk, and merges
+    them back in one letter at a time;
+ - AlphaSort.sort_in_place() sorts a letter in runs, and merges them;
+ - FrequencyMemo and WeightedSize keep their tables in a SpillableDict,
+    which moves to an on-disk shelf once the budget is reached;
+ - sharded stages start fewer workers if they wouldn't all fit.
+"""
+
+import os
+import shutil
+import atexit
+import shelve
+import pickle
+import resource
+import tempfile
+
+import gelconfig
+from buildmanager.runoptions import get_option, set_options
+
+MEGABYTE = 1024 * 1024
+# How often (number of items stored) a SpillableDict checks the budget
+CHECK_INTERVAL = 10000
+# How far the process must have grown since a structure was started (or
+#  last spilled) before the structure is spilled, even if the process
+#  was over budget to begin with
+MINIMUM_GROWTH_MB = 16
+
+
+def budget_mb():
+    """
+    Return the memory budget for the current process (in MB), or None if
+    there's no limit.
+    """
+    if get_option('memory_budget_mb') is not None:
+        return get_option('memory_budget_mb')
+    return gelconfig.MEMORY_BUDGET_MB
+
+
+def set_budget(megabytes):
+    set_options(memory_budget_mb=megabytes)
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as filehandle:
+            pages = int(filehandle.read().split()[1])
+        return pages * resource.getpagesize() / MEGABYTE
+    except (IOError, OSError):
+        # Fall back on the peak, which errs on the side of caution
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if os.uname().sysname == 'Darwin':
+            return maxrss / MEGABYTE
+        return maxrss / 1024
+
+
+class SpillWatch(object):
+
+    """
+    Tells a stage when the structure it's building has reached the
+    memory budget, and should be spilled to disk.
+
+    Memory freed by a spill mostly stays with the process, to be reused,
+    so the process's RSS doesn't drop back afterwards; compared with the
+    budget alone, it would say that every later check was over budget,
+    and every run after the first would be spilled however small. So
+    the watch notes the RSS when it's created and after each spill
+    (call spilled()), and the budget is only reached once the process
+    is over budget *and* has grown since then - i.e. once the structure
+    has outgrown the memory it was able to reuse.
+    """
+
+    def __init__(self):
+        self.baseline = current_rss_mb()
+
+    def over_budget(self):
+        if budget_mb() is None:
+            return False
+        return current_rss_mb() > max(budget_mb(),
+                                      self.baseline + MINIMUM_GROWTH_MB)
+
+    def spilled(self):
+        self.baseline = current_rss_mb()
+
+
+def affordable_workers(requested, per_worker_mb):
+    """
+    Return the number of worker processes (up to the number requested)
+    which will fit in what's left of the budget, allowing per_worker_mb
+    for each.
+    """
+    if budget_mb() is None:
+        return requested
+    available = budget_mb() - current_rss_mb()
+    workers = max(1, min(requested, int(available // per_worker_mb)))
+    if workers < requested:
+        print('\tMemory budget allows %d worker(s) rather than %d' %
+              (workers, requested))
+    return workers
+
+
+def worker_budget(workers):
+    """
+    Return the share of the remaining budget for each of a number of
+    worker processes (or None if there's no limit).
+    """
+    if budget_mb() is None:
+        return None
+    return max(budget_mb() - current_rss_mb(), 0) / workers
+
+
+def spill_directory():
+    """
+    Return a new temporary directory for spilled data; it's removed when
+    the process exits.
+    """
+    directory = tempfile.mkdtemp(prefix='.spill-', dir=gelconfig.BUILD_DIR)
+    atexit.register(shutil.rmtree, directory, True)
+    return directory
+
+
+def dump_run(filepath, items):
+    """
+    Write a sequence of items to a spill file, to be read back (in the
+    same order) by load_run().
+    """
+    with open(filepath, 'wb') as filehandle:
+        for item in items:
+            pickle.dump(item, filehandle, pickle.HIGHEST_PROTOCOL)
+
+
+def load_run(filepath):
+    with open(filepath, 'rb') as filehandle:
+        while True:
+            try:
+                yield pickle.load(filehandle)
+            except EOFError:
+                break
+
+
+class SpillableDict(object):
+
+    """
+    Mapping which is kept in memory until the memory budget is reached,
+    after which its contents are moved to an on-disk shelf, and any
+    further items go straight to the shelf.
+
+    Keys are converted to strings once on the shelf, so lookups work
+    the same either way; values should not be modified once stored.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.data = {}
+        self.shelf = None
+        self.count = 0
+        # Started when the first item is stored, since the dict may be
+        #  created long before it's filled
+        self.watch = None
+
+    def __setitem__(self, key, value):
+        if self.shelf is not None:
+            self.shelf[str(key)] = value
+            return
+        if self.watch is None:
+            self.watch = SpillWatch()
+        self.data[key] = value
+        self.count += 1
+        if self.count % CHECK_INTERVAL == 0 and self.watch.over_budget():
+            self.spill()
+
+    def __getitem__(self, key):
+        if self.shelf is not None:
+            return self.shelf[str(key)]
+        return self.data[key]
+
+    def __contains__(self, key):
+        if self.shelf is not None:
+            return str(key) in self.shelf
+        return key in self.data
+
+    def __len__(self):
+        if self.shelf is not None:
+            return len(self.shelf)
+        return len(self.data)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def spill(self):
+        print('\tMemory budget reached: moving %s to disk' % self.name)
+        filepath = os.path.join(spill_directory(), self.name)
+        self.shelf = shelve.open(filepath, protocol=pickle.HIGHEST_PROTOCOL)
+        # (exit handlers run last-first, so this runs before the spill
+        #  directory is removed)
+        atexit.register(self.shelf.close)
+        for key, value in self.data.items():
+            self.shelf[str(key)] = value
+        self.data = {}
@@ -0,0 +1,179 @@
+"""
+memorytrace - Find out where a stage's memory goes
+
+With memory diagnostics switched on (pipeline.py --memory-diagnostics),
+each stage is run with tracemalloc tracing allocations, and snapshots
+are taken:
+ - at the start of the stage;
+ - at the peak: a background thread watches the traced total, and takes
+    a new snapshot each time it climbs well past the last one;
+ - at the end of the stage.
+
+The top allocation sites (by size and by number of blocks) in each
+snapshot, and the differences between the start snapshot and the peak
+and end snapshots, are written to REPORT_DIR/memory/<run_id>.<stage>.json;
+the largest sites at the peak are also included in the stage's entry in
+the run report.
+
+Tracing slows a stage down and adds to its memory use, so this is
+opt-in. Only the stage's own process is traced, not the worker
+processes of a sharded stage.
+"""
+
+import os
+import json
+import threading
+import tracemalloc
+
+from buildmanager import runreport
+from buildmanager.runreport import REPORT_DIR
+from buildmanager.runoptions import get_option
+
+MEMORY_DIR = os.path.join(REPORT_DIR, 'memory')
+# Number of allocation sites listed in each table
+TOP_SITES = 25
+# Seconds between checks of the traced total
+POLL_INTERVAL = 0.5
+# A new peak snapshot is taken when the traced total exceeds the last
+#  peak snapshot by this proportion
+PEAK_GROWTH = 0.1
+MEGABYTE = 1024 * 1024
+
+# Allocations made by tracemalloc itself, and by importing, are not of
+#  interest
+FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),
+           tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+           tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+           tracemalloc.Filter(False, '<unknown>'))
+
+
+def stage_tracer(stage_name, run_id):
+    """
+    Return a context manager which traces the stage's memory use, if
+    memory diagnostics are switched on; otherwise one which does nothing.
+    """
+    if get_option('memory_diagnostics') and not tracemalloc.is_tracing():
+        return MemoryTracer(stage_name, run_id)
+    return NullTracer()
+
+
+class NullTracer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class MemoryTracer(object):
+
+    """
+    Context manager which traces allocations during a stage, and writes
+    out the snapshots' top allocation sites.
+    """
+
+    def __init__(self, stage_name, run_id):
+        self.stage_name = stage_name
+        self.run_id = run_id or 'norun'
+        self.snapshots = {}
+        self.peak_size = 0
+        self.stopping = threading.Event()
+        self.watcher = None
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.snapshots['start'] = _snapshot()
+        self.watcher = threading.Thread(target=self._watch, daemon=True)
+        self.watcher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopping.set()
+        self.watcher.join()
+        self._check_peak()
+        self.snapshots['end'] = _snapshot()
+        tracemalloc.stop()
+        if 'peak' not in self.snapshots:
+            self.snapshots['peak'] = self.snapshots['end']
+
+        report = {
+            'stage': self.stage_name,
+            'run_id': self.run_id,
+            'peak_traced_mb': round(self.peak_size / MEGABYTE, 1),
+        }
+        for name in ('start', 'peak', 'end'):
+            report[name] = _top_sites(self.snapshots[name])
+        for name in ('peak', 'end'):
+            report['%s_minus_start' % name] = _differences(
+                self.snapshots[name], self.snapshots['start'])
+        filepath = _output_file(self.stage_name, self.run_id)
+        with open(filepath, 'w') as filehandle:
+            json.dump(report, filehandle, indent=2)
+
+        runreport.annotate('memory_diagnostics', {
+            'file': filepath,
+            'peak_traced_mb': report['peak_traced_mb'],
+            'top_sites_at_peak': report['peak']['by_size'][:5],
+        })
+        print('\tMemory diagnostics written to %s' % filepath)
+        return False
+
+    def _watch(self):
+        while not self.stopping.wait(POLL_INTERVAL):
+            self._check_peak()
+
+    def _check_peak(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.peak_size * (1 + PEAK_GROWTH):
+            self.peak_size = current
+            self.snapshots['peak'] = _snapshot()
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(FILTERS)
+
+
+def _top_sites(snapshot):
+    statistics = snapshot.statistics('lineno')
+    by_count = sorted(statistics, key=lambda s: s.count, reverse=True)
+    return {
+        'total_mb': round(sum([s.size for s in statistics]) / MEGABYTE, 1),
+        'by_size': [_site(s) for s in statistics[:TOP_SITES]],
+        'by_count': [_site(s) for s in by_count[:TOP_SITES]],
+    }
+
+
+def _differences(snapshot, baseline):
+    differences = snapshot.compare_to(baseline, 'lineno')
+    by_count = sorted(differences, key=lambda s: abs(s.count_diff),
+                      reverse=True)
+    return {
+        'by_size': [_site_difference(s) for s in differences[:TOP_SITES]],
+        'by_count': [_site_difference(s) for s in by_count[:TOP_SITES]],
+    }
+
+
+def _site(statistic):
+    return {'site': _location(statistic.traceback),
+            'size_kb': round(statistic.size / 1024, 1),
+            'count': statistic.count}
+
+
+def _site_difference(statistic):
+    return {'site': _location(statistic.traceback),
+            'size_kb': round(statistic.size / 1024, 1),
+            'size_diff_kb': round(statistic.size_diff / 1024, 1),
+            'count': statistic.count,
+            'count_diff': statistic.count_diff}
+
+
+def _location(traceback):
+    frame = traceback[0]
+    return '%s:%d' % (frame.filename, frame.lineno)
+
+
+def _output_file(stage_name, run_id):
+    if not os.path.isdir(MEMORY_DIR):
+        os.makedirs(MEMORY_DIR)
+    return os.path.join(MEMORY_DIR, '%s.%s.json' % (run_id, stage_name))
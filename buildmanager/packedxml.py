@@ -0,0 +1,234 @@
+"""
+packedxml - Compact binary format for the intermediate build files
+
+The build files in the 0N_* directories are read by one stage and
+rewritten for the next, so there's no need for them to be pretty-printed
+(or even readable). With gelconfig.INTERMEDIATE_FORMAT = 'packed', they
+are written in a packed format instead:
+
+ - the document is serialized without indentation, as UTF-8;
+ - this is split into records of up to RECORD_SIZE bytes, each
+    compressed with zlib (at a low level, for speed) and written with
+    its length in front;
+ - the compressor is primed with a dictionary of the strings which
+    recur throughout every build file (tag and attribute names,
+    wordclass codes, src values, etc.: see DICTIONARY), so that even the
+    start of each record is encoded compactly.
+
+The files take about a tenth of the disk space. Leaving out the
+indentation saves about as much time as the compression costs, so on a
+local disk a stage takes much the same time either way; the saving is
+in disk space and in time spent waiting on the disk, where the build
+directory is on slower or shared storage.
+
+Files keep their .xml names (so nothing which only lists or hashes the
+files needs to know the format), and parse() accepts either format, so
+a directory can hold a mixture; only the final output (FINAL_DATA_DIR,
+written by alphabetizeOutput) is always XML.
+
+The format is lossless: a packed file unpacked to XML is byte-for-byte
+what the stage would have written in XML mode. To convert files or
+directories one way or the other:
+
+    python -m buildmanager.packedxml unpack IN OUT
+    python -m buildmanager.packedxml pack IN OUT
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import argparse
+
+from lxml import etree
+
+import gelconfig
+from buildmanager import iostats, runoptions
+
+MAGIC = b'GELPACK1'
+FORMATS = ('xml', 'packed')
+RECORD_SIZE = 256 * 1024
+COMPRESSION_LEVEL = 1
+LENGTH = struct.Struct('<I')
+PARSER = etree.XMLParser(remove_blank_text=True)
+
+# Strings which recur in every build file; the most common go last,
+#  since zlib encodes nearer matches more compactly
+DICTIONARY = b''.join([
+    b'<definitions><definition>',
+    b'<resourceSet><resource code="oed" xrid="" xnode="" type="entry"/>',
+    b'<resource code="ode" xrid="ode"/><resource code="noad" xrid="noad"/>',
+    b' locale="uk" locale="us" fragment="true" regional="true"',
+    b' irregular="true" obs="true" oedHeadword="true" tag="s1"',
+    b' src="oed_unrev" src="ode" src="noad" src="oed_rev"',
+    b'<e oedId="" oedLexid="" parentId="" odoLexid="">',
+    b'<lemma src="oed_rev"></lemma><wordclassSet>',
+    b'<wordclass penn="NP"/><wordclass penn="UH"/><wordclass penn="RB"/>',
+    b'<wordclass penn="JJR"/><wordclass penn="JJS"/>',
+    b'<wordclass penn="VBG"/><wordclass penn="VBN"/>',
+    b'<wordclass penn="VBD"/><wordclass penn="VBZ"/>',
+    b'<wordclass penn="VB"/><wordclass penn="JJ"/>',
+    b'<morphSetBlock><morphSet><date start="" end=""/>',
+    b'</morphSet></morphSetBlock></wordclassSet></e>',
+    b'<wordclass penn="NNS"/></type>',
+    b'<type computed="true" id="" sort=""><form></form>',
+    b'<wordclass penn="NN"/></type><type><form></form>',
+])
+
+
+def output_format():
+    """
+    Return the format in which build files should be written: the
+    run's 'intermediate_format' option if set (see
+    buildmanager.runoptions), or else gelconfig.INTERMEDIATE_FORMAT.
+    """
+    return (runoptions.get_option('intermediate_format') or
+            gelconfig.INTERMEDIATE_FORMAT)
+
+
+def is_packed(filepath):
+    with open(filepath, 'rb') as filehandle:
+        return filehandle.read(len(MAGIC)) == MAGIC
+
+
+def pack(node):
+    """
+    Return an element or element tree as packed bytes.
+    """
+    text = etree.tostring(node, encoding='UTF-8')
+    chunks = [MAGIC]
+    for offset in range(0, len(text), RECORD_SIZE):
+        chunks.append(pack_record(text[offset:offset + RECORD_SIZE]))
+    return b''.join(chunks)
+
+
+def pack_record(text):
+    """
+    Return a single record (of up to RECORD_SIZE bytes of serialized
+    XML) compressed, with its length in front.
+    """
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=DICTIONARY)
+    record = compressor.compress(text) + compressor.flush()
+    return LENGTH.pack(len(record)) + record
+
+
+def records(data):
+    """
+    Yield the decompressed records of packed bytes, in order.
+    """
+    offset = len(MAGIC)
+    while offset < len(data):
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        decompressor = zlib.decompressobj(zdict=DICTIONARY)
+        yield decompressor.decompress(data[offset:offset + length])
+        offset += length
+
+
+def unpack(data, parser=PARSER):
+    """
+    Return the element tree from packed bytes.
+    """
+    return etree.fromstring(b''.join(records(data)), parser).getroottree()
+
+
+def parse(filepath, parser=PARSER):
+    """
+    Parse a build file in either format, returning an element tree.
+    """
+    with open(filepath, 'rb') as filehandle:
+        data = filehandle.read()
+    if data.startswith(MAGIC):
+        return unpack(data, parser)
+    return etree.fromstring(data, parser).getroottree()
+
+
+def iterparse(filepath, events=('end',), **kwargs):
+    """
+    Like etree.iterparse(), for a build file in either format; packed
+    files are decompressed and parsed a record at a time.
+    """
+    if not is_packed(filepath):
+        for item in etree.iterparse(filepath, events=events, **kwargs):
+            yield item
+        return
+    parser = etree.XMLPullParser(events=events, **kwargs)
+    with open(filepath, 'rb') as filehandle:
+        data = filehandle.read()
+    for record in records(data):
+        parser.feed(record)
+        for item in parser.read_events():
+            yield item
+    parser.close()
+    for item in parser.read_events():
+        yield item
+
+
+def write_document(filepath, node, writer=None):
+    """
+    Write an element or element tree to a build file, in the current
+    output format (pretty-printed XML, or packed), recording the time
+    taken (see buildmanager.iostats). writer is as for
+    iostats.write_file().
+    """
+    if output_format() == 'packed':
+        start = time.perf_counter()
+        data = pack(node)
+        iostats.add(serialize_seconds=time.perf_counter() - start)
+        iostats.write_file(filepath, data, writer=writer)
+    else:
+        iostats.write_file(filepath, iostats.serialize(node,
+                                                       pretty_print=True),
+                           writer=writer)
+
+
+def to_xml(filepath):
+    """
+    Return the contents of a build file (in either format) as XML, as
+    written in XML mode.
+    """
+    return etree.tounicode(parse(filepath), pretty_print=True)
+
+
+def convert(source, destination, packed):
+    """
+    Convert a build file, or every build file in a directory (and its
+    subdirectories), to packed format or to XML; return the number of
+    files converted.
+    """
+    if os.path.isdir(source):
+        count = 0
+        for dirpath, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                if filename.endswith('.xml'):
+                    relative = os.path.relpath(os.path.join(dirpath, filename),
+                                               source)
+                    count += convert(os.path.join(source, relative),
+                                     os.path.join(destination, relative),
+                                     packed)
+        return count
+    directory = os.path.dirname(destination)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    if packed:
+        with open(destination, 'wb') as filehandle:
+            filehandle.write(pack(parse(source)))
+    else:
+        with open(destination, 'w') as filehandle:
+            filehandle.write(to_xml(source))
+    return 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert build files '
+                                     'between XML and packed format')
+    parser.add_argument('direction', choices=('pack', 'unpack'))
+    parser.add_argument('source', help='build file or directory')
+    parser.add_argument('destination', help='file or directory to write')
+    args = parser.parse_args()
+    if not os.path.exists(args.source):
+        sys.exit('%s not found' % args.source)
+    converted = convert(args.source, args.destination,
+                        packed=args.direction == 'pack')
+    print('%d file(s) converted' % converted)
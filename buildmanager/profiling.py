@@ -0,0 +1,231 @@
+"""
+profiling - Profile selected pipeline stages
+
+Stages named on the command line (pipeline.py --profile) are profiled
+while they run, in one of two modes:
+ - 'cprofile': deterministic profiling with cProfile; exact call counts,
+    but slows the stage down considerably;
+ - 'sampling': a background thread samples the stage's call stack every
+    few milliseconds; much lower overhead, statistical timings.
+
+Either way, two files are written to REPORT_DIR/profiles, tagged with
+the run ID and stage name:
+ - <run_id>.<stage>.pstats: load with pstats.Stats (or snakeviz, etc.);
+ - <run_id>.<stage>.collapsed.txt: one line per call stack
+    ('outer;inner;innermost count'), for flamegraph.pl, speedscope, etc.
+    Counts are in microseconds.
+
+Only the stage's own process is profiled, not the worker processes of a
+sharded stage; profile these with FILE_WORKERS = 1.
+"""
+
+import os
+import sys
+import time
+import pstats
+import marshal
+import cProfile
+import threading
+from collections import defaultdict
+
+from buildmanager.runreport import REPORT_DIR
+from buildmanager.runoptions import get_option
+
+PROFILE_DIR = os.path.join(REPORT_DIR, 'profiles')
+MODES = ('cprofile', 'sampling')
+# Seconds between samples in sampling mode
+SAMPLE_INTERVAL = 0.005
+# Deepest call stack followed when collapsing cProfile's call graph
+MAX_DEPTH = 60
+
+
+def stage_profiler(stage_name, run_id):
+    """
+    Return a context manager which profiles the stage, if it's one of
+    the stages to be profiled in this run; otherwise one which does
+    nothing.
+    """
+    settings = get_option('profile') or {}
+    stages = settings.get('stages') or ()
+    if stage_name not in stages and 'all' not in stages:
+        return NullProfiler()
+    if settings.get('mode') == 'sampling':
+        return SamplingProfiler(stage_name, run_id)
+    return DeterministicProfiler(stage_name, run_id)
+
+
+def output_files(stage_name, run_id):
+    """
+    Return the paths of the pstats file and the collapsed-stack file
+    for a stage.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        os.makedirs(PROFILE_DIR)
+    stem = os.path.join(PROFILE_DIR, '%s.%s' % (run_id, stage_name))
+    return stem + '.pstats', stem + '.collapsed.txt'
+
+
+class NullProfiler(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class DeterministicProfiler(object):
+
+    """
+    Profile a stage with cProfile.
+    """
+
+    def __init__(self, stage_name, run_id):
+        self.stage_name = stage_name
+        self.run_id = run_id or 'norun'
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        pstats_file, collapsed_file = output_files(self.stage_name,
+                                                   self.run_id)
+        self.profile.dump_stats(pstats_file)
+        stacks = collapse_call_graph(pstats.Stats(self.profile).stats)
+        write_collapsed(collapsed_file, stacks)
+        print('\tProfile written to %s' % pstats_file)
+        return False
+
+
+class SamplingProfiler(object):
+
+    """
+    Profile a stage by sampling its call stack from a background thread.
+    """
+
+    def __init__(self, stage_name, run_id, interval=SAMPLE_INTERVAL):
+        self.stage_name = stage_name
+        self.run_id = run_id or 'norun'
+        self.interval = interval
+        # Call stack -> [number of samples, seconds]
+        self.samples = defaultdict(lambda: [0, 0.0])
+        self.thread_id = None
+        self.stopping = threading.Event()
+        self.sampler = None
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+        self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopping.set()
+        self.sampler.join()
+        pstats_file, collapsed_file = output_files(self.stage_name,
+                                                   self.run_id)
+        with open(pstats_file, 'wb') as filehandle:
+            marshal.dump(sampled_stats(self.samples), filehandle)
+        write_collapsed(collapsed_file,
+                        {';'.join([_label(f) for f in stack]):
+                         int(seconds * 1000000)
+                         for stack, (_, seconds) in self.samples.items()})
+        print('\tProfile (%d samples) written to %s' %
+              (sum([n for n, _ in self.samples.values()]), pstats_file))
+        return False
+
+    def _sample(self):
+        # Each sample stands for the time since the previous one (which
+        #  may be longer than the interval, if the stage holds the GIL)
+        last = time.time()
+        while not self.stopping.wait(self.interval):
+            now = time.time()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno,
+                              code.co_name))
+                frame = frame.f_back
+            if stack:
+                # Outermost first
+                sample = self.samples[tuple(reversed(stack))]
+                sample[0] += 1
+                sample[1] += elapsed
+
+
+def sampled_stats(samples):
+    """
+    Convert sampled stacks into the dictionary format used by pstats:
+    {function: (primitive calls, calls, own time, cumulative time,
+    {caller: (...)})}, where 'calls' are the number of samples in which
+    the function appears.
+    """
+    own = defaultdict(float)
+    inclusive = defaultdict(lambda: [0, 0.0])
+    edges = defaultdict(lambda: [0, 0.0])
+    for stack, (n, seconds) in samples.items():
+        own[stack[-1]] += seconds
+        for key, totals in ([(f, inclusive) for f in set(stack)] +
+                            [(e, edges) for e in set(zip(stack, stack[1:]))]):
+            totals[key][0] += n
+            totals[key][1] += seconds
+    callers = defaultdict(dict)
+    for (caller, callee), (n, seconds) in edges.items():
+        callers[callee][caller] = (n, n, 0.0, seconds)
+    return {function: (n, n, own[function], seconds, callers[function])
+            for function, (n, seconds) in inclusive.items()}
+
+
+def collapse_call_graph(stats):
+    """
+    Approximate collapsed stacks from cProfile's call graph (which only
+    records caller-callee pairs, not whole stacks): each function's own
+    time is shared among its callers in proportion to the time spent
+    under each. Returns {stack: microseconds}.
+    """
+    children = defaultdict(list)
+    roots = []
+    for function, (_, _, _, cumulative, callers) in stats.items():
+        if not callers:
+            roots.append(function)
+        for caller, edge in callers.items():
+            children[caller].append((function, edge[3]))
+
+    stacks = defaultdict(int)
+
+    def walk(function, path, fraction):
+        path = path + [function]
+        own_time, cumulative = stats[function][2], stats[function][3]
+        stacks[';'.join([_label(f) for f in path])] += int(
+            own_time * fraction * 1000000)
+        if len(path) >= MAX_DEPTH:
+            return
+        for child, edge_time in children[function]:
+            if child in path or not stats[child][3]:
+                continue
+            share = fraction * edge_time / stats[child][3]
+            if share * stats[child][3] * 1000000 >= 1:
+                walk(child, path, share)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return {stack: n for stack, n in stacks.items() if n}
+
+
+def write_collapsed(filepath, stacks):
+    with open(filepath, 'w') as filehandle:
+        for stack, n in sorted(stacks.items()):
+            filehandle.write('%s %d\n' % (stack, n))
+
+
+def _label(function):
+    filename, line, name = function
+    if filename == '~':
+        # Built-in function
+        return name
+    return '%s:%d:%s' % (os.path.basename(filename), line, name)
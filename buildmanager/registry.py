@@ -0,0 +1,264 @@
+"""
+registry - Shared, lazily-loaded resources
+
+Large resources (the morphology hub, the variants cache, the ODO link
+tables, the frequency-prediction models, etc.) used to be loaded as soon
+as the module that needs them was imported. Instead, modules now hold a
+lazy() proxy:
+
+    MORPHOLOGY = registry.lazy('morphology')
+
+The resource is built the first time one of its attributes is used, and
+a single instance is shared by every module that asks for it. The time
+taken to load each resource is recorded (and included in the stage's
+run report), and release() drops every resource once a stage has
+finished with it.
+
+If the resource daemon is running (see buildmanager.daemon), resources
+which it serves are looked up in the daemon rather than loaded locally.
+If lookup statistics are switched on, resources are wrapped so that
+their lookups are counted (see buildmanager.lookupstats).
+"""
+
+import time
+
+
+def _morphology():
+    from lex.inflections.mmh.mmhcache import MmhCache
+    return MmhCache()
+
+
+def _inflector():
+    from lex.inflections.inflection import Inflection
+    return Inflection()
+
+
+def _archaic_endings():
+    from lex.inflections.inflection import ArchaicEndings
+    return ArchaicEndings()
+
+
+def _variants_cache():
+    from lex.oed.variants.variantscache import VariantsCache
+    return VariantsCache(wordclasses=('NNS', 'VBZ', 'VBN', 'VBD'))
+
+
+def _spelling_converter():
+    from lex.inflections.spellingconverter import SpellingConverter
+    return SpellingConverter()
+
+
+def _link_manager(dictname):
+    def factory():
+        from lex.odo.linkmanager import LinkManager
+        return LinkManager(dictName=dictname)
+    return factory
+
+
+def _distiller(dictname):
+    def factory():
+        from lex.odo.distiller import Distiller
+        return Distiller(dictName=dictname)
+    return factory
+
+
+def _frequency_predictor():
+    from frequency.frequencypredictor import FrequencyPredictor
+    return FrequencyPredictor()
+
+
+def _release_frequency_predictor():
+    from frequency.frequencypredictor import FrequencyPredictor
+    FrequencyPredictor.models = dict()
+
+
+def _frequency_memo():
+    import os
+    import gelconfig
+    from frequency.frequencymemo import FrequencyMemo
+    return FrequencyMemo(os.path.join(gelconfig.FREQUENCY_BUILD_DIR,
+                                      'types_with_frequency'))
+
+
+def _release_frequency_memo():
+    from frequency.frequencymemo import FrequencyMemo
+    FrequencyMemo.data = None
+
+
+def _weighted_size():
+    from frequency.oedsize.oedentrysize import WeightedSize
+    return WeightedSize(averaged=True)
+
+
+def _release_weighted_size():
+    from frequency.oedsize import oedentrysize
+    from buildmanager.memory import SpillableDict
+    oedentrysize.WeightedSize.index = SpillableDict('weighted_size_index')
+    oedentrysize._moving_average.cache_clear()
+
+
+# The corpus-probability tables are loaded from file by
+#  compute_frequencies(); until then, these are empty.
+def _bnc_probability():
+    from frequency.wordclass.corpusprobability import BncPosProbability
+    return BncPosProbability()
+
+
+def _release_bnc_probability():
+    from frequency.wordclass.corpusprobability import BncPosProbability
+    BncPosProbability.words = dict()
+
+
+def _oec_pos_probability():
+    from frequency.wordclass.corpusprobability import OecPosProbability
+    return OecPosProbability()
+
+
+def _release_oec_pos_probability():
+    from frequency.wordclass.corpusprobability import OecPosProbability
+    OecPosProbability.words = dict()
+
+
+def _oec_lempos_probability():
+    from frequency.wordclass.corpusprobability import OecLemposProbability
+    return OecLemposProbability()
+
+
+def _release_oec_lempos_probability():
+    from frequency.wordclass.corpusprobability import OecLemposProbability
+    OecLemposProbability.lemmas = dict()
+
+
+def _id_map():
+    import gelconfig
+    from idgenerator import IdMap
+    return IdMap(gelconfig.ID_MAP_DIR)
+
+
+# Resource name -> (factory, release function). The release function
+#  (if any) clears data which the resource's class keeps at class level,
+#  and which would otherwise outlive the instance.
+FACTORIES = {
+    'morphology': (_morphology, None),
+    'inflector': (_inflector, None),
+    'archaic_endings': (_archaic_endings, None),
+    'variants_cache': (_variants_cache, None),
+    'spelling_converter': (_spelling_converter, None),
+    'link_manager.ode': (_link_manager('ode'), None),
+    'link_manager.noad': (_link_manager('noad'), None),
+    'distiller.ode': (_distiller('ode'), None),
+    'distiller.noad': (_distiller('noad'), None),
+    'frequency_predictor': (_frequency_predictor,
+                            _release_frequency_predictor),
+    'weighted_size': (_weighted_size, _release_weighted_size),
+    'frequency_memo': (_frequency_memo, _release_frequency_memo),
+    'bnc_probability': (_bnc_probability, _release_bnc_probability),
+    'oec_pos_probability': (_oec_pos_probability,
+                            _release_oec_pos_probability),
+    'oec_lempos_probability': (_oec_lempos_probability,
+                               _release_oec_lempos_probability),
+    'id_map': (_id_map, None),
+}
+
+INSTANCES = {}
+LOAD_TIMES = {}
+
+
+def get(name):
+    """
+    Return the named resource, building it if this is the first time
+    it's been asked for.
+    """
+    if name not in INSTANCES:
+        start = time.time()
+        INSTANCES[name] = _instrument(name, _remote(name) or
+                                     FACTORIES[name][0]())
+        LOAD_TIMES[name] = round(time.time() - start, 3)
+        print('\tLoaded %s (%0.1fs)' % (name, LOAD_TIMES[name]))
+    return INSTANCES[name]
+
+
+def _remote(name):
+    from buildmanager import daemon
+    return daemon.remote(name)
+
+
+def _instrument(name, instance):
+    from buildmanager import lookupstats
+    return lookupstats.instrument(name, instance)
+
+
+def is_loaded(name):
+    return name in INSTANCES
+
+
+def load_times():
+    """
+    Return the time taken to load each resource loaded since the last
+    release().
+    """
+    return dict(LOAD_TIMES)
+
+
+def release(names=None):
+    """
+    Drop every loaded resource (or just the named ones), so that its
+    memory can be reclaimed; it will be loaded again if it's used again.
+    """
+    if names is None:
+        names = list(INSTANCES.keys())
+    for name in names:
+        if name not in INSTANCES:
+            continue
+        release_function = FACTORIES[name][1]
+        if release_function is not None and not _is_remote(INSTANCES[name]):
+            release_function()
+        del INSTANCES[name]
+        LOAD_TIMES.pop(name, None)
+
+
+def _is_remote(instance):
+    from buildmanager.daemon import RemoteResource
+    from buildmanager.lookupstats import CountingResource
+    if isinstance(instance, CountingResource):
+        instance = instance._resource
+    return isinstance(instance, RemoteResource)
+
+
+def lazy(name):
+    """
+    Return a proxy for the named resource, which can be held at module
+    level in place of the resource itself.
+    """
+    if name not in FACTORIES:
+        raise KeyError('Unknown resource "%s"' % name)
+    return LazyResource(name)
+
+
+def resolve(value):
+    """
+    If value is a lazy proxy, load the resource now (e.g. when a worker
+    process starts); return the resource, or the value itself.
+    """
+    if isinstance(value, LazyResource):
+        return get(value._resource_name)
+    return value
+
+
+class LazyResource(object):
+
+    """
+    Stand-in for a resource in the registry; any attribute lookup is
+    passed on to the resource (loading it if necessary).
+    """
+
+    def __init__(self, name):
+        self._resource_name = name
+
+    def __getattr__(self, attribute):
+        if attribute.startswith('__'):
+            raise AttributeError(attribute)
+        return getattr(get(self._resource_name), attribute)
+
+    def __repr__(self):
+        return '<lazy resource %s>' % self._resource_name
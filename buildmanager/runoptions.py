@@ -0,0 +1,37 @@
+"""
+runoptions - Options for the current pipeline run
+
+Options are set from the command line (see pipeline.py) and passed to
+each stage explicitly, since stages may be run in separate worker
+processes; run_stage() then makes them available here.
+"""
+
+OPTIONS = {
+    # Let interrupted stages carry on from their last checkpoint
+    'resume': False,
+    # Run over a slice of the data (see buildmanager.subset)
+    'subset': None,
+    # Memory budget for each stage/worker process (see buildmanager.memory)
+    'memory_budget_mb': None,
+    # Stages to profile, and how (see buildmanager.profiling)
+    'profile': None,
+    # Trace memory allocations in each stage (see buildmanager.memorytrace)
+    'memory_diagnostics': False,
+    # Count hits/misses on each lookup (see buildmanager.lookupstats)
+    'lookup_stats': False,
+    # Format for the intermediate build files, if not the one set in
+    #  gelconfig (see buildmanager.packedxml)
+    'intermediate_format': None,
+    # Run every stage, and reprocess every file, ignoring the build
+    #  cache (see buildmanager.buildcache) and the file manifests (see
+    #  buildmanager.incremental)
+    'force': False,
+}
+
+
+def set_options(**kwargs):
+    OPTIONS.update(kwargs)
+
+
+def get_option(name):
+    return OPTIONS.get(name)
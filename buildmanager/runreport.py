@@ -0,0 +1,299 @@
+"""
+runreport - Record how long each pipeline stage took, and what it used
+
+Each stage run by the pipeline is wrapped in a StageMonitor, which
+records wall-clock time, CPU time, peak memory (RSS), and the number of
+files and entries processed. If the stage farms its files out to worker
+processes (see buildmanager.sharding), the workers' peak RSS is recorded
+as well, since the stage's own peak doesn't include it. Since stages may
+run in separate worker processes, each stage's figures are written to a
+file of its own; once the pipeline finishes, these are compiled into a
+single JSON report for the run (REPORT_DIR/<run_id>.json), kept
+alongside the reports for earlier runs.
+"""
+
+import os
+import json
+import time
+import resource
+
+import gelconfig
+from buildmanager import subset, registry
+
+REPORT_DIR = gelconfig.REPORT_DIR
+MEGABYTE = 1024 * 1024
+
+# Running totals for the current process (see count())
+COUNTS = {'files': 0, 'entries': 0}
+# Further figures added to the current stage's report (see annotate())
+ANNOTATIONS = {}
+# Peak RSS (bytes) of each worker process (by pid) which has run part
+#  of the current stage (see worker_peak_rss())
+WORKER_PEAKS = {}
+
+
+def new_run_id():
+    """
+    Return an ID for a new pipeline run. IDs sort in chronological order.
+    """
+    return time.strftime('%Y%m%d-%H%M%S') + '-%d' % os.getpid()
+
+
+def count(files=0, entries=0):
+    """
+    Add to the number of files and entries processed by the current
+    stage. Called by the iterators which stages use to read build files
+    (buildmanager.fileiterator, FrequencyIterator, etc.).
+    """
+    COUNTS['files'] += files
+    COUNTS['entries'] += entries
+
+
+def annotate(key, value):
+    """
+    Add a figure (anything JSON-serializable) to the report for the
+    current stage, e.g. the results of memory diagnostics.
+    """
+    ANNOTATIONS[key] = value
+
+
+def worker_peak_rss(pid, peak):
+    """
+    Note the peak RSS (in bytes) reported by a worker process which ran
+    part of the current stage.
+    """
+    WORKER_PEAKS[pid] = max(WORKER_PEAKS.get(pid, 0), peak)
+
+
+def process_peak_rss():
+    """
+    Return the peak RSS (in bytes) of the current process since it
+    started.
+    """
+    return _peak_rss(False)
+
+
+class StageMonitor(object):
+
+    """
+    Context manager which measures a single pipeline stage, and saves
+    the measurements (if a run ID is supplied).
+    """
+
+    def __init__(self, stage_name, run_id=None):
+        self.stage_name = stage_name
+        self.run_id = run_id
+        self.data = None
+        self.start_wall = None
+        self.start_cpu = None
+        self.peak_reset = False
+
+    def __enter__(self):
+        COUNTS['files'] = 0
+        COUNTS['entries'] = 0
+        ANNOTATIONS.clear()
+        WORKER_PEAKS.clear()
+        self.peak_reset = _reset_peak_rss()
+        self.start_wall = time.time()
+        self.start_cpu = _cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = time.time() - self.start_wall
+        if exc_type is None:
+            status = 'completed'
+        else:
+            status = 'failed'
+        self.data = {
+            'stage': self.stage_name,
+            'status': status,
+            'started': self.start_wall,
+            'wall_time': round(wall_time, 3),
+            'cpu_time': round(_cpu_time() - self.start_cpu, 3),
+            'peak_rss_mb': round(_peak_rss(self.peak_reset) / MEGABYTE, 1),
+            'files': COUNTS['files'],
+            'entries': COUNTS['entries'],
+            'entries_per_sec': _rate(COUNTS['entries'], wall_time),
+            'resource_load_times': registry.load_times(),
+        }
+        if WORKER_PEAKS:
+            # The largest worker, and all of them together (an upper
+            #  bound on what they used at once)
+            self.data['worker_peak_rss_mb'] = round(
+                max(WORKER_PEAKS.values()) / MEGABYTE, 1)
+            self.data['workers_peak_rss_total_mb'] = round(
+                sum(WORKER_PEAKS.values()) / MEGABYTE, 1)
+            self.data['worker_processes'] = len(WORKER_PEAKS)
+        self.data.update(ANNOTATIONS)
+        self.save()
+        return False
+
+    def skipped(self):
+        """
+        Record that the stage was skipped (by the build cache).
+        """
+        self.data = {'stage': self.stage_name,
+                     'status': 'skipped',
+                     'started': time.time()}
+        self.save()
+
+    def save(self):
+        if self.run_id is None:
+            return
+        directory = _stage_dir(self.run_id)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, self.stage_name + '.json'), 'w') as filehandle:
+            json.dump(self.data, filehandle, indent=2)
+
+
+def compile_report(run_id, stage_names):
+    """
+    Gather the figures saved for each stage of the run into a single
+    report, save it, and return it.
+    """
+    if not os.path.isdir(REPORT_DIR):
+        os.makedirs(REPORT_DIR)
+    stages = []
+    for stage_name in stage_names:
+        filepath = os.path.join(_stage_dir(run_id), stage_name + '.json')
+        if os.path.isfile(filepath):
+            with open(filepath) as filehandle:
+                stages.append(json.load(filehandle))
+        else:
+            stages.append({'stage': stage_name, 'status': 'not run'})
+    report = {
+        'run_id': run_id,
+        'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'workers': gelconfig.PIPELINE_WORKERS,
+        'subset': subset.describe(),
+        'stages': stages,
+    }
+    with open(os.path.join(REPORT_DIR, run_id + '.json'), 'w') as filehandle:
+        json.dump(report, filehandle, indent=2)
+    for stage_name in stage_names:
+        filepath = os.path.join(_stage_dir(run_id), stage_name + '.json')
+        if os.path.isfile(filepath):
+            os.unlink(filepath)
+    if os.path.isdir(_stage_dir(run_id)):
+        os.rmdir(_stage_dir(run_id))
+    return report
+
+
+def load_report(run_id):
+    filepath = os.path.join(REPORT_DIR, run_id + '.json')
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath) as filehandle:
+        return json.load(filehandle)
+
+
+def previous_report(run_id, stage_name=None, subset_description=''):
+    """
+    Return the most recent report before the given run, over the same
+    subset of the data (if any); if a stage name is given, the most
+    recent report in which that stage actually ran.
+    """
+    run_ids = sorted([os.path.splitext(f)[0] for f in os.listdir(REPORT_DIR)
+                      if f.endswith('.json') and f < run_id + '.json'],
+                     reverse=True)
+    for previous_id in run_ids:
+        report = load_report(previous_id)
+        if report.get('subset', '') != subset_description:
+            continue
+        if stage_name is None or _completed_stage(report, stage_name):
+            return report
+    return None
+
+
+def print_summary(report):
+    """
+    Print a table of the stages in the report, comparing each stage's
+    wall time with the last run in which that stage completed.
+    """
+    print('=' * 78)
+    if report['subset']:
+        print('Run %s (partial: %s)' % (report['run_id'], report['subset']))
+    else:
+        print('Run %s' % report['run_id'])
+    print('%-28s %10s %10s %8s %9s %10s' % ('stage', 'wall (s)',
+          'prev (s)', 'change', 'peak MB', 'entries/s'))
+    print('-' * 78)
+    for stage in report['stages']:
+        if stage['status'] != 'completed':
+            print('%-28s %s' % (stage['stage'], stage['status']))
+            continue
+        previous = previous_report(report['run_id'], stage['stage'],
+                                   report['subset'])
+        if previous is not None:
+            previous_time = _completed_stage(previous, stage['stage'])['wall_time']
+            previous_column = '%10.1f' % previous_time
+            if previous_time:
+                change = '%+7.0f%%' % (100 * (stage['wall_time'] - previous_time) /
+                                       previous_time)
+            else:
+                change = '%8s' % '-'
+        else:
+            previous_column = '%10s' % '-'
+            change = '%8s' % '-'
+        print('%-28s %10.1f %s %s %9.1f %10s' % (
+            stage['stage'], stage['wall_time'], previous_column, change,
+            stage['peak_rss_mb'],
+            '%d' % stage['entries_per_sec'] if stage['entries'] else '-'))
+    print('=' * 78)
+
+
+def _completed_stage(report, stage_name):
+    for stage in report['stages']:
+        if stage['stage'] == stage_name and stage['status'] == 'completed':
+            return stage
+    return None
+
+
+def _stage_dir(run_id):
+    return os.path.join(REPORT_DIR, '.' + run_id)
+
+
+def _rate(quantity, seconds):
+    if not seconds:
+        return 0
+    return round(quantity / seconds, 1)
+
+
+def _cpu_time():
+    # Include any child processes (e.g. XSLT or sort subprocesses)
+    total = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _reset_peak_rss():
+    """
+    Reset the kernel's high-water mark for this process's RSS, so that
+    the peak can be measured per stage even when several stages run in
+    the same process. Only possible on Linux.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as filehandle:
+            filehandle.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _peak_rss(reset):
+    """
+    Return the peak RSS in bytes: since the last reset, if the high-water
+    mark could be reset, or else since the process started.
+    """
+    if reset:
+        with open('/proc/self/status') as filehandle:
+            for line in filehandle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname().sysname == 'Darwin':
+        return maxrss  # already in bytes
+    return maxrss * 1024
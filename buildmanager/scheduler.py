@@ -0,0 +1,85 @@
+"""
+StageScheduler - Runs pipeline stages, in parallel where possible
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from buildmanager.stages import depends_on
+
+
+class StageScheduler(object):
+
+    """
+    Run a list of pipeline stages, respecting the dependencies between
+    them (as declared in buildmanager.stages).
+
+    Stages are listed in pipeline order. Any stage whose prerequisites
+    have all completed is started straight away, in its own worker
+    process, up to the maximum number of workers. With a single worker,
+    stages simply run one after another in the current process.
+
+    The runner is a module-level function which takes a stage name and
+    runs that stage.
+    """
+
+    def __init__(self, stage_names, runner, workers=1):
+        self.stage_names = list(stage_names)
+        self.runner = runner
+        self.workers = max(workers, 1)
+        self.prerequisites = _compile_prerequisites(self.stage_names)
+
+    def run(self):
+        if self.workers == 1:
+            for stage_name in self.stage_names:
+                self.runner(stage_name)
+        else:
+            self.run_parallel()
+
+    def run_parallel(self):
+        # Each stage gets a fresh worker process, so that memory used
+        #  by one stage is released before the next one starts.
+        context = multiprocessing.get_context('spawn')
+        pending = list(self.stage_names)
+        completed = set()
+        running = {}
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=context,
+                                 max_tasks_per_child=1) as executor:
+            while pending or running:
+                for stage_name in self.ready(pending, completed):
+                    if len(running) >= self.workers:
+                        break
+                    pending.remove(stage_name)
+                    future = executor.submit(self.runner, stage_name)
+                    running[future] = stage_name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage_name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # Let stages which are already running finish,
+                        #  but don't start anything else.
+                        for other in running:
+                            other.cancel()
+                        raise RuntimeError('Stage "%s" failed: %s' %
+                                           (stage_name, error)) from error
+                    completed.add(stage_name)
+
+    def ready(self, pending, completed):
+        """
+        Return the pending stages whose prerequisites have all
+        completed, in pipeline order.
+        """
+        return [stage_name for stage_name in pending
+                if self.prerequisites[stage_name].issubset(completed)]
+
+
+def _compile_prerequisites(stage_names):
+    prerequisites = {stage_name: set() for stage_name in stage_names}
+    for i, later in enumerate(stage_names):
+        for earlier in stage_names[:i]:
+            if depends_on(earlier, later):
+                prerequisites[later].add(earlier)
+    return prerequisites
@@ -0,0 +1,183 @@
+"""
+sharding - Spread a per-file processor across several worker processes
+
+Processors such as merge_entries or add_inflections treat each build
+file independently. run_sharded() splits the input files into shards,
+runs the processor over each shard in a pool of worker processes, and
+then moves the output files into the real output directory. Output files
+keep the same names as their input files, so the result is the same
+whatever the number of workers.
+"""
+
+import os
+import time
+import shutil
+import importlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import gelconfig
+from buildmanager import runreport, memory, registry, runoptions
+from buildmanager import lookupstats, slowentries, iostats
+from buildmanager import fileiterator
+from buildmanager.incremental import (stage_files, collect_files,
+                                      scratch_directory, xml_files)
+
+# Number of shards per worker: more, smaller shards even out the load
+#  when some files take much longer than others.
+SHARDS_PER_WORKER = 4
+
+
+def run_sharded(processor, in_dir, out_dir, *args, **kwargs):
+    """
+    Run processor(in_dir, out_dir, *args) over the files in in_dir,
+    using several worker processes.
+
+    Keyword arguments:
+     - workers: number of worker processes (defaults to
+        gelconfig.FILE_WORKERS, reduced if they wouldn't all fit in the
+        memory budget);
+     - filenames: process only these files (defaults to every XML file
+        in in_dir); if every file is processed, any other XML files
+        already in out_dir are removed, as they would be by FileIterator;
+     - resources: module-level resources which each worker should load
+        when it starts, e.g. 'processors.addinflections.MORPHOLOGY'.
+
+    out_dir may be None, for processors which don't write build files.
+    Returns a list of whatever the processor returned for each shard,
+    in file order.
+
+    If the processor fails on any file, the other shards are allowed to
+    finish, and then a RuntimeError is raised listing each failure and
+    the file on which it occurred.
+    """
+    workers = memory.affordable_workers(
+        kwargs.get('workers') or gelconfig.FILE_WORKERS,
+        gelconfig.WORKER_MEMORY_MB)
+    filenames = kwargs.get('filenames')
+    complete = filenames is None
+    if complete:
+        filenames = xml_files(in_dir)
+    shards = _split(sorted(filenames), workers * SHARDS_PER_WORKER)
+    if not shards:
+        return []
+
+    scratch = scratch_directory()
+    try:
+        tasks = []
+        for i, shard in enumerate(shards):
+            shard_in = os.path.join(scratch, 'in%04d' % i)
+            stage_files(in_dir, shard, shard_in)
+            if out_dir is not None:
+                shard_out = os.path.join(scratch, 'out%04d' % i)
+                os.mkdir(shard_out)
+            else:
+                shard_out = None
+            tasks.append((processor, in_dir, shard_in, shard_out, args))
+
+        workers = min(workers, len(shards))
+        started = time.time()
+        context = multiprocessing.get_context('spawn')
+        initargs = (kwargs.get('resources', ()),
+                    memory.worker_budget(workers),
+                    dict(runoptions.OPTIONS))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=context,
+                                 initializer=_initialize_worker,
+                                 initargs=initargs) as executor:
+            outcomes = list(executor.map(_run_shard, tasks))
+        iostats.add(pool_wait_seconds=time.time() - started)
+
+        errors = [error for _, _, error in outcomes if error]
+        if errors:
+            raise RuntimeError('%s failed on %d file(s):\n%s' %
+                               (processor.__name__, len(errors),
+                                '\n'.join(errors)))
+
+        results = []
+        for result, figures, _ in outcomes:
+            runreport.count(**figures['counts'])
+            lookupstats.merge(figures['lookups'])
+            slowentries.merge(figures['slowest'])
+            iostats.merge(figures['io'])
+            runreport.worker_peak_rss(*figures['peak_rss'])
+            results.append(result)
+
+        if out_dir is not None:
+            if complete:
+                _purge(out_dir, keep=filenames)
+            for task in tasks:
+                collect_files(task[3], out_dir)
+    finally:
+        shutil.rmtree(scratch)
+    return results
+
+
+def _run_shard(task):
+    processor, in_dir, shard_in, shard_out, args = task
+    runreport.COUNTS['files'] = 0
+    runreport.COUNTS['entries'] = 0
+    lookupstats.reset()
+    slowentries.reset()
+    iostats.reset()
+    started = time.time()
+    try:
+        result = processor(shard_in, shard_out, *args)
+    except Exception:
+        # Report the file in the real input directory, not the link to
+        #  it in the scratch directory
+        if fileiterator.current_file():
+            location = os.path.join(
+                in_dir, os.path.basename(fileiterator.current_file()))
+        else:
+            location = in_dir
+        error = '%s:\n%s' % (location, traceback.format_exc())
+        return None, None, error
+    figures = {'counts': dict(runreport.COUNTS),
+               'lookups': lookupstats.collect(),
+               'slowest': slowentries.collect(),
+               'io': iostats.collect(),
+               # Each pool's workers last only as long as the stage, so
+               #  this is the worker's peak during the stage
+               'peak_rss': (os.getpid(), runreport.process_peak_rss())}
+    figures['io']['worker_seconds'] += time.time() - started
+    return result, figures, None
+
+
+def _initialize_worker(resources, budget_mb, options):
+    """
+    Run when each worker process starts: pass on the options for the
+    run, set the worker's share of the memory budget, and load the
+    module-level resources that the processor needs, so that this is
+    done once per worker rather than once per shard.
+    """
+    runoptions.set_options(**options)
+    memory.set_budget(budget_mb)
+    for resource in resources:
+        module_name, attribute = resource.rsplit('.', 1)
+        registry.resolve(getattr(importlib.import_module(module_name),
+                                 attribute))
+
+
+def _split(filenames, num_shards):
+    """
+    Split a list of files into (at most) num_shards runs of consecutive
+    files, of roughly equal length.
+    """
+    size, remainder = divmod(len(filenames), max(num_shards, 1))
+    shards = []
+    start = 0
+    for i in range(num_shards):
+        end = start + size + (1 if i < remainder else 0)
+        if end > start:
+            shards.append(filenames[start:end])
+        start = end
+    return shards
+
+
+def _purge(out_dir, keep):
+    keep = set(keep)
+    for filename in xml_files(out_dir):
+        if filename not in keep:
+            os.unlink(os.path.join(out_dir, filename))
@@ -0,0 +1,119 @@
+"""
+slowentries - Keep track of the entries which take longest to process
+
+The per-entry loops of the heaviest stages (GenerateBase.process_entry,
+inflect_entries in addinflections, _apportion_scores in
+calculate_frequency) time each entry and pass the time to record(). For
+each loop, a bounded heap keeps the TOP_N slowest entries seen so far
+(lemma, OED ID, time), so that a few pathological entries - huge
+homograph sets, compounds with hundreds of variants - can be found and
+fixed.
+
+At the end of each stage, the slowest entries are written to
+REPORT_DIR/slowest/<run_id>.<stage>.json, and the very slowest are
+included in the stage's entry in the run report. Entries timed in the
+worker processes of a sharded stage are added to the stage's own heaps
+(see buildmanager.sharding).
+"""
+
+import os
+import json
+import heapq
+import itertools
+
+from buildmanager import runreport
+from buildmanager.runreport import REPORT_DIR
+
+SLOWEST_DIR = os.path.join(REPORT_DIR, 'slowest')
+# Number of entries kept for each loop
+TOP_N = 50
+# Number of entries (per loop) included in the run report
+TOP_REPORTED = 5
+
+# Loop name -> heap of (seconds, sequence, lemma, OED ID); the sequence
+#  number breaks ties, so that lemmas and IDs are never compared
+HEAPS = {}
+SEQUENCE = itertools.count()
+
+
+def record(loop, seconds, lemma, oed_id):
+    """
+    Record the time taken to process an entry in the named loop.
+    """
+    heap = HEAPS.setdefault(loop, [])
+    if len(heap) < TOP_N:
+        heapq.heappush(heap, (seconds, next(SEQUENCE), lemma, oed_id))
+    elif seconds > heap[0][0]:
+        heapq.heapreplace(heap, (seconds, next(SEQUENCE), lemma, oed_id))
+
+
+def reset():
+    HEAPS.clear()
+
+
+def collect():
+    """
+    Return the current heaps (in a form that can be passed back from a
+    worker process).
+    """
+    return {loop: list(heap) for loop, heap in HEAPS.items()}
+
+
+def merge(heaps):
+    """
+    Add entries timed in another process to the current heaps.
+    """
+    for loop, heap in heaps.items():
+        for seconds, _, lemma, oed_id in heap:
+            record(loop, seconds, lemma, oed_id)
+
+
+def slowest():
+    """
+    Return the slowest entries in each loop, slowest first.
+    """
+    return {loop: [{'lemma': lemma,
+                    'oed_id': oed_id,
+                    'seconds': round(seconds, 4)}
+                   for seconds, _, lemma, oed_id in sorted(heap, reverse=True)]
+            for loop, heap in HEAPS.items()}
+
+
+class SlowEntriesReport(object):
+
+    """
+    Context manager which starts each stage with empty heaps, and writes
+    out the slowest entries at the end.
+    """
+
+    def __init__(self, stage_name, run_id):
+        self.stage_name = stage_name
+        self.run_id = run_id or 'norun'
+
+    def __enter__(self):
+        reset()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        entries = slowest()
+        reset()
+        if not entries:
+            return False
+        filepath = _output_file(self.stage_name, self.run_id)
+        with open(filepath, 'w') as filehandle:
+            json.dump({'stage': self.stage_name,
+                       'run_id': self.run_id,
+                       'slowest': entries}, filehandle, indent=2)
+        runreport.annotate('slowest_entries', {
+            'file': filepath,
+            'top': {loop: values[:TOP_REPORTED]
+                    for loop, values in entries.items()},
+        })
+        print('\tSlowest entries written to %s' % filepath)
+        return False
+
+
+def _output_file(stage_name, run_id):
+    if not os.path.isdir(SLOWEST_DIR):
+        os.makedirs(SLOWEST_DIR)
+    return os.path.join(SLOWEST_DIR, '%s.%s.json' % (run_id, stage_name))
@@ -0,0 +1,92 @@
+"""
+snapshot - Warm-start snapshots of lookup tables
+
+Some lookup tables take much longer to build from their source files
+(pickle streams, TSV files, text files) than to read back once built.
+load_or_build() saves the finished table in a binary snapshot (a
+pickle, behind a short header) the first time it's built; later
+processes unpickle the table from the snapshot rather than building it
+again. Each process still gets its own copy of the table: the snapshot
+saves the time taken to build it, not the memory it takes up.
+
+Each snapshot records a signature of its source files (their sizes and
+modification times) and of the code which builds the table, plus the
+snapshot format version. If any of these has changed, the snapshot is
+ignored and rebuilt, so a stale table is never used.
+"""
+
+import os
+import pickle
+import struct
+
+import gelconfig
+from buildmanager.fingerprint import HashCache, hash_text
+
+SNAPSHOT_DIR = os.path.join(gelconfig.BUILD_DIR, '.snapshots')
+# Bump this if the snapshot layout changes
+SNAPSHOT_VERSION = 1
+MAGIC = b'GELSNAP'
+HEADER = struct.Struct('<7sHH40s')  # magic, version, protocol, signature
+
+
+def load_or_build(name, sources, build, code=()):
+    """
+    Return the table built by build(), taking it from a snapshot if
+    there's a valid one.
+
+    sources are the files or directories the table is built from; code
+    is a list of source-code files whose changes should also invalidate
+    the snapshot (typically the calling module's __file__).
+    """
+    if not gelconfig.SNAPSHOTS:
+        return build()
+    filepath = os.path.join(SNAPSHOT_DIR, name + '.snapshot')
+    current = signature(sources, code)
+    table = _load(filepath, current)
+    if table is None:
+        table = build()
+        _save(filepath, current, table)
+    return table
+
+
+def signature(sources, code=()):
+    hash_cache = HashCache(os.path.join(SNAPSHOT_DIR, 'hashes.json'))
+    components = ['%d' % SNAPSHOT_VERSION]
+    for path in sources:
+        components.append('%s=%s' % (path, hash_cache.path_hash(path,
+                                                               content=False)))
+    for path in code:
+        components.append('%s=%s' % (os.path.basename(path),
+                                     hash_cache.path_hash(path)))
+    if not os.path.isdir(SNAPSHOT_DIR):
+        os.makedirs(SNAPSHOT_DIR)
+    hash_cache.save()
+    return hash_text('\n'.join(components))
+
+
+def _load(filepath, current):
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath, 'rb') as filehandle:
+        header = filehandle.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, protocol, stored = HEADER.unpack(header)
+        if (magic != MAGIC or
+                version != SNAPSHOT_VERSION or
+                protocol > pickle.HIGHEST_PROTOCOL or
+                stored.decode('ascii') != current):
+            return None
+        return pickle.load(filehandle)
+
+
+def _save(filepath, current, table):
+    if not os.path.isdir(SNAPSHOT_DIR):
+        os.makedirs(SNAPSHOT_DIR)
+    tmp_file = '%s.%d.tmp' % (filepath, os.getpid())
+    with open(tmp_file, 'wb') as filehandle:
+        filehandle.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION,
+                                     pickle.HIGHEST_PROTOCOL,
+                                     current.encode('ascii')))
+        pickle.dump(table, filehandle, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, filepath)
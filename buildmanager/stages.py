@@ -0,0 +1,187 @@
+"""
+stages - Declares what each pipeline stage reads and writes
+
+Each stage in gelconfig.PIPELINE is declared with the set of resources
+it needs as input and the set of resources it produces. The scheduler
+uses these declarations to work out which stages can safely run at the
+same time, and the build cache uses them to decide whether a stage needs
+to be run again.
+"""
+
+import os
+from collections import namedtuple
+
+from lex import lexconfig
+
+import gelconfig
+
+# Besides its inputs and outputs, a stage lists the gelconfig settings and
+#  the source files (relative to the repository root) that affect what it
+#  produces; these go into the stage's fingerprint (see buildcache).
+Stage = namedtuple('Stage', ['name', 'inputs', 'outputs', 'config', 'code'],
+                   defaults=((), ()))
+
+# Resources read or written by the pipeline. Most of these are
+#  directories or files; resources which are managed internally by the
+#  lex library are given as None. Those which no stage produces (the
+#  source data) can't be fingerprinted, so stages which read them are
+#  never skipped by the build cache (see buildcache.is_cacheable()).
+RESOURCES = {
+    'oed_source': None,
+    'odo_source': None,
+    'morphology_source': None,
+    'odo_distilled': None,
+    'morphology_hub': None,
+    'link_sources': os.path.join(lexconfig.ODO_LINKS_DIR, 'source'),
+    'link_tables': lexconfig.ODO_LINKS_DIR,
+    'ngram_tables': lexconfig.NGRAMS_TABLES_DIR,
+    'corpus_probabilities': os.path.join(gelconfig.RESOURCES_DIR, 'corpus'),
+    'weighted_size_index': gelconfig.WEIGHTED_SIZE_DIR,
+    'frequency_prediction': gelconfig.FREQUENCY_PREDICTION_DIR,
+    'base': os.path.join(gelconfig.BUILD_DIR, '01_base'),
+    'build_index': os.path.join(gelconfig.BUILD_DIR, 'index.csv'),
+    'defragmented': os.path.join(gelconfig.BUILD_DIR, '02_defragmented'),
+    'inflected': os.path.join(gelconfig.BUILD_DIR, '03_inflected'),
+    'inflected_ext': os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext'),
+    'clean_attributes': os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes'),
+    'frequency': os.path.join(gelconfig.BUILD_DIR, '06_frequency'),
+    'frequency_types': os.path.join(gelconfig.FREQUENCY_BUILD_DIR, 'types'),
+    'frequency_ngrams': os.path.join(gelconfig.FREQUENCY_BUILD_DIR,
+                                     'types_plus_ngrams'),
+    'frequency_scores': os.path.join(gelconfig.FREQUENCY_BUILD_DIR,
+                                     'types_with_frequency'),
+    'final_data': gelconfig.FINAL_DATA_DIR,
+    'final_index': os.path.join(gelconfig.FINAL_ANCILLARY_DIR, 'index'),
+}
+
+STAGES = {stage.name: stage for stage in (
+    Stage('distilOdo',
+          inputs=('odo_source',),
+          outputs=('odo_distilled',),
+          config=('DEFINITION_LENGTH',)),
+    Stage('generateMorphologyHub',
+          inputs=('morphology_source',),
+          outputs=('morphology_hub',)),
+    Stage('updateLinkTables',
+          inputs=('link_sources',),
+          outputs=('link_tables',),
+          code=('processors/linktableupdater.py',)),
+    Stage('indexOedSize',
+          inputs=('oed_source',),
+          outputs=('weighted_size_index',),
+          code=('frequency/oedsize/oedentrysize.py',)),
+    Stage('generateBase',
+          inputs=('oed_source', 'odo_distilled', 'link_tables'),
+          outputs=('base', 'build_index'),
+          config=('FILE_SIZE_BUILD', 'MINIMUM_NUM_QUOTATIONS',
+                  'DEFINITION_LENGTH', 'DATE_SPECULATIVE_START',
+                  'DATE_SPECULATIVE_END', 'VAR_US_MINIMUM', 'DATE_MINIMUM',
+                  'INTERMEDIATE_FORMAT'),
+          code=('processors/generatebase.py',
+                'processors/indexbuildfiles.py')),
+    Stage('mergeEntryPairs',
+          inputs=('base',),
+          outputs=('defragmented',),
+          config=('INTERMEDIATE_FORMAT',),
+          code=('processors/mergeentries.py',)),
+    # The variants cache used by addInflections and processBaseChain is
+    #  compiled by the lex library from the OED source
+    Stage('addInflections',
+          inputs=('defragmented', 'morphology_hub', 'oed_source'),
+          outputs=('inflected', 'inflected_ext'),
+          config=('UNPLURALIZED', 'DATE_MINIMUM', 'INTERMEDIATE_FORMAT'),
+          code=('processors/addinflections.py',
+                'processors/addmissinginflections.py')),
+    Stage('addOdoContent',
+          inputs=('odo_distilled', 'link_tables'),
+          outputs=('inflected_ext',),
+          config=('FILE_SIZE_BUILD', 'DATE_ODO_START', 'DATE_MAXIMUM',
+                  'INTERMEDIATE_FORMAT'),
+          code=('processors/odoadditions.py',)),
+    Stage('cleanAttributes',
+          inputs=('inflected_ext',),
+          outputs=('clean_attributes',),
+          config=('ID_LENGTH', 'ID_SEED', 'ID_BLOCK_SIZE', 'STABLE_IDS',
+                  'DATE_GRANULARITY_ME', 'DATE_GRANULARITY_EMODE',
+                  'DATE_GRANULARITY_MODE', 'INTERMEDIATE_FORMAT'),
+          code=('processors/cleanattributes.py', 'idgenerator.py')),
+    # Fused alternative to mergeEntryPairs + addInflections +
+    #  cleanAttributes (see gelconfig.FUSED_BASE_CHAIN)
+    Stage('processBaseChain',
+          inputs=('base', 'morphology_hub', 'oed_source', 'inflected_ext'),
+          outputs=('defragmented', 'inflected', 'inflected_ext',
+                   'clean_attributes'),
+          config=('UNPLURALIZED', 'DATE_MINIMUM', 'ID_LENGTH', 'ID_SEED',
+                  'ID_BLOCK_SIZE', 'STABLE_IDS', 'DATE_GRANULARITY_ME',
+                  'DATE_GRANULARITY_EMODE', 'DATE_GRANULARITY_MODE',
+                  'FUSED_KEEP_INTERMEDIATES', 'INTERMEDIATE_FORMAT'),
+          code=('processors/basechain.py',
+                'processors/mergeentries.py',
+                'processors/addinflections.py',
+                'processors/addmissinginflections.py',
+                'processors/cleanattributes.py',
+                'idgenerator.py')),
+    Stage('frequencyListLemmas',
+          inputs=('clean_attributes',),
+          outputs=('frequency_types',),
+          code=('frequency/lemmalister.py',)),
+    Stage('frequencyCompileNgrams',
+          inputs=('frequency_types', 'ngram_tables'),
+          outputs=('frequency_ngrams',),
+          code=('frequency/ngramvaluesinserter.py',
+                'frequency/frequencyiterator.py')),
+    Stage('frequencyCheckGaps',
+          inputs=('frequency_ngrams', 'ngram_tables'),
+          outputs=('ngram_tables',),
+          code=('frequency/gapfiller.py',)),
+    Stage('frequencyRecompilePredictors',
+          inputs=('frequency_scores', 'weighted_size_index'),
+          outputs=('frequency_prediction',),
+          config=('FREQUENCY_PERIODS',),
+          code=('frequency/regressioncompiler.py',
+                'frequency/frequencyentry.py')),
+    Stage('frequencyComputeScores',
+          inputs=('frequency_ngrams', 'frequency_prediction',
+                  'corpus_probabilities', 'weighted_size_index'),
+          outputs=('frequency_scores',),
+          config=('FREQUENCY_PERIODS',),
+          code=('frequency/calculate_frequency.py',
+                'frequency/frequencyentry.py',
+                'frequency/frequencyiterator.py',
+                'frequency/frequencypredictor.py',
+                'frequency/homographscorer.py',
+                'frequency/oedsize/oedentrysize.py',
+                'frequency/wordclass')),
+    Stage('insertFrequency',
+          inputs=('clean_attributes', 'frequency_scores'),
+          outputs=('frequency',),
+          config=('FREQUENCY_PERIODS', 'INTERMEDIATE_FORMAT'),
+          code=('processors/insertfrequency.py',
+                'frequency/frequencymemo.py')),
+    Stage('alphabetizeOutput',
+          inputs=('frequency',),
+          outputs=('final_data',),
+          config=('FILE_SIZE_FINAL', 'XSL_MAIN_URI'),
+          code=('processors/alphasort.py',)),
+    Stage('indexOutput',
+          inputs=('final_data',),
+          outputs=('final_index',),
+          config=('XSL_INDEX_URI',),
+          code=('processors/buildindex.py',)),
+)}
+
+
+def depends_on(earlier, later):
+    """
+    Return True if the stage named `later` has to wait for the stage
+    named `earlier` (which comes before it in the pipeline).
+
+    This is the case if the later stage reads something the earlier
+    stage writes, writes something the earlier stage reads, or writes
+    the same thing as the earlier stage.
+    """
+    first = STAGES[earlier]
+    second = STAGES[later]
+    return bool(set(first.outputs) & set(second.inputs) or
+                set(first.inputs) & set(second.outputs) or
+                set(first.outputs) & set(second.outputs))
@@ -0,0 +1,87 @@
+"""
+subset - Run the pipeline over a slice of the data
+
+A subset is defined by any combination of:
+ - letters: initial letters (e.g. 'ab'); GenerateBase only reads the
+    corresponding OED source files, and OdoAdditions, the frequency
+    iterators, AlphaSort and BuildIndex only deal with these letters;
+ - oed_file_filter: passed straight to the OED EntryIterator, in place
+    of the per-letter filters;
+ - max_files: GenerateBase stops after this many build files, and the
+    per-file stages process only the first N files of their input.
+
+The subset is set from the command line (see pipeline.py), and held
+with the other run options. Anything produced in subset mode is marked
+as partial, and is never recorded by the build cache or the per-file
+manifests, so the next full run rebuilds it.
+"""
+
+import os
+import json
+import string
+
+from buildmanager.runoptions import get_option
+
+PARTIAL_MARKER = 'PARTIAL.json'
+ALPHABET = string.ascii_lowercase
+
+
+def is_active():
+    return bool(get_option('subset'))
+
+
+def _setting(name):
+    return (get_option('subset') or {}).get(name)
+
+
+def letters():
+    """
+    Return the initial letters included in the subset (lowercase), or
+    None if all letters are included.
+    """
+    if _setting('letters'):
+        return ''.join([l for l in ALPHABET if l in _setting('letters').lower()])
+    return None
+
+
+def includes_letter(letter):
+    return letters() is None or letter.lower() in letters()
+
+
+def includes_headword(headword):
+    return not headword or includes_letter(headword[0])
+
+
+def oed_file_filters():
+    """
+    Return the file filters to be used when iterating through OED (None
+    meaning no filter, i.e. the whole of OED).
+    """
+    if _setting('oed_file_filter'):
+        return [_setting('oed_file_filter'), ]
+    if letters() is not None:
+        return ['oed_%s.xml' % l.upper() for l in letters()]
+    return [None, ]
+
+
+def max_files():
+    return _setting('max_files')
+
+
+def describe():
+    subset = get_option('subset') or {}
+    return ', '.join(['%s=%s' % (key, value) for key, value
+                      in sorted(subset.items()) if value])
+
+
+def mark_partial(directory):
+    """
+    Mark a directory as containing partial output (or, after a full run,
+    remove the mark).
+    """
+    filepath = os.path.join(directory, PARTIAL_MARKER)
+    if is_active():
+        with open(filepath, 'w') as filehandle:
+            json.dump(get_option('subset'), filehandle, indent=2)
+    elif os.path.isfile(filepath):
+        os.unlink(filepath)
@@ -2,6 +2,8 @@
 calculate_frequency
 """
 
+import time
+from functools import partial
 from collections import defaultdict
 
 import gelconfig
@@ -9,14 +11,19 @@ from frequency.frequencyiterator import FrequencyIterator
 from frequency.wordclass.wordclassratios import WordclassRatios
 from frequency.wordclass.interjectionhandler import InterjectionHandler
 from frequency.homographscorer import HomographScorer
+from frequency.frequencyentry import WEIGHTED_SIZE_MANAGER
 from lex.frequencytable import FrequencyTable
+from buildmanager import slowentries, daemon
 
 PERIODS = {name: value for name, value in gelconfig.FREQUENCY_PERIODS}
 
 
-def calculate_frequency(in_dir, out_dir):
+def calculate_frequency(in_dir, out_dir, checkpoint=None):
     """
     Calculate the frequency to be assigned to each lemma/type.
+
+    If a checkpoint is supplied, letters completed by an earlier
+    (interrupted) run are skipped.
     """
     ihandler = InterjectionHandler(in_dir)
     ihandler.index_interjections()
@@ -24,23 +31,32 @@ def calculate_frequency(in_dir, out_dir):
     # Iterate through each entry in the frequency build files
     freq_iterator = FrequencyIterator(in_dir=in_dir,
                                       out_dir=out_dir,
+                                      checkpoint=checkpoint,
                                       message='Calculating frequencies')
     for entry in freq_iterator.iterate():
         if entry.contains_wordclass('UH'):
             entry.ngram = ihandler.supplement_ngram(entry.form, entry.ngram)
 
-        _apportion_scores(entry)
-        for item in entry.lex_items:
-            _compute_average_frequencies(item)
-            # Add the entry raw size and weighted size to each lex_item
-            item.node.set('size', '%0.3g' % item.size(mode='weighted'))
-            item.node.set('rawSize', '%d' % item.size(mode='actual'))
-            # Add a full frequency table to each lex_item in the entry
-            data = {p: {'frequency': f, 'estimate': item.estimated[p]}
-                    for p, f in item.average_frequency.items()}
-            freq_node = FrequencyTable(data=data).to_xml(band=False, log=False)
-            freq_node.set('wcMethod', item.wordclass_method)
-            item.node.append(freq_node)
+        # If the weighted-size index is held by the resource daemon, look
+        #  up every size the entry will need in one go
+        with daemon.prefetched(WEIGHTED_SIZE_MANAGER, 'find_size',
+                               partial(_size_lookups, entry)):
+            start = time.perf_counter()
+            _apportion_scores(entry)
+            slowentries.record('calculate_frequency._apportion_scores',
+                               time.perf_counter() - start,
+                               entry.form, _oed_id(entry))
+            for item in entry.lex_items:
+                _compute_average_frequencies(item)
+                # Add the entry raw size and weighted size to each lex_item
+                item.node.set('size', '%0.3g' % item.size(mode='weighted'))
+                item.node.set('rawSize', '%d' % item.size(mode='actual'))
+                # Add a full frequency table to each lex_item in the entry
+                data = {p: {'frequency': f, 'estimate': item.estimated[p]}
+                        for p, f in item.average_frequency.items()}
+                freq_node = FrequencyTable(data=data).to_xml(band=False, log=False)
+                freq_node.set('wcMethod', item.wordclass_method)
+                item.node.append(freq_node)
 
 
 def _apportion_scores(entry):
@@ -114,6 +130,31 @@ def _compute_average_frequencies(lex_item):
             lex_item.estimated[period] = False
 
 
+def _size_lookups(entry):
+    # Every lookup that FrequencyEntry.size() and is_oed_entry() might
+    #  make for the entry's lex items: the weighted size for each decade
+    #  scored (and for the default date), and the actual size
+    dates = {2000}
+    if entry.ngram:
+        dates.update([decade for decade in entry.ngram.decades
+                      if decade >= 1750])
+    lookups = []
+    for item in [l for l in entry.lex_items if l.xrid and l.xnode]:
+        ids = {'id': item.xrid, 'eid': item.xnode}
+        lookups.append(((), ids))
+        lookups.append(((), dict(ids, type='actual', date=2000)))
+        lookups.extend([((), dict(ids, type='weighted', date=date))
+                        for date in sorted(dates)])
+    return lookups
+
+
+def _oed_id(entry):
+    for lex_item in entry.lex_items:
+        if lex_item.xrid:
+            return lex_item.xrid
+    return None
+
+
 def _filter_lex_items(lex_items, decade):
     # Select all the lexitems that were current during the
     # decade in question
@@ -3,14 +3,12 @@ FrequencyEntry
 """
 
 from lex.gbn.ngram import Ngram
-from frequency.frequencypredictor import FrequencyPredictor
-from frequency.oedsize.oedentrysize import WeightedSize
-from frequency.wordclass.corpusprobability import BncPosProbability
 from lex.frequencytable import FrequencyTable
+from buildmanager import registry
 
-FREQUENCY_PREDICTOR = FrequencyPredictor()
-BNC_PROB = BncPosProbability()
-WEIGHTED_SIZE_MANAGER = WeightedSize(averaged=True)
+FREQUENCY_PREDICTOR = registry.lazy('frequency_predictor')
+BNC_PROB = registry.lazy('bnc_probability')
+WEIGHTED_SIZE_MANAGER = registry.lazy('weighted_size')
 DEFAULT_SIZES = {
     'general': float(1),  # size assigned to unsized lemmas
     'np': float(20),  # size assigned to encyclopedic entries
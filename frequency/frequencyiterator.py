@@ -4,10 +4,13 @@ FrequencyIterator
 
 import string
 import os
+import time
 
 from lxml import etree
 
 from frequency.frequencyentry import FrequencyEntry
+from buildmanager import runreport, subset, iostats
+from buildmanager.checkpoint import write_atomically
 
 parser = etree.XMLParser(remove_blank_text=True)
 alphabet = list(string.ascii_lowercase)
@@ -21,6 +24,14 @@ class FrequencyIterator(object):
 
     If an output directory is supplied (as the outDir keyword argument),
     each input file is written out to the output directory.
+
+    If a checkpoint is supplied (see buildmanager.checkpoint), each letter
+    is recorded in it once all its files have been written, and letters
+    already recorded there (by an interrupted run) are skipped.
+
+    In subset mode (see buildmanager.subset), only letters included in
+    the subset are processed, and letters for which there's no data are
+    skipped.
     """
 
     def __init__(self, **kwargs):
@@ -29,12 +40,18 @@ class FrequencyIterator(object):
         self.letters = kwargs.get('letters')
         self.verbosity = kwargs.get('verbosity')
         self.message = kwargs.get('message')
+        self.checkpoint = kwargs.get('checkpoint')
         if not self.message and self.verbosity:
             self.message = 'Processing frequency data'
         self.subdir = None
 
     def iterate(self):
         for letter in alphabet:
+            if self.checkpoint and self.checkpoint.is_done(letter):
+                continue
+            if subset.is_active() and (not subset.includes_letter(letter) or
+                    not os.path.isdir(os.path.join(self.in_dir, letter))):
+                continue
             if not self.letters or letter in self.letters:
                 if self.message:
                     print('%s: %s...' % (self.message, letter,))
@@ -47,17 +64,25 @@ class FrequencyIterator(object):
                          if f.endswith('.xml')]
 
                 for filepath in sorted(files):
+                    start = time.perf_counter()
                     doc = etree.parse(filepath, parser)
-                    for lem_node in doc.findall('lemma'):
+                    iostats.file_read(filepath, time.perf_counter() - start)
+                    lemma_nodes = doc.findall('lemma')
+                    runreport.count(files=1, entries=len(lemma_nodes))
+                    for lem_node in lemma_nodes:
                         entry = FrequencyEntry(lem_node)
                         yield entry
                     self.print_output(filepath, doc)
 
+                if self.checkpoint:
+                    self.checkpoint.mark_done(letter)
+
     def print_output(self, filepath, doc):
         if self.out_dir:
             basename = os.path.basename(filepath)
-            with open(os.path.join(self.subdir, basename), 'w') as filehandle:
-                filehandle.write(etree.tounicode(doc, pretty_print=True))
+            iostats.write_file(os.path.join(self.subdir, basename),
+                               iostats.serialize(doc, pretty_print=True),
+                               writer=write_atomically)
 
     def clear_dir(self):
         if not os.path.isdir(self.subdir):
@@ -2,10 +2,9 @@
 FrequencyMemo
 """
 
-from collections import defaultdict
-
 import gelconfig
 from frequency.frequencyiterator import FrequencyIterator
+from buildmanager.memory import SpillableDict
 
 PERIODS = [p[0] for p in gelconfig.FREQUENCY_PERIODS]
 
@@ -14,6 +13,7 @@ class FrequencyMemo(object):
 
     """
     Store all the compiled frequency tables in memory, indexed by type ID
+    (moving them to disk if the memory budget is reached)
     """
 
     data = None
@@ -32,7 +32,7 @@ class FrequencyMemo(object):
 
 
 def _load_tables(in_dir):
-    FrequencyMemo.data = defaultdict(dict)
+    FrequencyMemo.data = SpillableDict('frequency_tables')
     frequency_iterator = FrequencyIterator(inDir=in_dir,
                                            outDir=None,
                                            message='Loading frequency tables')
@@ -8,6 +8,7 @@ from collections import namedtuple
 
 import gelconfig
 from frequency.wordclass.utilities import wordclass_category
+from buildmanager import snapshot
 
 PREDICTIONS_DIR = gelconfig.FREQUENCY_PREDICTION_DIR
 DataSeries = namedtuple('Series', ['size', 'frequency'])
@@ -39,6 +40,18 @@ class FrequencyPredictor(object):
 
 
 def _load_models():
+    # The snapshot holds plain (size, frequency) tuples, since DataSeries
+    #  (named 'Series') can't be pickled under its own name
+    models = snapshot.load_or_build('frequency_prediction',
+                                    [PREDICTIONS_DIR, ],
+                                    _parse_models,
+                                    code=[__file__, ])
+    for wordclass, (xp, yp) in models.items():
+        FrequencyPredictor.models[wordclass] = DataSeries(xp, yp)
+
+
+def _parse_models():
+    models = {}
     filenames = [f for f in os.listdir(PREDICTIONS_DIR)
                  if f.endswith('_lowess.txt')]
     for filename in filenames:
@@ -49,7 +62,8 @@ def _load_models():
         xp = [d[0] for d in data_points]
         yp = [d[1] for d in data_points]
         _extrapolate(xp, yp)
-        FrequencyPredictor.models[wordclass] = DataSeries(xp, yp)
+        models[wordclass] = (xp, yp)
+    return models
 
 
 def _extrapolate(xp, yp):
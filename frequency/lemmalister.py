@@ -9,7 +9,9 @@ from collections import defaultdict, namedtuple
 
 from lxml import etree
 
-from lex.gel.fileiterator import FileIterator
+from buildmanager.fileiterator import FileIterator
+from buildmanager.entrywriter import EntryWriter
+from buildmanager import memory
 
 MINIMUM_END_DATE = 1800
 FormData = namedtuple('FormData', ['form', 'sort', 'wordclass_id',
@@ -22,6 +24,10 @@ class LemmaLister(object):
     """
     List every type in GEL in alpha order, so that homographs are
     put together in sets, along with their vital statistics.
+
+    If the memory budget is reached while collecting forms, the forms
+    collected so far are spilled to disk, and merged back in one letter
+    at a time when the output is written.
     """
 
     def __init__(self, in_dir, out_dir):
@@ -33,15 +39,26 @@ class LemmaLister(object):
                                 out_dir=None,
                                 verbosity='low')
 
-        forms = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        forms = _new_formset()
+        spilled = defaultdict(list)
+        spill_dir = None
+        watch = memory.SpillWatch()
         for filecontent in iterator.iterate():
             for entry in filecontent.entries:
                 for wordclass_forms in _process_entry(entry):
                     for item in wordclass_forms:
                         initial = item.sort[0]
                         forms[initial][item.sort][item.form].append(item)
-
-        for initial, sortcode_set in forms.items():
+            if watch.over_budget():
+                spill_dir = spill_dir or memory.spill_directory()
+                _spill(forms, spill_dir, spilled)
+                forms = _new_formset()
+                watch.spilled()
+
+        initials = list(spilled.keys()) + [i for i in forms.keys()
+                                           if i not in spilled]
+        for initial in initials:
+            sortcode_set = _merge_spilled(initial, forms, spilled)
             self.subdir = os.path.join(self.out_dir, initial)
             self.clear_dir()
             self.filecount = 0
@@ -70,8 +87,8 @@ class LemmaLister(object):
                             instance_node.set('variant', 'true')
                         lex_node.append(instance_node)
                     entry.append(lex_node)
-                    self.doc.append(entry)
-                    if len(self.doc) > 10000:
+                    self.writer.write(entry)
+                    if len(self.writer) > 10000:
                         self.writebuffer()
             self.writebuffer()
 
@@ -82,20 +99,52 @@ class LemmaLister(object):
             os.unlink(os.path.join(self.subdir, f))
 
     def writebuffer(self):
-        xml_string = etree.tounicode(self.doc, pretty_print=True)
-        filename = self.next_filename()
-        with open(filename, 'w') as filehandle:
-            filehandle.write(xml_string)
+        self.writer.close(self.next_filename())
         self.initialize_doc()
 
     def initialize_doc(self):
-        self.doc = etree.Element('entries')
+        # Lemmas are streamed to the next output file as they're
+        #  completed (see buildmanager.entrywriter)
+        self.writer = EntryWriter(self.subdir)
 
     def next_filename(self):
         self.filecount += 1
         return os.path.join(self.subdir, '%04d.xml' % (self.filecount,))
 
 
+def _new_formset():
+    return defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+
+
+def _spill(forms, spill_dir, spilled):
+    for initial, sortcode_set in forms.items():
+        filepath = os.path.join(spill_dir, '%s-%04d' % (initial,
+                                                        len(spilled[initial])))
+        memory.dump_run(filepath, [(sortcode, dict(form_set)) for
+                                   sortcode, form_set in sortcode_set.items()])
+        spilled[initial].append(filepath)
+
+
+def _merge_spilled(initial, forms, spilled):
+    """
+    Return the forms for a given initial, merging anything spilled to
+    disk (in the order in which it was collected) with what's still in
+    memory.
+    """
+    if not spilled.get(initial):
+        return forms[initial]
+    merged = defaultdict(lambda: defaultdict(list))
+    for filepath in spilled[initial]:
+        for sortcode, form_set in memory.load_run(filepath):
+            for form, items in form_set.items():
+                merged[sortcode][form].extend(items)
+        os.unlink(filepath)
+    for sortcode, form_set in forms.get(initial, {}).items():
+        for form, items in form_set.items():
+            merged[sortcode][form].extend(items)
+    return merged
+
+
 def _process_entry(entry):
     return [_process_wordclass(entry, wcs) for wcs in entry.wordclass_sets()]
 
@@ -12,6 +12,8 @@ import numpy
 
 import gelconfig
 from lex.entryiterator import EntryIterator
+from buildmanager.memory import SpillableDict
+from buildmanager import snapshot, lookupstats
 
 
 PICKLE_DIR = gelconfig.WEIGHTED_SIZE_DIR
@@ -107,9 +109,12 @@ class WeightedSize(object):
 
     """
     Manages the lookup of weighted-size values for OED entries
+
+    The index maps each entry ID to a dict of node ID -> EntryData; it's
+    moved to disk if the memory budget is reached while loading.
     """
 
-    index = defaultdict(lambda: defaultdict(dict))
+    index = SpillableDict('weighted_size_index')
 
     def __init__(self, **kwargs):
         self.moving_average = kwargs.get('averaged', True)
@@ -141,29 +146,42 @@ class WeightedSize(object):
 def _load_index():
     print('Caching OED entry-size data...')
     for letter in string.ascii_uppercase:
-        datasets = []
         pickle_file = os.path.join(PICKLE_DIR, letter)
-        with open(pickle_file, 'rb') as filehandle:
-            while 1:
-                try:
-                    data = pickle.load(filehandle)
-                except EOFError:
-                    break
-                else:
-                    datasets.append(data)
+        letter_index = snapshot.load_or_build(
+            'weighted_size_%s' % letter,
+            [pickle_file, ],
+            lambda: _index_letter(pickle_file),
+            code=[__file__, ])
+        for entry_id, nodes in letter_index.items():
+            WeightedSize.index[entry_id] = nodes
+    print('\t...caching complete.')
+
 
-        for data in datasets:
-            if data.inherit:
-                WeightedSize.index[data.entry_id][data.node_id] =\
-                    WeightedSize.index[data.entry_id][0]
+def _index_letter(pickle_file):
+    datasets = []
+    with open(pickle_file, 'rb') as filehandle:
+        while 1:
+            try:
+                data = pickle.load(filehandle)
+            except EOFError:
+                break
             else:
-                WeightedSize.index[data.entry_id][data.node_id] = data
-    print('\t...caching complete.')
+                datasets.append(data)
+
+    letter_index = defaultdict(dict)
+    for data in datasets:
+        if data.inherit:
+            letter_index[data.entry_id][data.node_id] =\
+                letter_index[data.entry_id][0]
+        else:
+            letter_index[data.entry_id][data.node_id] = data
+    return dict(letter_index)
     #for node_id, value in WeightedSize.index[91451].items():
     #    print(node_id)
     #    print(repr(value))
 
 
+@lookupstats.counted('weighted_size._moving_average')
 @lru_cache(128)
 def _moving_average(entry_id, node_id):
     entry_data = WeightedSize.index[entry_id][node_id]
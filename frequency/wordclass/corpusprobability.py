@@ -7,6 +7,7 @@ from collections import defaultdict
 from frequency.wordclass.utilities import (wordclass_base,
                                            wordclass_group,
                                            adjust_to_unity)
+from buildmanager import snapshot
 
 
 class BncPosProbability(object):
@@ -32,15 +33,22 @@ class BncPosProbability(object):
             return None
 
     def _load_data(self, filepath, supplement):
-        for in_file in (filepath, supplement):
-            if not in_file:
-                continue
+        sources = [f for f in (filepath, supplement) if f]
+        BncPosProbability.words = snapshot.load_or_build(
+            'bnc_probability', sources,
+            lambda: self._parse(sources),
+            code=[__file__, ])
+
+    def _parse(self, sources):
+        words = dict()
+        for in_file in sources:
             with open(in_file) as filehandle:
                 for line in filehandle:
                     if '\t' in line:
                         probset = PosProbabilitySet(line)
                         if probset.fpm >= self.frequency_limit:
-                            BncPosProbability.words[probset.word] = probset
+                            words[probset.word] = probset
+        return words
 
 
 class OecPosProbability(object):
@@ -64,11 +72,19 @@ class OecPosProbability(object):
             return None
 
     def _load_data(self, filepath):
+        OecPosProbability.words = snapshot.load_or_build(
+            'oec_pos_probability', [filepath, ],
+            lambda: self._parse(filepath),
+            code=[__file__, ])
+
+    def _parse(self, filepath):
+        words = dict()
         with open(filepath) as filehandle:
             for line in filehandle:
                 probset = PosProbabilitySet(line)
                 if probset.fpm >= self.frequency_limit:
-                    OecPosProbability.words[probset.word] = probset
+                    words[probset.word] = probset
+        return words
 
 
 class OecLemposProbability(object):
@@ -91,10 +107,18 @@ class OecLemposProbability(object):
             return None
 
     def _load_data(self, filepath):
+        OecLemposProbability.lemmas = snapshot.load_or_build(
+            'oec_lempos_probability', [filepath, ],
+            lambda: self._parse(filepath),
+            code=[__file__, ])
+
+    def _parse(self, filepath):
+        lemmas = dict()
         with open(filepath) as filehandle:
             for line in filehandle:
                 probset = LemposProbabilitySet(line)
-                OecLemposProbability.lemmas[probset.word] = probset
+                lemmas[probset.word] = probset
+        return lemmas
 
 
 class GenericProbabilitySet(object):
@@ -152,7 +176,7 @@ class GenericProbabilitySet(object):
         try:
             return self._base_ratios
         except AttributeError:
-            self._base_ratios = defaultdict(lambda: 0)
+            self._base_ratios = defaultdict(int)
             for pos, value in self.ratios().items():
                 wc = wordclass_base(pos)
                 self._base_ratios[wc] += value
@@ -175,7 +199,7 @@ class GenericProbabilitySet(object):
         try:
             return self._group_ratios
         except AttributeError:
-            self._group_ratios = defaultdict(lambda: 0)
+            self._group_ratios = defaultdict(int)
             for pos, value in self.ratios().items():
                 grp = wordclass_group(pos)
                 self._group_ratios[grp] += value
@@ -195,7 +219,7 @@ class PosProbabilitySet(GenericProbabilitySet):
         columns = line.strip().split('\t')
         self.word = columns[0]
         self.fpm = float(columns[1])
-        self.parts = defaultdict(lambda: 0)
+        self.parts = defaultdict(int)
         for p in columns[2:]:
             pos, percentage = p.split('=')
             self.parts[pos] += float(percentage)/100
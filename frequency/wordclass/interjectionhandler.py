@@ -21,9 +21,9 @@ to reduce counts proportionally for the other parts of speech.
 """
 
 from frequency.frequencyiterator import FrequencyIterator
-from frequency.wordclass.corpusprobability import BncPosProbability
+from buildmanager import registry
 
-BNC_PROB = BncPosProbability()
+BNC_PROB = registry.lazy('bnc_probability')
 
 
 class InterjectionHandler:
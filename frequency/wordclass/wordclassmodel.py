@@ -5,10 +5,10 @@ WordclassModel
 from collections import Counter
 
 from lex.propernames.propernames import is_proper_name
-from frequency.frequencypredictor import FrequencyPredictor
 from frequency.wordclass.utilities import wordclass_base, wordclass_group
+from buildmanager import registry
 
-freqPredictor = FrequencyPredictor()
+freqPredictor = registry.lazy('frequency_predictor')
 
 default_sizes = {
     'general': float(1),  # size assigned to unsized lemmas
@@ -2,20 +2,17 @@
 WordclassRatios
 """
 
-from frequency.frequencypredictor import FrequencyPredictor
-from frequency.wordclass.corpusprobability import (OecLemposProbability,
-                                                   BncPosProbability,
-                                                   OecPosProbability)
+from buildmanager import registry
 from frequency.wordclass.wordclassmodel import HierarchicalModel, FlatModel
 from frequency.wordclass.ngramsetmanager import NgramSetManager
 from frequency.wordclass.utilities import adjust_to_unity
 
 CORPUS_MANAGERS = {
-    'bnc': BncPosProbability(),
-    'oecpos': OecPosProbability(),
-    'oeclempos': OecLemposProbability(),
+    'bnc': registry.lazy('bnc_probability'),
+    'oecpos': registry.lazy('oec_pos_probability'),
+    'oeclempos': registry.lazy('oec_lempos_probability'),
 }
-FREQUENCY_PREDICTOR = FrequencyPredictor()
+FREQUENCY_PREDICTOR = registry.lazy('frequency_predictor')
 AWKWARD_CLASSES = {'VBZ', 'VBD', 'VBN', 'VBG', 'NNS', 'JJR', 'JJS',
                    'RBR', 'RBS'}
 
@@ -32,6 +32,65 @@ PIPELINE = (
 )
 
 
+#=====================================================================
+# Pipeline execution
+#=====================================================================
+
+# Number of worker processes used to run pipeline stages. Stages which
+#  don't depend on each other (e.g. the resource-preparation stages) are
+#  run at the same time. Set to 1 to run each stage in turn, in a single
+#  process.
+PIPELINE_WORKERS = 1
+
+# Skip any stage whose inputs, settings and code are unchanged since it
+#  last ran successfully (see buildmanager.buildcache). Changes to the
+#  OED/ODO source data can't be detected, so stages which read it always
+#  run; after a data refresh, run pipeline.py with --force so that the
+#  incremental stages reprocess every file too.
+BUILD_CACHE = True
+
+# When a stage maps each build file to an output file of the same name
+#  (mergeEntryPairs, addInflections, cleanAttributes, insertFrequency),
+#  only reprocess the files which have changed since the last run.
+INCREMENTAL_FILES = True
+
+# Number of worker processes used within a stage to process build files
+#  in parallel (mergeEntryPairs, addInflections, cleanAttributes or
+#  processBaseChain, insertFrequency, and indexing the base files). This
+#  is per stage, so the total number of processes may be up to
+#  PIPELINE_WORKERS * FILE_WORKERS.
+FILE_WORKERS = 1
+
+# Memory budget (in MB) for each stage; None means no limit. Stages which
+#  hold a lot of data in memory (frequencyListLemmas, alphabetizeOutput,
+#  insertFrequency, frequencyComputeScores) spill to disk when they reach
+#  it, and sharded stages start fewer workers. When several stages run at
+#  once, the budget is divided between them.
+MEMORY_BUDGET_MB = None
+# Rough amount of memory (in MB) needed by each worker process in a
+#  sharded stage, used to work out how many workers fit in the budget.
+WORKER_MEMORY_MB = 1500
+
+# Keep binary snapshots of lookup tables which are slow to build (the
+#  weighted-size index, corpus probability tables, frequency-prediction
+#  models) in BUILD_DIR/.snapshots, so that later processes can load them
+#  directly. A snapshot is rebuilt whenever its source files change.
+SNAPSHOTS = True
+
+# Serve the morphology hub, variants cache, ODO link tables, weighted-size
+#  index and frequency tables from a single resident daemon process (see
+#  buildmanager/daemon.py), rather than loading them in every worker. The
+#  pipeline starts the daemon if it isn't already running.
+RESOURCE_DAEMON = False
+
+# Run mergeEntryPairs, addInflections and cleanAttributes as a single
+#  fused stage, which parses and writes each build file only once.
+#  Optionally, the intermediate directories (02_defragmented, 03_inflected,
+#  04_inflected_ext) can still be written, for debugging.
+FUSED_BASE_CHAIN = False
+FUSED_KEEP_INTERMEDIATES = False
+
+
 #=====================================================================
 # Filepaths
 #=====================================================================
@@ -44,6 +103,11 @@ FINAL_ANCILLARY_DIR = os.path.join(FINAL_DIR, 'ancillary')
 RESOURCES_DIR = os.path.join(lexconfig.GEL_DIR, 'resources')
 FREQUENCY_BUILD_DIR = os.path.join(BUILD_DIR, 'frequency_build')
 WEIGHTED_SIZE_DIR = os.path.join(RESOURCES_DIR, 'weighted_size_index')
+# Run reports (timings, memory use, etc.) for each pipeline run
+REPORT_DIR = os.path.join(BUILD_DIR, 'reports')
+# Map of the IDs issued by earlier builds (see STABLE_IDS); this has to be
+#  kept from one build to the next.
+ID_MAP_DIR = os.path.join(RESOURCES_DIR, 'id_map')
 
 
 #=====================================================================
@@ -54,9 +118,30 @@ WEIGHTED_SIZE_DIR = os.path.join(RESOURCES_DIR, 'weighted_size_index')
 FILE_SIZE_BUILD = 1000
 FILE_SIZE_FINAL = 500
 
+# Format of the intermediate build files (01_base to 06_frequency): 'xml'
+#  (pretty-printed), or 'packed' (unindented and compressed; quicker to
+#  read and write, and about a tenth of the size - see
+#  buildmanager.packedxml). The final output is always XML.
+INTERMEDIATE_FORMAT = 'xml'
+
 # Number of digits used in IDs.
 ID_LENGTH = 9
 
+# IDs are allocated in a separate block for each build file (see
+#  idgenerator); the seed fixes where the first block starts, so that
+#  building the same data twice gives the same IDs. Each block must be
+#  big enough for every entry, wordclass set, morphset and type in the
+#  file.
+ID_SEED = 0
+ID_BLOCK_SIZE = 250000
+
+# If True, anything which was given an ID by an earlier build (matched by
+#  OED ID + node ID + wordclass + form) keeps the same ID, so that only
+#  new or changed entries get new IDs, and the final data changes only
+#  where the lexicon has changed. The IDs issued are kept in ID_MAP_DIR;
+#  ID_SEED and ID_BLOCK_SIZE mustn't be changed while it's in use.
+STABLE_IDS = False
+
 # Maximum number of characters in definitions. Longer definitions
 #   will be truncated.
 DEFINITION_LENGTH = 100
@@ -1,20 +1,323 @@
 """
-idgenerator
+idgenerator - Allocate the IDs given to entries, wordclass sets,
+morphsets and types
+
+IDs are handed out in ranges. Each build file gets a block of
+gelconfig.ID_BLOCK_SIZE IDs of its own, so files can be given IDs in any
+order, or in several processes at once, without two files ever sharing
+an ID. A file's block depends only on the seed (gelconfig.ID_SEED) and
+on the file's place in the sorted list of input files, so building the
+same data twice gives the same IDs.
+
+    ranges = IdRanges.plan(out_dir, filenames)
+    ...
+    allocator = ranges.allocator(filename)
+    node.set('id', allocator.next_id())
+    ...
+    ranges.record(allocator)
+
+The block given to each file, and how many of its IDs were used, are
+logged in the output directory (RANGE_LOG). When only some files are
+rebuilt (see buildmanager.incremental), the other files keep the blocks
+they had before. The unused end of each block is left as a gap in the
+sequence; IDs are never renumbered to close it up, since an ID must stay
+the same for as long as the file it's in is unchanged.
+
+If gelconfig.STABLE_IDS is switched on, IDs are also kept from one build
+to the next. Each entry, wordclass set, morphset and type is identified
+by a signature (OED ID + node ID + wordclass + form/sort, see
+processors.cleanattributes); anything whose signature was given an ID by
+an earlier build gets the same ID again, and only new signatures get new
+IDs. The map of signatures to IDs (IdMap) is kept in gelconfig.ID_MAP_DIR,
+one file for each build file. New IDs are always taken from above the
+highest ID ever issued from the block (recorded in ISSUED_LOG), so an ID
+is never reissued, even after whatever it was given to has gone.
+Call ranges.commit() once the stage has finished, to update the map.
+
+This assumes that signatures don't recur in different files: every
+entry has its own OED or ODO node ID.
 """
 
+import os
+import json
 import random
+import shutil
+import itertools
 
 import gelconfig
+from buildmanager import registry
+from buildmanager.checkpoint import write_atomically
 
 FORMATTER = '%0' + str(gelconfig.ID_LENGTH) + 'd'
-count = int(random.uniform(100000, 200000))
+RANGE_LOG = '.idranges.jsonl'
+ISSUED_LOG = '.issued.json'
+MAP_SUFFIX = '.tsv'
+PENDING_DIR = '.pending'
+
+ID_MAP = registry.lazy('id_map')
+
+
+def first_id(seed=None):
+    """
+    Return the number before the first ID: an arbitrary offset between
+    100000 and 200000, fixed for a given seed.
+    """
+    if seed is None:
+        seed = gelconfig.ID_SEED
+    return random.Random(seed).randint(100000, 200000)
+
+
+class IdAllocator(object):
+
+    """
+    Hands out consecutive IDs from a single range, keeping count of how
+    many have been used.
+    """
+
+    uses_signatures = False
+
+    def __init__(self, start, size=None, name=None, used=0):
+        self.start = start
+        self.size = size
+        self.name = name
+        self.used = used
+
+    def next_id(self):
+        if self.size is not None and self.used >= self.size:
+            raise RuntimeError('%s has used all %d IDs in its range; '
+                               'increase gelconfig.ID_BLOCK_SIZE' %
+                               (self.name or 'ID range', self.size))
+        self.used += 1
+        return FORMATTER % (self.start + self.used)
+
+    def id_for(self, signature):
+        """
+        Return the ID for the item with the given signature (which is
+        only used when IDs are kept from one build to the next).
+        """
+        return self.next_id()
+
+
+class StableIdAllocator(IdAllocator):
+
+    """
+    Gives each signature the ID it had in an earlier build, if it had
+    one; new signatures get new IDs from the range. The signatures and
+    their IDs are kept, to be written to the file's part of the ID map.
+    """
+
+    uses_signatures = True
+
+    def __init__(self, start, size, name, used, id_map):
+        IdAllocator.__init__(self, start, size=size, name=name, used=used)
+        self.id_map = id_map
+        self.assigned = []
+        self.claimed = set()
 
+    def id_for(self, signature):
+        value = self.id_map.find(signature)
+        if value is None or value in self.claimed:
+            value = self.next_id()
+        self.claimed.add(value)
+        self.assigned.append((signature, value))
+        return value
+
+
+class IdMap(object):
 
-def next_id():
     """
-    Return consecutive IDs
+    Signature -> ID for everything given an ID by earlier builds, read
+    from every file in the map directory.
     """
-    global count
-    count += 1
-    return FORMATTER % count
 
+    def __init__(self, directory):
+        self.ids = {}
+        if not os.path.isdir(directory):
+            return
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(MAP_SUFFIX):
+                continue
+            with open(os.path.join(directory, filename)) as filehandle:
+                for line in filehandle:
+                    signature, value = line.rstrip('\n').split('\t')
+                    self.ids[signature] = value
+
+    def find(self, signature):
+        return self.ids.get(signature)
+
+
+class IdRanges(object):
+
+    """
+    The block of IDs assigned to each file in a stage's input.
+
+    This is passed to each worker process along with the files, so it
+    holds nothing but the assignments and the paths of the logs (and,
+    if IDs are kept between builds, the highest ID issued so far from
+    each block).
+    """
+
+    def __init__(self, log_path, blocks, seed, block_size, map_dir=None):
+        self.log_path = log_path
+        self.blocks = blocks
+        self.seed = seed
+        self.block_size = block_size
+        self.base = first_id(seed)
+        self.map_dir = map_dir
+        self.issued = {}
+        if map_dir is not None:
+            self.issued = _read_issued(map_dir, seed, block_size)
+
+    @classmethod
+    def plan(cls, out_dir, filenames, seed=None, block_size=None,
+             stable=None):
+        """
+        Assign a block to each of filenames. Files which were assigned a
+        block by an earlier run (with the same seed and block size) keep
+        it; the rest are given the lowest free blocks, in filename
+        order. The log is rewritten to cover just these files.
+
+        If stable is True (by default, gelconfig.STABLE_IDS), IDs are
+        kept from one build to the next, using the map in
+        gelconfig.ID_MAP_DIR.
+        """
+        if seed is None:
+            seed = gelconfig.ID_SEED
+        if block_size is None:
+            block_size = gelconfig.ID_BLOCK_SIZE
+        if stable is None:
+            stable = gelconfig.STABLE_IDS
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        log_path = os.path.join(out_dir, RANGE_LOG)
+        filenames = sorted(set(filenames))
+
+        previous = {}
+        for record in read_log(log_path):
+            if record['seed'] == seed and record['block_size'] == block_size:
+                previous[record['range']] = record
+        blocks = {name: previous[name]['block'] for name in filenames
+                  if name in previous}
+        taken = set(blocks.values())
+        free = (block for block in itertools.count() if block not in taken)
+        for name in filenames:
+            if name not in blocks:
+                blocks[name] = next(free)
+
+        map_dir = gelconfig.ID_MAP_DIR if stable else None
+        ranges = cls(log_path, blocks, seed, block_size, map_dir=map_dir)
+        if map_dir is not None:
+            # Discard anything left by an interrupted run
+            shutil.rmtree(os.path.join(map_dir, PENDING_DIR),
+                          ignore_errors=True)
+        lines = []
+        for name in sorted(filenames, key=lambda name: blocks[name]):
+            used = previous[name]['used'] if name in previous else 0
+            lines.append(ranges._log_line(name, used))
+        write_atomically(log_path, ''.join(lines))
+        return ranges
+
+    def resources(self):
+        """
+        Return the registry resources which each worker process should
+        load (see buildmanager.sharding).
+        """
+        return ('idgenerator.ID_MAP',) if self.map_dir is not None else ()
+
+    def allocator(self, name):
+        """
+        Return an IdAllocator for the named file's block.
+        """
+        try:
+            block = self.blocks[name]
+        except KeyError:
+            raise KeyError('No ID range has been assigned to %s' % name)
+        start = self.base + block * self.block_size
+        if self.map_dir is None:
+            return IdAllocator(start, size=self.block_size, name=name)
+        return StableIdAllocator(start, self.block_size, name,
+                                 self.issued.get(str(block), 0),
+                                 registry.resolve(ID_MAP))
+
+    def record(self, allocator):
+        """
+        Log how many IDs a file has used. Each record is appended as a
+        single short write, so several processes can record at once.
+
+        If IDs are kept between builds, the file's part of the ID map is
+        written too, though it's only put in place by commit().
+        """
+        with open(self.log_path, 'a') as filehandle:
+            filehandle.write(self._log_line(allocator.name, allocator.used))
+        if self.map_dir is not None:
+            pending_dir = os.path.join(self.map_dir, PENDING_DIR)
+            if not os.path.isdir(pending_dir):
+                os.makedirs(pending_dir, exist_ok=True)
+            write_atomically(
+                os.path.join(pending_dir, allocator.name + MAP_SUFFIX),
+                ''.join(['%s\t%s\n' % (signature, value)
+                         for signature, value in allocator.assigned]))
+
+    def commit(self):
+        """
+        Once every file has been given its IDs, put the new parts of the
+        ID map in place, and record the highest ID issued from each
+        block. (Until then, the map is left as it was at the start of
+        the stage, so every file is given IDs from the same map.)
+        """
+        if self.map_dir is None:
+            return
+        pending_dir = os.path.join(self.map_dir, PENDING_DIR)
+        if os.path.isdir(pending_dir):
+            for filename in os.listdir(pending_dir):
+                os.replace(os.path.join(pending_dir, filename),
+                           os.path.join(self.map_dir, filename))
+            os.rmdir(pending_dir)
+        issued = dict(self.issued)
+        for record in read_log(self.log_path):
+            block = str(record['block'])
+            issued[block] = max(issued.get(block, 0), record['used'])
+        write_atomically(os.path.join(self.map_dir, ISSUED_LOG),
+                         json.dumps({'seed': self.seed,
+                                     'block_size': self.block_size,
+                                     'issued': issued}))
+
+    def _log_line(self, name, used):
+        block = self.blocks[name]
+        return json.dumps({'range': name,
+                           'block': block,
+                           'start': self.base + block * self.block_size,
+                           'used': used,
+                           'seed': self.seed,
+                           'block_size': self.block_size}) + '\n'
+
+
+def _read_issued(map_dir, seed, block_size):
+    filepath = os.path.join(map_dir, ISSUED_LOG)
+    if not os.path.isfile(filepath):
+        return {}
+    with open(filepath) as filehandle:
+        issued = json.load(filehandle)
+    if issued['seed'] != seed or issued['block_size'] != block_size:
+        raise ValueError('The ID map in %s was made with ID_SEED=%s and '
+                         'ID_BLOCK_SIZE=%s; these must stay the same for '
+                         'IDs to be kept between builds' %
+                         (map_dir, issued['seed'], issued['block_size']))
+    return issued['issued']
+
+
+def read_log(log_path):
+    """
+    Return the latest record for each range in the log, in block order.
+    """
+    records = {}
+    if os.path.isfile(log_path):
+        with open(log_path) as filehandle:
+            for line in filehandle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A record left incomplete by an interrupted run
+                    continue
+                records[record['range']] = record
+    return sorted(records.values(), key=lambda record: record['start'])
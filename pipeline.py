@@ -3,21 +3,136 @@ pipeline - pipeline for managing GEL build processes
 """
 
 import os
+import argparse
+from functools import partial
 
 import gelconfig
+from buildmanager.scheduler import StageScheduler
+from buildmanager import buildcache, runreport, runoptions, subset, registry
+from buildmanager import profiling, memorytrace, lookupstats, slowentries
+from buildmanager import iostats
+from buildmanager.incremental import run_per_file, xml_files
 
+FUSED_STAGES = ('mergeEntryPairs', 'addInflections', 'cleanAttributes')
 
-def dispatch():
+
+def dispatch(resume=False, subset_options=None, profile_options=None,
+             memory_diagnostics=False, lookup_stats=False,
+             intermediate_format=None, force=False):
     """
-    Run each function listed in the config
+    Run each function listed in the config. Stages which don't depend
+    on each other are run concurrently if gelconfig.PIPELINE_WORKERS
+    is more than 1.
+
+    Timings, memory use, etc. for each stage are compiled into a run
+    report (see buildmanager.runreport).
+
+    If resume is True, stages which were interrupted part-way through
+    carry on from their last checkpoint (see buildmanager.checkpoint).
+    If subset_options are given, the pipeline is run over just a slice
+    of the data (see buildmanager.subset). If profile_options are given
+    ({'stages': [...], 'mode': 'cprofile' or 'sampling'}), the named
+    stages are profiled (see buildmanager.profiling). If
+    memory_diagnostics is True, tracemalloc snapshots are taken during
+    each stage (see buildmanager.memorytrace). If lookup_stats is True,
+    hits and misses on each lookup are counted and reported at the end
+    of each stage (see buildmanager.lookupstats). If intermediate_format
+    is given, it overrides gelconfig.INTERMEDIATE_FORMAT for this run
+    (see buildmanager.packedxml). If force is True, every stage is run,
+    and every file reprocessed, regardless of the build cache.
     """
-    for function_name, run_this in gelconfig.PIPELINE:
-        if run_this:
-            print('=' * 30)
-            print('Running "%s"...' % (function_name,))
-            print('=' * 30)
-            func = globals()[function_name]
+    stage_names = [function_name for function_name, run_this
+                   in gelconfig.PIPELINE if run_this]
+    if gelconfig.FUSED_BASE_CHAIN:
+        stage_names = _fuse_base_chain(stage_names)
+    options = {'resume': resume,
+               'subset': subset_options,
+               'memory_budget_mb': _stage_memory_budget(),
+               'profile': profile_options,
+               'memory_diagnostics': memory_diagnostics,
+               'lookup_stats': lookup_stats,
+               'intermediate_format': intermediate_format,
+               'force': force}
+    runoptions.set_options(**options)
+    if subset.is_active():
+        print('Running on a subset of the data (%s); output will be '
+              'marked as partial' % subset.describe())
+    run_id = runreport.new_run_id()
+    daemon_process = None
+    if gelconfig.RESOURCE_DAEMON:
+        from buildmanager import daemon
+        daemon_process = daemon.start()
+        if daemon_process is None and force:
+            # Already running: drop anything it may have loaded from
+            #  data that's about to be rebuilt
+            daemon.reload()
+    scheduler = StageScheduler(stage_names,
+                               partial(run_stage, run_id=run_id,
+                                       options=options),
+                               workers=gelconfig.PIPELINE_WORKERS)
+    try:
+        scheduler.run()
+    finally:
+        if daemon_process is not None:
+            daemon.stop(daemon_process)
+        report = runreport.compile_report(run_id, stage_names)
+        runreport.print_summary(report)
+
+
+def run_stage(function_name, run_id=None, options=None):
+    runoptions.set_options(**(options or {}))
+    monitor = runreport.StageMonitor(function_name, run_id)
+    if (gelconfig.BUILD_CACHE and not subset.is_active() and
+            not runoptions.get_option('force') and
+            buildcache.is_current(function_name)):
+        print('Skipping "%s" (nothing has changed since the last run)' %
+              (function_name,))
+        monitor.skipped()
+        return
+    print('=' * 30)
+    print('Running "%s"...' % (function_name,))
+    print('=' * 30)
+    func = globals()[function_name]
+    try:
+        with monitor, \
+                lookupstats.stage_counter(function_name), \
+                slowentries.SlowEntriesReport(function_name, run_id), \
+                iostats.IOAccount(function_name), \
+                memorytrace.stage_tracer(function_name, run_id), \
+                profiling.stage_profiler(function_name, run_id):
             func()
+    finally:
+        # Free the resources loaded by this stage before the next one
+        #  (in the same process) starts
+        registry.release()
+    if subset.is_active():
+        # Partial output mustn't be mistaken for a full build next time
+        buildcache.invalidate(function_name)
+    elif gelconfig.BUILD_CACHE:
+        buildcache.record(function_name)
+
+
+def _stage_memory_budget():
+    # Stages running at the same time share the memory budget
+    if gelconfig.MEMORY_BUDGET_MB is None:
+        return None
+    return gelconfig.MEMORY_BUDGET_MB / max(gelconfig.PIPELINE_WORKERS, 1)
+
+
+def _fuse_base_chain(stage_names):
+    """
+    Replace mergeEntryPairs, addInflections and cleanAttributes with the
+    single fused stage processBaseChain - provided that all three are
+    enabled. The fused stage goes where cleanAttributes was, so that it
+    also picks up the ODE/NOAD files written by addOdoContent.
+    """
+    if not all([name in stage_names for name in FUSED_STAGES]):
+        return stage_names
+    position = stage_names.index('cleanAttributes')
+    return ([name for name in stage_names[:position]
+             if name not in FUSED_STAGES] +
+            ['processBaseChain', ] +
+            stage_names[position + 1:])
 
 
 def distilOdo():
@@ -47,7 +162,11 @@ def indexOedSize():
 
 def generateBase():
     from processors.generatebase import GenerateBase
-    processor = GenerateBase(os.path.join(gelconfig.BUILD_DIR, '01_base'))
+    from buildmanager.checkpoint import Checkpoint
+    checkpoint = Checkpoint('generateBase',
+                            resume=runoptions.get_option('resume'))
+    processor = GenerateBase(os.path.join(gelconfig.BUILD_DIR, '01_base'),
+                             checkpoint=checkpoint)
     processor.process()
 
     from processors.indexbuildfiles import index_build_files
@@ -57,18 +176,29 @@ def generateBase():
 
 def mergeEntryPairs():
     from processors.mergeentries import merge_entries
-    merge_entries(os.path.join(gelconfig.BUILD_DIR, '01_base'),
-                  os.path.join(gelconfig.BUILD_DIR, '02_defragmented'))
+    run_per_file(merge_entries,
+                 os.path.join(gelconfig.BUILD_DIR, '01_base'),
+                 os.path.join(gelconfig.BUILD_DIR, '02_defragmented'),
+                 stage='mergeEntryPairs',
+                 sharded=True)
 
 
 def addInflections():
     from processors.addinflections import add_inflections
-    add_inflections(os.path.join(gelconfig.BUILD_DIR, '02_defragmented'),
-                    os.path.join(gelconfig.BUILD_DIR, '03_inflected'))
+    run_per_file(add_inflections,
+                 os.path.join(gelconfig.BUILD_DIR, '02_defragmented'),
+                 os.path.join(gelconfig.BUILD_DIR, '03_inflected'),
+                 stage='addInflections',
+                 sharded=True,
+                 resources=('processors.addinflections.MORPHOLOGY',))
 
     from processors.addmissinginflections import add_missing_inflections
-    add_missing_inflections(os.path.join(gelconfig.BUILD_DIR, '03_inflected'),
-                            os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext'))
+    run_per_file(add_missing_inflections,
+                 os.path.join(gelconfig.BUILD_DIR, '03_inflected'),
+                 os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext'),
+                 stage='addInflections',
+                 sharded=True,
+                 resources=('processors.addmissinginflections.VARIANTS_CACHE',))
 
 
 def addOdoContent():
@@ -80,8 +210,43 @@ def addOdoContent():
 
 def cleanAttributes():
     from processors.cleanattributes import clean_attributes
-    clean_attributes(os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext'),
-                     os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes'))
+    from idgenerator import IdRanges
+    in_dir = os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext')
+    out_dir = os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes')
+    # Each file gets its own block of IDs, so the files can be processed
+    #  in any order, in any number of processes
+    id_ranges = IdRanges.plan(out_dir, xml_files(in_dir))
+    run_per_file(clean_attributes, in_dir, out_dir, id_ranges,
+                 stage='cleanAttributes',
+                 sharded=True,
+                 resources=id_ranges.resources())
+    id_ranges.commit()
+
+
+def processBaseChain():
+    from processors.basechain import (process_base_chain, clean_odo_files,
+                                      odo_files)
+    from idgenerator import IdRanges
+    if gelconfig.FUSED_KEEP_INTERMEDIATES:
+        intermediate_dirs = tuple([os.path.join(gelconfig.BUILD_DIR, d) for d in
+                                   ('02_defragmented', '03_inflected',
+                                    '04_inflected_ext')])
+    else:
+        intermediate_dirs = None
+    base_dir = os.path.join(gelconfig.BUILD_DIR, '01_base')
+    odo_dir = os.path.join(gelconfig.BUILD_DIR, '04_inflected_ext')
+    out_dir = os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes')
+    id_ranges = IdRanges.plan(out_dir,
+                              xml_files(base_dir) + odo_files(odo_dir))
+    run_per_file(process_base_chain, base_dir, out_dir,
+                 intermediate_dirs, id_ranges,
+                 stage='processBaseChain',
+                 sharded=True,
+                 resources=(('processors.addinflections.MORPHOLOGY',
+                             'processors.addmissinginflections.VARIANTS_CACHE')
+                            + id_ranges.resources()))
+    clean_odo_files(odo_dir, out_dir, id_ranges)
+    id_ranges.commit()
 
 
 def frequencyListLemmas():
@@ -106,14 +271,20 @@ def frequencyRecompilePredictors():
 
 def frequencyComputeScores():
     from processors.computefrequency import compute_frequencies
-    compute_frequencies()
+    compute_frequencies(resume=runoptions.get_option('resume'))
 
 
 def insertFrequency():
     from processors.insertfrequency import insert_frequency
-    insert_frequency(os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes'),
-                     os.path.join(gelconfig.BUILD_DIR, '06_frequency'),
-                     os.path.join(gelconfig.FREQUENCY_BUILD_DIR, 'types_with_frequency'))
+    frequency_dir = os.path.join(gelconfig.FREQUENCY_BUILD_DIR,
+                                 'types_with_frequency')
+    run_per_file(insert_frequency,
+                 os.path.join(gelconfig.BUILD_DIR, '05_cleanattributes'),
+                 os.path.join(gelconfig.BUILD_DIR, '06_frequency'),
+                 frequency_dir,
+                 stage='insertFrequency',
+                 dependencies=(frequency_dir,),
+                 sharded=True)
 
 
 def alphabetizeOutput():
@@ -131,4 +302,51 @@ def indexOutput():
 
 
 if __name__ == '__main__':
-    dispatch()
+    parser = argparse.ArgumentParser(description='Run the GEL build pipeline')
+    parser.add_argument('--resume', action='store_true',
+                        help='carry on from the last checkpoint in any '
+                        'stage that was interrupted')
+    parser.add_argument('--letters',
+                        help='build a subset: only these initial letters '
+                        '(e.g. "ab")')
+    parser.add_argument('--oed-file-filter',
+                        help='build a subset: only OED source files '
+                        'matching this filter')
+    parser.add_argument('--max-files', type=int,
+                        help='build a subset: only the first N build files')
+    parser.add_argument('--profile', nargs='+', metavar='STAGE',
+                        help='profile these stages (or "all"), writing the '
+                        'profiles to the report directory')
+    parser.add_argument('--profile-mode', choices=profiling.MODES,
+                        default='cprofile',
+                        help='"cprofile" (exact, slow) or "sampling" (low '
+                        'overhead)')
+    parser.add_argument('--memory-diagnostics', action='store_true',
+                        help='take tracemalloc snapshots during each stage, '
+                        'and report the top allocation sites')
+    parser.add_argument('--lookup-stats', action='store_true',
+                        help='count calls, hits and misses on each lookup '
+                        'table and cache, and report them after each stage')
+    parser.add_argument('--intermediate-format', choices=('xml', 'packed'),
+                        help='format for the intermediate build files '
+                        '(default: gelconfig.INTERMEDIATE_FORMAT)')
+    parser.add_argument('--force', '--no-cache', action='store_true',
+                        help='run every enabled stage, and reprocess every '
+                        'build file, even if nothing seems to have changed '
+                        '(e.g. after a refresh of the OED/ODO data)')
+    args = parser.parse_args()
+    subset_options = {'letters': args.letters,
+                      'oed_file_filter': args.oed_file_filter,
+                      'max_files': args.max_files}
+    if not any(subset_options.values()):
+        subset_options = None
+    if args.profile:
+        profile_options = {'stages': args.profile, 'mode': args.profile_mode}
+    else:
+        profile_options = None
+    dispatch(resume=args.resume, subset_options=subset_options,
+             profile_options=profile_options,
+             memory_diagnostics=args.memory_diagnostics,
+             lookup_stats=args.lookup_stats,
+             intermediate_format=args.intermediate_format,
+             force=args.force)
@@ -3,19 +3,20 @@ AddInflections
 """
 
 import re
+import time
+from functools import partial
 
 from lxml import etree
 
 import gelconfig
-from lex.gel.fileiterator import FileIterator
-from lex.inflections.mmh.mmhcache import MmhCache
-from lex.inflections.inflection import Inflection, ArchaicEndings
+from buildmanager.fileiterator import FileIterator
+from buildmanager import registry, slowentries, daemon
 from lex.wordclass.wordclass import Wordclass
 from lex.lemma import Lemma
 
-MORPHOLOGY = MmhCache()
-INFLECTOR = Inflection()
-ARCHAIC = ArchaicEndings()
+MORPHOLOGY = registry.lazy('morphology')
+INFLECTOR = registry.lazy('inflector')
+ARCHAIC = registry.lazy('archaic_endings')
 INFLECTABLE = set(('NN', 'JJ', 'RB', 'VB'))
 UNINFLECTABLE = re.compile(r'(^the |[ -](and)[ -])', re.I)
 DONT_PLURALIZE = re.compile(r'[a-z]{3}(' + gelconfig.UNPLURALIZED + ')$', re.I)
@@ -24,10 +25,34 @@ DONT_PLURALIZE = re.compile(r'[a-z]{3}(' + gelconfig.UNPLURALIZED + ')$', re.I)
 def add_inflections(in_dir, out_dir):
     iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
     for filecontent in iterator.iterate():
-        for entry in filecontent.entries:
+        inflect_entries(filecontent.entries)
+
+
+def inflect_entries(entries):
+    # If the morphology hub is held by the resource daemon, look up every
+    #  form in the file in one go, rather than one round trip per form
+    with daemon.prefetched(MORPHOLOGY, 'inflect_fuzzy',
+                           partial(_morphology_lookups, entries)):
+        for entry in entries:
+            start = time.perf_counter()
             for wordclass_set in [wcs for wcs in entry.wordclass_sets()
                                   if wcs.wordclass() in INFLECTABLE]:
                 _process_wordclass_set(wordclass_set)
+            slowentries.record('addInflections.inflect_entries',
+                               time.perf_counter() - start,
+                               entry.lemma, entry.oed_id())
+
+
+def _morphology_lookups(entries):
+    # Every lookup _inflect_from_mmh() might make (and a few it won't)
+    lookups = []
+    for entry in entries:
+        for wordclass_set in entry.wordclass_sets():
+            wordclass = wordclass_set.wordclass()
+            if wordclass in INFLECTABLE:
+                lookups.extend([((morphset.form,), {'wordclass': wordclass})
+                                for morphset in wordclass_set.morphsets()])
+    return lookups
 
 
 def _process_wordclass_set(wordclass_set):
@@ -2,15 +2,17 @@
 add_missing_inflections
 """
 
+from functools import partial
+
 from lxml import etree
 
 import gelconfig
-from lex.gel.fileiterator import FileIterator
-from lex.oed.variants.variantscache import VariantsCache
+from buildmanager.fileiterator import FileIterator
+from buildmanager import registry, daemon
 from lex.oed.daterange import DateRange
 from lex.wordclass.wordclass import Wordclass
 
-VARIANTS_CACHE = VariantsCache(wordclasses=('NNS', 'VBZ', 'VBN', 'VBD'))
+VARIANTS_CACHE = registry.lazy('variants_cache')
 INFLECTIONS = {'NN': ('NNS',), 'VB': ('VBZ', 'VBD', 'VBN')}
 MINIMUM_DATE = gelconfig.DATE_MINIMUM
 
@@ -24,12 +26,35 @@ def add_missing_inflections(in_dir, out_dir):
     iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
 
     for filecontent in iterator.iterate():
-        for entry in filecontent.entries:
+        add_missing_to_entries(filecontent.entries)
+
+
+def add_missing_to_entries(entries):
+    # If the variants cache is held by the resource daemon, the lookups
+    #  for the whole file are sent in two batches (which entries are
+    #  listed, then their variants), rather than one round trip apiece
+    s1_entries = [entry for entry in entries if entry.tag() == 's1']
+    with daemon.prefetched(VARIANTS_CACHE, 'id_exists',
+                           partial(_listing_lookups, s1_entries)):
+        listed = [entry for entry in s1_entries
+                  if VARIANTS_CACHE.id_exists(entry.oed_id())]
+    with daemon.prefetched(VARIANTS_CACHE, 'find',
+                           partial(_variant_lookups, listed)):
+        for entry in listed:
             id = entry.oed_id()
-            if entry.tag() == 's1' and VARIANTS_CACHE.id_exists(id):
-                for wordclass_set in entry.wordclass_sets():
-                    if wordclass_set.wordclass() in ('NN', 'VB'):
-                        _process_wordclass_set(wordclass_set, id)
+            for wordclass_set in entry.wordclass_sets():
+                if wordclass_set.wordclass() in ('NN', 'VB'):
+                    _process_wordclass_set(wordclass_set, id)
+
+
+def _listing_lookups(entries):
+    return [((entry.oed_id(),), {}) for entry in entries]
+
+
+def _variant_lookups(entries):
+    return [((), {'id': entry.oed_id(), 'wordclass': wordclass_set.wordclass()})
+            for entry in entries for wordclass_set in entry.wordclass_sets()
+            if wordclass_set.wordclass() in ('NN', 'VB')]
 
 
 def _process_wordclass_set(wordclass_set, id):
@@ -4,11 +4,14 @@ AlphaSort
 
 import string
 import os
+import heapq
 
 from lxml import etree
 
 import gelconfig
-from lex.gel.fileiterator import FileIterator
+from buildmanager.fileiterator import FileIterator
+from buildmanager.entrywriter import EntryWriter
+from buildmanager import subset, memory
 
 file_size = gelconfig.FILE_SIZE_FINAL
 xsl_uri = gelconfig.XSL_MAIN_URI
@@ -31,17 +34,24 @@ class AlphaSort(object):
             for entry in filecontent.entries:
                 sortcode = entry.attribute('sort') or 'zzz'
                 initial = sortcode[0]
-                self.streams[initial].add_to_buffer(entry.node)
+                if subset.includes_letter(initial):
+                    self.streams[initial].add_to_buffer(entry.node)
         # finish off writing anything left in the buffer
-        for initial in alphabet:
+        for initial in self.letters:
             self.streams[initial].write()
-        for initial in alphabet:
+        for initial in self.letters:
             print('sorting %s...' % initial)
             self.streams[initial].sort_in_place()
+        subset.mark_partial(self.out_dir)
+
+    @property
+    def letters(self):
+        # In subset mode, only the letters included in the subset
+        return [l for l in alphabet if subset.includes_letter(l)]
 
     def initialize(self):
         self.streams = {}
-        for initial in alphabet:
+        for initial in self.letters:
             self.streams[initial] = LetterSet(initial, self.out_dir)
             self.streams[initial].purge_directory()
 
@@ -55,17 +65,18 @@ class LetterSet(object):
         self.clear_buffer()
 
     def clear_buffer(self):
-        self.doc = etree.Element('entries')
-        self.doc.addprevious(xslpi)
+        # Entries are streamed to the next output file as they're added
+        #  (see buildmanager.entrywriter)
+        self.writer = EntryWriter(self.out_dir, preamble=xslpi)
 
     def add_to_buffer(self, node):
-        self.doc.append(node)
+        self.writer.write(node)
         if self.size >= file_size:
             self.write()
 
     @property
     def size(self):
-        return len(self.doc)
+        return len(self.writer)
 
     @property
     def out_file(self):
@@ -74,10 +85,7 @@ class LetterSet(object):
 
     def write(self):
         if self.size:
-            with open(self.out_file, 'w') as filehandle:
-                filehandle.write(etree.tostring(self.doc.getroottree(),
-                                                pretty_print=True,
-                                                encoding='unicode'))
+            self.writer.close(self.out_file)
         self.clear_buffer()
 
     def purge_directory(self):
@@ -88,19 +96,41 @@ class LetterSet(object):
             os.unlink(os.path.join(self.out_dir, f))
 
     def sort_in_place(self):
+        """
+        Sort all the entries for this letter. If the memory budget is
+        reached, entries read so far are sorted and spilled to disk as a
+        run, and the runs are merged at the end; the merge is stable, so
+        the result is the same as sorting everything in memory.
+        """
         self.filecount = 0
         iterator = FileIterator(in_dir=self.out_dir,
                                 out_dir=None,
                                 verbosity=None)
         entries = []
+        runs = []
+        spill_dir = None
+        watch = memory.SpillWatch()
         for filecontent in iterator.iterate():
             for entry in filecontent.entries:
                 sortcode = entry.attribute('sort') or 'zzz'
                 entries.append((sortcode, entry.tostring()))
+            if watch.over_budget():
+                spill_dir = spill_dir or memory.spill_directory()
+                entries.sort(key=lambda e: e[0])
+                runs.append(os.path.join(spill_dir, '%s-%04d' %
+                                         (self.letter, len(runs))))
+                memory.dump_run(runs[-1], entries)
+                entries = []
+                watch.spilled()
         self.purge_directory()
         self.clear_buffer()
         entries.sort(key=lambda e: e[0])
+        if runs:
+            entries = heapq.merge(*[memory.load_run(f) for f in runs],
+                                  entries, key=lambda e: e[0])
         for entry in entries:
             node = etree.fromstring(entry[1])
             self.add_to_buffer(node)
         self.write()
+        for filepath in runs:
+            os.unlink(filepath)
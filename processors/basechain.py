@@ -0,0 +1,105 @@
+"""
+process_base_chain - Fused version of the base processing chain
+
+Runs merge_entries, add_inflections, add_missing_inflections and
+clean_attributes over each build file in turn, parsing the file once and
+serializing only the final result (rather than writing and re-parsing
+02_defragmented, 03_inflected and 04_inflected_ext along the way).
+"""
+
+import os
+import shutil
+
+from buildmanager.fileiterator import FileIterator
+from buildmanager import packedxml
+from idgenerator import IdRanges
+from processors.mergeentries import merge_file_entries
+from processors.addinflections import inflect_entries
+from processors.addmissinginflections import add_missing_to_entries
+from processors.cleanattributes import clean_attributes, clean_entries
+from buildmanager.incremental import (stage_files, collect_files,
+                                      scratch_directory, xml_files)
+
+ODO_PREFIXES = ('ode-', 'noad-')
+
+
+def process_base_chain(in_dir, out_dir, intermediate_dirs=None,
+                       id_ranges=None):
+    """
+    Process each file in in_dir (01_base) through the whole chain,
+    writing the result to out_dir (05_cleanattributes). IDs are
+    allocated from each file's block in id_ranges (see
+    clean_attributes()).
+
+    If intermediate_dirs is supplied, it should be a tuple of the three
+    directories normally written along the way (02_defragmented,
+    03_inflected, 04_inflected_ext); each file's state after each step
+    is written there as well, for debugging.
+    """
+    planned = id_ranges is None
+    if planned:
+        id_ranges = IdRanges.plan(out_dir, [f for f in os.listdir(in_dir)
+                                            if f.endswith('.xml')])
+    iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
+    for filecontent in iterator.iterate():
+        filename = os.path.basename(iterator.in_file)
+        merge_file_entries(filecontent)
+        # Entries which have been merged into another entry are no
+        #  longer in the document, and mustn't be processed again.
+        entries = [e for e in filecontent.entries
+                   if e.node.getparent() is not None]
+        _write_intermediate(entries, intermediate_dirs, 0, filename)
+        inflect_entries(entries)
+        _write_intermediate(entries, intermediate_dirs, 1, filename)
+        add_missing_to_entries(entries)
+        _write_intermediate(entries, intermediate_dirs, 2, filename)
+        allocator = id_ranges.allocator(filename)
+        clean_entries(entries, allocator)
+        id_ranges.record(allocator)
+    if planned:
+        id_ranges.commit()
+
+
+def odo_files(in_dir):
+    """
+    Return the ODE/NOAD files in in_dir (i.e. the ones added by
+    OdoAdditions).
+    """
+    return sorted([f for f in os.listdir(in_dir)
+                   if f.endswith('.xml') and f.startswith(ODO_PREFIXES)])
+
+
+def clean_odo_files(in_dir, out_dir, id_ranges=None):
+    """
+    Run clean_attributes over just the ODE/NOAD files in in_dir, adding
+    the results to out_dir.
+    """
+    filenames = odo_files(in_dir)
+    if not filenames:
+        return
+    planned = id_ranges is None
+    if planned:
+        # Keep the blocks of the files already in out_dir
+        id_ranges = IdRanges.plan(out_dir, xml_files(out_dir) + filenames)
+    scratch = scratch_directory()
+    try:
+        scratch_in = os.path.join(scratch, 'in')
+        scratch_out = os.path.join(scratch, 'out')
+        stage_files(in_dir, filenames, scratch_in)
+        os.mkdir(scratch_out)
+        clean_attributes(scratch_in, scratch_out, id_ranges)
+        collect_files(scratch_out, out_dir)
+    finally:
+        shutil.rmtree(scratch)
+    if planned:
+        id_ranges.commit()
+
+
+def _write_intermediate(entries, intermediate_dirs, step, filename):
+    if not intermediate_dirs or not entries:
+        return
+    directory = intermediate_dirs[step]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    doc = entries[0].node.getroottree()
+    packedxml.write_document(os.path.join(directory, filename), doc)
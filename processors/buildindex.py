@@ -9,7 +9,8 @@ from collections import namedtuple
 from lxml import etree
 
 import gelconfig
-from lex.gel.fileiterator import FileIterator
+from buildmanager.fileiterator import FileIterator
+from buildmanager import subset
 
 alphabet = list(string.ascii_lowercase)
 xsl_uri = gelconfig.XSL_INDEX_URI
@@ -32,9 +33,14 @@ class BuildIndex(object):
         self.compile_data()
         self.write()
 
+    @property
+    def letters(self):
+        # In subset mode, only the letters included in the subset
+        return [l for l in alphabet if subset.includes_letter(l)]
+
     def compile_data(self):
         self.data = {}
-        for letter in alphabet:
+        for letter in self.letters:
             print('Compiling index for %s...' % letter)
             self.data[letter] = []
             sub_dir = os.path.join(self.in_dir, letter)
@@ -47,7 +53,7 @@ class BuildIndex(object):
                 self.data[letter].append(filedata)
 
         self.stats = {}
-        for letter in alphabet:
+        for letter in self.letters:
             self.stats[letter] = {'entries': 0,
                                   'types': 0,
                                   'distinct_types': 0,
@@ -61,13 +67,16 @@ class BuildIndex(object):
                                'types': 0,
                                'files': 0,
                                'distinct_types': 0}
-        for letter in alphabet:
+        for letter in self.letters:
             for z in ('entries', 'types', 'distinct_types', 'files'):
                 self.stats['total'][z] += self.stats[letter][z]
 
     def write(self):
         doc = etree.Element('letters')
         doc.addprevious(xslpi)
+        if subset.is_active():
+            doc.set('partial', 'true')
+            doc.set('subset', subset.describe())
 
         #total_nodes = etree.SubElement(doc, 'total',
         #              files=str(self.stats['total']['files']),
@@ -75,7 +84,7 @@ class BuildIndex(object):
         #              types=str(self.stats['total']['types']),
         #              distinctTypes=str(self.stats['total']['distinct_types']))
 
-        for letter in alphabet:
+        for letter in self.letters:
             letter_node = etree.SubElement(doc, 'letterSet',
                                            letter=letter,
                                            files=str(self.stats[letter]['files']),
@@ -2,13 +2,16 @@
 clean_attributes
 """
 
-from lex.gel.fileiterator import FileIterator
-from idgenerator import next_id
+import os
+from collections import Counter
+
+from buildmanager.fileiterator import FileIterator
+from idgenerator import IdRanges
 
 REMOVABLE = ('oedLexid', 'odoLexid', 'tag', 'oedId', 'parentId')
 
 
-def clean_attributes(in_dir, out_dir):
+def clean_attributes(in_dir, out_dir, id_ranges=None):
     """
     Clean up GEL data by adding/removing/adjusting various attributes.
 
@@ -16,24 +19,88 @@ def clean_attributes(in_dir, out_dir):
     - Add a sort code to every entry, morphset, and type;
     - Fuzz start and end dates (approximate to nearest 50 or 100 years);
     - Remove unnecessary attributes from entry tags.
-    """
 
+    IDs for each file are taken from the file's block in id_ranges (an
+    idgenerator.IdRanges); if this isn't supplied, blocks are assigned
+    to the files in in_dir. (When id_ranges is supplied, the caller
+    should call its commit() once every file has been processed.)
+    """
+    planned = id_ranges is None
+    if planned:
+        id_ranges = IdRanges.plan(out_dir, [f for f in os.listdir(in_dir)
+                                            if f.endswith('.xml')])
     iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
     for filecontent in iterator.iterate():
-        for entry in filecontent.entries:
-            for att in REMOVABLE:
-                if att in entry.node.attrib:
-                    entry.node.attrib.pop(att)
-            entry.node.set('id', next_id())
-            entry.node.set('sort', entry.sort)
-
-            for block in entry.wordclass_sets():
-                block.node.set('id', next_id())
-                block.fuzz_dates()
-                for morphset in block.morphsets():
-                    morphset.node.set('id', next_id())
-                    morphset.node.set('sort', morphset.sort)
-                    morphset.fuzz_dates()
-                    for typeunit in morphset.types():
-                        typeunit.node.set('id', next_id())
-                        typeunit.node.set('sort', typeunit.sort)
+        allocator = id_ranges.allocator(os.path.basename(iterator.in_file))
+        clean_entries(filecontent.entries, allocator)
+        id_ranges.record(allocator)
+    if planned:
+        id_ranges.commit()
+
+
+def clean_entries(entries, allocator):
+    """
+    Give IDs and sort codes to the entries, etc. (see clean_attributes()),
+    taking the IDs from the allocator.
+
+    Each item is identified by a signature, so that if IDs are kept from
+    one build to the next (gelconfig.STABLE_IDS), it gets the same ID it
+    had before: the entry's OED ID and node ID (or ODO ID) and sort code;
+    the wordclass of each wordclass set; the sort code of each morphset;
+    and the sort code and wordclass of each type. Each signature includes
+    the signature of the item it belongs to, and, where there's more than
+    one item with the same signature, a count.
+    """
+    id_for = allocator.id_for
+    # (Signatures are only made if they're going to be used)
+    if allocator.uses_signatures:
+        make_signature = _signature
+    else:
+        make_signature = _no_signature
+    for entry in entries:
+        sort = entry.sort
+        entry_signature = make_signature(
+            '', 'e', entry.attribute('oedId'), entry.attribute('oedLexid'),
+            entry.attribute('odoLexid'), sort)
+        for att in REMOVABLE:
+            if att in entry.node.attrib:
+                entry.node.attrib.pop(att)
+        entry.node.set('id', id_for(entry_signature))
+        entry.node.set('sort', sort)
+
+        counts = Counter()
+        for block in entry.wordclass_sets():
+            block_signature = make_signature(entry_signature, 'w',
+                                             block.wordclass())
+            counts[block_signature] += 1
+            block_signature += '#%d' % counts[block_signature]
+            block.node.set('id', id_for(block_signature))
+            block.fuzz_dates()
+            for morphset in block.morphsets():
+                sort = morphset.sort
+                morphset_signature = make_signature(block_signature, 'm',
+                                                    sort)
+                counts[morphset_signature] += 1
+                morphset_signature += '#%d' % counts[morphset_signature]
+                morphset.node.set('id', id_for(morphset_signature))
+                morphset.node.set('sort', sort)
+                morphset.fuzz_dates()
+                for typeunit in morphset.types():
+                    sort = typeunit.sort
+                    type_signature = make_signature(morphset_signature, 't',
+                                                    sort, typeunit.wordclass())
+                    counts[type_signature] += 1
+                    type_signature += '#%d' % counts[type_signature]
+                    typeunit.node.set('id', id_for(type_signature))
+                    typeunit.node.set('sort', sort)
+
+
+def _signature(parent, *parts):
+    # Tabs and newlines are kept out, since the ID map is stored as
+    #  tab-separated lines
+    return parent + '|'.join([(part or '').replace('\t', ' ')
+                              .replace('\n', ' ') for part in parts]) + '/'
+
+
+def _no_signature(parent, *parts):
+    return ''
@@ -46,7 +46,7 @@ def compile_regression_data():
     #        wordclasses=('VB', 'VBZ', 'VBG', 'VBD', 'VBN'),)
 
 
-def compute_frequencies():
+def compute_frequencies(resume=False):
     # We initialize the corpus probability managers here, to make sure
     #  they can find their data files
     from frequency.wordclass.corpusprobability import (OecLemposProbability,
@@ -57,4 +57,7 @@ def compute_frequencies():
     BncPosProbability(filepath=bnc_prob_file, supplement=bnc_supplement_file)
 
     from frequency.calculate_frequency import calculate_frequency
-    calculate_frequency(DIRECTORY2, DIRECTORY3)
+    from buildmanager.checkpoint import Checkpoint
+    checkpoint = Checkpoint('frequencyComputeScores', resume=resume)
+    calculate_frequency(DIRECTORY2, DIRECTORY3, checkpoint=checkpoint)
+    checkpoint.finish()
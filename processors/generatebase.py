@@ -4,6 +4,8 @@ GenerateBase - Generates the base data files for GEL
 
 import os
 import re
+import time
+from itertools import chain
 
 from lxml import etree
 
@@ -12,9 +14,10 @@ from lex.entryiterator import EntryIterator
 from lex.oed.variants.variantscomputer import VariantsComputer
 from lex.oed.daterange import DateRange
 from lex.oed.lemmawithvariants import LemmaWithVariants
-from lex.odo.linkmanager import LinkManager
-from lex.inflections.spellingconverter import SpellingConverter
 from lex.wordclass.wordclass import Wordclass
+from buildmanager import (runreport, subset, registry, slowentries,
+                          packedxml, daemon)
+from buildmanager.entrywriter import EntryWriter
 
 # number of entries per output file
 FILESIZE = gelconfig.FILE_SIZE_BUILD
@@ -26,9 +29,9 @@ SPECULATIVE_END = gelconfig.DATE_SPECULATIVE_END
 US_VARIANT_MINIMUM = gelconfig.VAR_US_MINIMUM
 MINIMUM_DATE = gelconfig.DATE_MINIMUM
 
-LINK_MANAGERS = {dictname: LinkManager(dictName=dictname)
+LINK_MANAGERS = {dictname: registry.lazy('link_manager.' + dictname)
                  for dictname in ('ode', 'noad')}
-SPELLING_CONVERTER = SpellingConverter()
+SPELLING_CONVERTER = registry.lazy('spelling_converter')
 SPLIT_CORRECTORS = (
     re.compile(r'([bdfglmnprstz])~\1(ing|ed|er|ery|ish)$'),
     re.compile(r'([bdfgmprstz])~\1(ess)$'),
@@ -37,33 +40,59 @@ SPLIT_CORRECTORS = (
 
 class GenerateBase(object):
 
-    def __init__(self, dir):
+    def __init__(self, dir, checkpoint=None):
         self.out_dir = dir
+        self.checkpoint = checkpoint
         self.filecount = 0
         self.entry = None
-        self.root = None
+        self.writer = None
 
-    def clear_outdir(self):
+    def clear_outdir(self, keep=0):
+        """
+        Delete everything in the output directory, except for the first
+        <keep> output files (completed before a run was interrupted).
+        """
         for filename in os.listdir(self.out_dir):
+            stem = os.path.splitext(filename)[0]
+            if stem.isdigit() and int(stem) <= keep:
+                continue
             os.unlink(os.path.join(self.out_dir, filename))
 
     def initialize_root(self):
-        self.root = etree.Element('entries')
+        # Each entry is streamed to the next output file as it's
+        #  completed (see buildmanager.entrywriter)
+        self.writer = EntryWriter(
+            self.out_dir, packed=packedxml.output_format() == 'packed')
 
     def buffersize(self):
-        return len(self.root)
+        return len(self.writer)
 
     def process(self):
-        self.clear_outdir()
+        # If resuming after an interruption, keep the files already
+        #  completed, and skip forward to the entry after the last one
+        #  written out.
+        if self.checkpoint and self.checkpoint.resuming:
+            self.filecount = self.checkpoint.state['filecount']
+            resume_after = self.checkpoint.state['last_entry']
+            previous = self.checkpoint.state['previous_sort']
+        else:
+            self.filecount = 0
+            resume_after = None
+            previous = None
+        self.clear_outdir(keep=self.filecount)
         self.initialize_root()
-        previous = None
-        iterator = EntryIterator(dict_type='oed',
-                                 verbosity='low',
-                                 fix_ligatures=True)
-
-        # Iterate through all entries in OED, processing each and storing
-        #   the results in a buffer
-        for entry in iterator.iterate():
+        previous_id = None
+        max_files = subset.max_files()
+
+        # Iterate through all entries in OED (or in the OED files included
+        #   in the subset), processing each and storing the results in
+        #   a buffer
+        for entry in chain(*[iterator.iterate() for iterator
+                             in self.entry_iterators()]):
+            if resume_after is not None:
+                if entry.id == resume_after:
+                    resume_after = None
+                continue
             self.entry = entry
 
             # Write the buffer to a file when it gets to a certain size, and
@@ -73,17 +102,50 @@ class GenerateBase(object):
                     entry.lemma_manager().lexical_sort() != previous):
                 self.writebuffer()
                 self.initialize_root()
+                if self.checkpoint:
+                    self.checkpoint.mark_done(self.filecount,
+                                              filecount=self.filecount,
+                                              last_entry=previous_id,
+                                              previous_sort=previous)
+                if max_files and self.filecount >= max_files:
+                    break
 
             # Process the current entry -> buffer
+            start = time.perf_counter()
             self.process_entry()
+            slowentries.record('generateBase.process_entry',
+                               time.perf_counter() - start,
+                               entry.headword, entry.id)
+            runreport.count(entries=1)
 
             # Keep track of the previous entry's headword (to help find a good
             #   opportunity to write the buffer to a file)
             previous = entry.lemma_manager().lexical_sort()
+            previous_id = entry.id
+
+        if resume_after is not None:
+            print('\tWARNING: the entry recorded in the checkpoint (%s) was '
+                  'not found; re-run without --resume' % (resume_after,))
 
         # Write a file for anything still left in the buffer after the
         #  entry iterator has completed
-        self.writebuffer()
+        if not max_files or self.filecount < max_files:
+            self.writebuffer()
+        else:
+            self.writer.discard()
+        if self.checkpoint:
+            self.checkpoint.finish()
+
+    def entry_iterators(self):
+        iterators = []
+        for file_filter in subset.oed_file_filters():
+            kwargs = {'dict_type': 'oed',
+                      'verbosity': 'low',
+                      'fix_ligatures': True}
+            if file_filter:
+                kwargs['file_filter'] = file_filter
+            iterators.append(EntryIterator(**kwargs))
+        return iterators
 
     def process_entry(self):
         # Make sure <s1> blocks know what entry their parent entry
@@ -92,12 +154,27 @@ class GenerateBase(object):
             for block in self.entry.s1blocks():
                 block.paired_entry_id = self.entry.paired_with()
 
-        # Process each s1 block
-        for block in self.entry.s1blocks():
-            self.process_block(block)
-        # Process each sense or subentry that represents a distinct lemma
-        for sense in self.entry.lemma_senses_uniq():
-            self.process_block(sense)
+        # If the link tables are held by the resource daemon, look up the
+        #  links for every block in the entry in one go, rather than one
+        #  round trip per block
+        with daemon.prefetched(LINK_MANAGERS['ode'], 'translate_id',
+                               self.link_lookups), \
+                daemon.prefetched(LINK_MANAGERS['noad'], 'translate_id',
+                                  self.link_lookups):
+            # Process each s1 block
+            for block in self.entry.s1blocks():
+                self.process_block(block)
+            # Process each sense or subentry that represents a distinct
+            #  lemma
+            for sense in self.entry.lemma_senses_uniq():
+                self.process_block(sense)
+
+    def link_lookups(self):
+        link_ids = [_long_id(block) for block in
+                    chain(self.entry.s1blocks(), self.entry.lemma_senses_uniq())]
+        if self.entry.paired_with():
+            link_ids.append(self.entry.paired_with())
+        return [((link_id,), {}) for link_id in link_ids]
 
     def process_block(self, block):
         """
@@ -138,7 +215,7 @@ class GenerateBase(object):
         gel_block.assign_wordclasses()
         node = gel_block.construct_entry_node()
         if gel_block.is_usable():
-            self.root.append(node)
+            self.writer.write(node)
 
     def split_compound(self, block):
         """
@@ -159,8 +236,7 @@ class GenerateBase(object):
                 block.set_lemma(LemmaWithVariants(new_lemma))
 
     def writebuffer(self):
-        with open(self.next_filename(), 'w') as filehandle:
-            filehandle.write(etree.tounicode(self.root, pretty_print=True))
+        self.writer.close(self.next_filename())
 
     def next_filename(self):
         self.filecount += 1
@@ -188,10 +264,7 @@ class GelBlock(object):
             return 'sense'
 
     def long_id(self):
-        if self.type == 's1':
-            return self.block.id
-        else:
-            return self.block.id + '#' + self.block.node_id()
+        return _long_id(self.block)
 
     def set_dates(self):
         if self.block.date().start == 0:
@@ -530,6 +603,13 @@ class GelLemma:
         return node
 
 
+def _long_id(block):
+    if block.tag == 's1':
+        return block.id
+    else:
+        return block.id + '#' + block.node_id()
+
+
 def split_closed_compound(lemma, referent_lemma):
     if referent_lemma.endswith('-') or len(referent_lemma) < 3:
         return lemma
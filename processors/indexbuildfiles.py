@@ -4,10 +4,29 @@ index_build_files
 
 import csv
 
-from lex.gel.fileiterator import FileIterator
+import gelconfig
+from buildmanager.fileiterator import FileIterator
+from buildmanager.sharding import run_sharded
 
 
 def index_build_files(dir, out_file):
+    if gelconfig.FILE_WORKERS > 1:
+        index = []
+        for rows in run_sharded(index_rows, dir, None):
+            index.extend(rows)
+    else:
+        index = index_rows(dir, None)
+
+    with open(out_file, 'w') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerows(index)
+
+
+def index_rows(dir, out_dir):
+    """
+    Return the file number and the first and last headwords of each
+    file in dir (out_dir is unused).
+    """
     iterator = FileIterator(in_dir=dir, out_dir=None, verbosity=None)
 
     index = []
@@ -18,7 +37,4 @@ def index_build_files(dir, out_file):
         index.append((iterator.file_number(),
                       headwords[0],
                       headwords[-1]))
-
-    with open(out_file, 'w') as csvfile:
-        csvwriter = csv.writer(csvfile)
-        csvwriter.writerows(index)
+    return index
@@ -4,7 +4,8 @@ InsertFrequency
 
 from lxml import etree
 
-from lex.gel.fileiterator import FileIterator
+from buildmanager.fileiterator import FileIterator
+from buildmanager import daemon, lookupstats
 from frequency.frequencymemo import FrequencyMemo
 from lex.frequencytable import FrequencyTable, sum_frequency_tables
 
@@ -15,16 +16,29 @@ def insert_frequency(in_dir, out_dir, freq_dir):
     them in the GEL data.
     """
     iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
-    frequency_finder = FrequencyMemo(freq_dir)
+    # If the resource daemon is running, it already holds the frequency
+    #  tables
+    frequency_finder = lookupstats.instrument(
+        'frequency_memo',
+        daemon.remote('frequency_memo') or FrequencyMemo(freq_dir))
 
     for filecontent in iterator.iterate():
+        # Look up every type in the file at once (a single round trip,
+        #  if the tables are held by the daemon)
+        type_ids = [type.id for entry in filecontent.entries
+                    for wordclass_set in entry.wordclass_sets()
+                    for type in wordclass_set.types()]
+        file_frequencies = dict(zip(type_ids, daemon.call_many(
+            frequency_finder, 'find_frequencies',
+            [(id,) for id in type_ids])))
+
         for entry in filecontent.entries:
             for wordclass_set in entry.wordclass_sets():
                 etree.strip_attributes(wordclass_set.node, 'size')
 
                 tables = {}
                 for type in wordclass_set.types():
-                    frequencies = frequency_finder.find_frequencies(type.id)
+                    frequencies = file_frequencies[type.id]
                     if frequencies:
                         tables[type.id] = FrequencyTable(data=frequencies)
                     else:
@@ -4,7 +4,7 @@ merge_entries
 
 from collections import defaultdict
 
-from lex.gel.fileiterator import FileIterator
+from buildmanager.fileiterator import FileIterator
 
 
 def merge_entries(in_dir, out_dir):
@@ -16,26 +16,33 @@ def merge_entries(in_dir, out_dir):
     """
     iterator = FileIterator(in_dir=in_dir, out_dir=out_dir, verbosity='low')
     for filecontent in iterator.iterate():
-        target_log = set()
-        ode_linked_parallels = _find_parallels(filecontent)
-        for entry in filecontent.entries:
-            target_id = None
-            if entry.attribute('parentId'):
-                # Avoid loops (two entries treating each other
-                #  as parent)
-                if not entry.oed_id() in target_log:
-                    target_id = entry.attribute('parentId')
-                    target_log.add(entry.attribute('parentId'))
-            elif entry.oed_lexid() in ode_linked_parallels:
-                target_id = ode_linked_parallels[entry.oed_lexid()]
+        merge_file_entries(filecontent)
 
-            if target_id:
-                targets = filecontent.entry_by_id(target_id)
-                targets = [t for t in targets if t.tag() == 's1']
-                if targets:
-                    for wc in entry.wordclass_sets():
-                        targets[0].node.append(wc.node)
-                    entry.node.getparent().remove(entry.node)
+
+def merge_file_entries(filecontent):
+    """
+    Merge entries within a single build file.
+    """
+    target_log = set()
+    ode_linked_parallels = _find_parallels(filecontent)
+    for entry in filecontent.entries:
+        target_id = None
+        if entry.attribute('parentId'):
+            # Avoid loops (two entries treating each other
+            #  as parent)
+            if not entry.oed_id() in target_log:
+                target_id = entry.attribute('parentId')
+                target_log.add(entry.attribute('parentId'))
+        elif entry.oed_lexid() in ode_linked_parallels:
+            target_id = ode_linked_parallels[entry.oed_lexid()]
+
+        if target_id:
+            targets = filecontent.entry_by_id(target_id)
+            targets = [t for t in targets if t.tag() == 's1']
+            if targets:
+                for wc in entry.wordclass_sets():
+                    targets[0].node.append(wc.node)
+                entry.node.getparent().remove(entry.node)
 
 
 def _find_parallels(fileset):
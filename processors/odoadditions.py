@@ -4,19 +4,20 @@ OdoAdditions
 
 import os
 import re
+from functools import partial
 
 from lxml import etree
 
 import gelconfig
-from lex.odo.linkmanager import LinkManager
-from lex.odo.distiller import Distiller
 from lex.oed.daterange import DateRange
 from lex.wordclass.wordclass import Wordclass
+from buildmanager import subset, registry, packedxml, daemon
+from buildmanager.entrywriter import EntryWriter
 
 FILE_SIZE = gelconfig.FILE_SIZE_BUILD
-LINK_MANAGERS = {dictname: LinkManager(dictName=dictname)
+LINK_MANAGERS = {dictname: registry.lazy('link_manager.' + dictname)
                  for dictname in ('ode', 'noad')}
-DISTILLERS = {dictname: Distiller(dictName=dictname)
+DISTILLERS = {dictname: registry.lazy('distiller.' + dictname)
               for dictname in ('ode', 'noad')}
 START_DATE = gelconfig.DATE_ODO_START
 END_DATE = gelconfig.DATE_MAXIMUM
@@ -56,39 +57,48 @@ class OdoAdditions(object):
         self.filecount = 0
         self.dictname = dictname
         self.initialize_doc()
-        for entry in DISTILLERS[dictname].entries:
-            if (LINK_MANAGERS[dictname].translate_id(entry.lexid) and
-                entry.wordclass_blocks[0].wordclass != 'NP'):
-                continue
-            if entry.lexid in self.handled:
-                continue
-            if entry.wordclass_blocks[0].wordclass == 'SYM':
-                continue
-
-            self.doc.append(self.construct_entry_node(entry))
-            self.handled.add(entry.lexid)
-            for block in entry.wordclass_blocks:
-                if block.complement:
-                   self.handled.add(block.complement)
-
-            # Write the buffer to file, then clear the buffer
-            if self.buffersize() >= FILE_SIZE:
-                self.writebuffer()
-                self.initialize_doc()
+        # If the link tables are held by the resource daemon, look up
+        #  every entry's link in one go (see buildmanager.daemon)
+        with daemon.prefetched(LINK_MANAGERS[dictname], 'translate_id',
+                               partial(_link_lookups, dictname)):
+            for entry in DISTILLERS[dictname].entries:
+                if (LINK_MANAGERS[dictname].translate_id(entry.lexid) and
+                    entry.wordclass_blocks[0].wordclass != 'NP'):
+                    continue
+                if entry.lexid in self.handled:
+                    continue
+                if entry.wordclass_blocks[0].wordclass == 'SYM':
+                    continue
+                if not subset.includes_headword(entry.headword):
+                    continue
+
+                self.writer.write(self.construct_entry_node(entry))
+                self.handled.add(entry.lexid)
+                for block in entry.wordclass_blocks:
+                    if block.complement:
+                       self.handled.add(block.complement)
+
+                # Write the buffer to file, then clear the buffer
+                if self.buffersize() >= FILE_SIZE:
+                    self.writebuffer()
+                    self.initialize_doc()
+                    if subset.max_files() and self.filecount >= subset.max_files():
+                        self.writer.discard()
+                        return
         # Output anything still left in the buffer at the end
         self.writebuffer()
 
     def initialize_doc(self):
-        self.doc = etree.Element('entries')
+        # Each entry is streamed to the next output file as it's
+        #  constructed (see buildmanager.entrywriter)
+        self.writer = EntryWriter(
+            self.out_dir, packed=packedxml.output_format() == 'packed')
 
     def buffersize(self):
-        return len(self.doc)
+        return len(self.writer)
 
     def writebuffer(self):
-        with open(self.next_filename(), 'w') as filehandle:
-            filehandle.write(etree.tostring(self.doc,
-                                            pretty_print=True,
-                                            encoding='unicode'))
+        self.writer.close(self.next_filename())
 
     def next_filename(self):
         self.filecount += 1
@@ -201,3 +211,7 @@ class OdoAdditions(object):
             return matching_blocks[0].definition
         except IndexError:
             return None
+
+
+def _link_lookups(dictname):
+    return [((entry.lexid,), {}) for entry in DISTILLERS[dictname].entries]
@@ -0,0 +1,13 @@
+"""
+Tests run against the lex stand-ins used by the benchmarks (see
+benchmarks/standins), with the whole build in a scratch directory.
+"""
+
+import os
+import sys
+import tempfile
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIR)
+sys.path.insert(0, os.path.join(REPOSITORY_DIR, 'benchmarks', 'standins'))
+os.environ['GEL_BENCHMARK_DIR'] = tempfile.mkdtemp(prefix='gel_test_')
@@ -0,0 +1,15 @@
+from buildmanager import buildcache
+
+
+def test_stages_reading_lex_sources_are_never_skipped():
+    for stage_name in ('distilOdo', 'generateMorphologyHub', 'generateBase'):
+        assert not buildcache.is_cacheable(stage_name)
+        buildcache.record(stage_name)
+        assert not buildcache.is_current(stage_name)
+        buildcache.invalidate(stage_name)
+
+
+def test_unchanged_stage_is_skipped():
+    buildcache.record('indexOutput')
+    assert buildcache.is_current('indexOutput')
+    buildcache.invalidate('indexOutput')
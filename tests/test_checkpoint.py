@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pytest
+
+import gelconfig
+from buildmanager.checkpoint import Checkpoint, write_atomically
+from frequency.frequencyiterator import FrequencyIterator
+
+
+@pytest.fixture
+def letter_dirs():
+    in_dir = os.path.join(gelconfig.BUILD_DIR, 'checkpoint_in')
+    out_dir = os.path.join(gelconfig.BUILD_DIR, 'checkpoint_out')
+    for directory in (in_dir, out_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+    for letter, forms in (('a', ('aa', 'ab')), ('b', ('ba', 'bb'))):
+        os.mkdir(os.path.join(in_dir, letter))
+        with open(os.path.join(in_dir, letter, '0001.xml'), 'w') as fh:
+            fh.write('<entries>%s</entries>' % ''.join(
+                ['<lemma sort="%s"><form>%s</form></lemma>' % (form, form)
+                 for form in forms]))
+    yield in_dir, out_dir
+    Checkpoint('test').finish()
+
+
+def test_resume_restores_completed_units_and_state():
+    checkpoint = Checkpoint('test')
+    checkpoint.mark_done(1, filecount=1, last_entry='abc')
+    checkpoint.mark_done(2, filecount=2)
+
+    resumed = Checkpoint('test', resume=True)
+    assert resumed.resuming
+    assert resumed.completed == [1, 2]
+    assert resumed.is_done(2) and not resumed.is_done(3)
+    assert resumed.state == {'filecount': 2, 'last_entry': 'abc'}
+    resumed.finish()
+
+
+def test_starting_afresh_discards_earlier_progress():
+    Checkpoint('test').mark_done('a')
+    assert not Checkpoint('test', resume=False).resuming
+    assert not Checkpoint('test', resume=True).resuming
+
+
+def test_interrupted_iteration_resumes_after_last_letter(letter_dirs):
+    in_dir, out_dir = letter_dirs
+    iterator = FrequencyIterator(in_dir=in_dir, out_dir=out_dir,
+                                 letters='ab', checkpoint=Checkpoint('test'))
+    seen = []
+    for entry in iterator.iterate():
+        seen.append(entry.form)
+        if entry.form == 'ba':
+            # Interrupted part-way through 'b'
+            break
+    assert seen == ['aa', 'ab', 'ba']
+
+    iterator = FrequencyIterator(in_dir=in_dir, out_dir=out_dir,
+                                 letters='ab',
+                                 checkpoint=Checkpoint('test', resume=True))
+    assert [entry.form for entry in iterator.iterate()] == ['ba', 'bb']
+    # Letter 'a' was written by the first run, and left alone
+    for letter in ('a', 'b'):
+        assert os.listdir(os.path.join(out_dir, letter)) == ['0001.xml']
+
+
+def test_write_atomically_leaves_no_temporary_file(tmp_path):
+    filepath = str(tmp_path / 'out.xml')
+    write_atomically(filepath, 'text')
+    write_atomically(filepath, b'bytes')
+    assert os.listdir(str(tmp_path)) == ['out.xml']
+    with open(filepath, 'rb') as filehandle:
+        assert filehandle.read() == b'bytes'
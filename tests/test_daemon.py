@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+import stat
+
+import gelconfig
+from buildmanager import buildcache, daemon, registry
+
+from conftest import REPOSITORY_DIR
+
+
+@pytest.fixture
+def resource_daemon(monkeypatch):
+    # The daemon is started as a separate process, which needs the lex
+    #  stand-ins too
+    monkeypatch.setenv('PYTHONPATH', os.path.join(REPOSITORY_DIR,
+                                                  'benchmarks', 'standins'))
+    monkeypatch.setattr(gelconfig, 'RESOURCE_DAEMON', True)
+    buildcache.invalidate('generateMorphologyHub')
+    process = daemon.start()
+    daemon.CONNECTION['pid'] = None
+    yield
+    daemon.stop(process)
+    daemon.CONNECTION['pid'] = None
+    buildcache.invalidate('generateMorphologyHub')
+
+
+def _count_requests(monkeypatch):
+    requests = []
+    send = daemon._request
+
+    def counting_request(message, client):
+        requests.append(message[0])
+        return send(message, client)
+    monkeypatch.setattr(daemon, '_request', counting_request)
+    return requests
+
+
+def _hub_completed(timestamp):
+    if not os.path.isdir(buildcache.CACHE_DIR):
+        os.makedirs(buildcache.CACHE_DIR)
+    buildcache._save_record('generateMorphologyHub',
+                            {'fingerprint': None, 'outputs': {},
+                             'completed': timestamp})
+
+
+def test_prefetched_lookups_make_one_round_trip(resource_daemon, monkeypatch):
+    morphology = daemon.remote('morphology')
+    forms = ['cat', 'dog', 'run', 'hop']
+    expected = [morphology.inflect_fuzzy(form, wordclass='VB')
+                for form in forms]
+    requests = _count_requests(monkeypatch)
+    with daemon.prefetched(morphology, 'inflect_fuzzy',
+                           lambda: [((form,), {'wordclass': 'VB'})
+                                    for form in forms]):
+        results = [morphology.inflect_fuzzy(form, wordclass='VB')
+                   for form in forms]
+    assert requests == ['call']
+    assert ([[unit.form for s in result for unit in s.morphunits]
+             for result in results] ==
+            [[unit.form for s in result for unit in s.morphunits]
+             for result in expected])
+
+
+def test_out_of_date_resource_is_reloaded(resource_daemon):
+    morphology = daemon.remote('morphology')
+    morphology.inflect_fuzzy('cat', wordclass='NN')
+    assert 'morphology' in daemon._request(('versions',), daemon._connection())
+
+    # generateMorphologyHub has been run again since the daemon loaded it
+    _hub_completed(1000.0)
+    daemon.remote('morphology')
+    assert 'morphology' not in daemon._request(('versions',),
+                                               daemon._connection())
+
+
+def test_socket_is_private_to_its_owner(resource_daemon):
+    mode = stat.S_IMODE(os.stat(daemon.SOCKET_PATH).st_mode)
+    assert mode == 0o600
+
+
+def test_nothing_is_loaded_or_looked_up_without_the_daemon(monkeypatch):
+    monkeypatch.setattr(gelconfig, 'RESOURCE_DAEMON', False)
+    registry.release(['morphology'])
+
+    def lookups():
+        raise AssertionError('lookups built for a local resource')
+    with daemon.prefetched(registry.lazy('morphology'), 'inflect_fuzzy',
+                           lookups):
+        pass
+    assert not registry.is_loaded('morphology')
@@ -0,0 +1,72 @@
+import os
+
+from lxml import etree
+
+from buildmanager import packedxml
+from buildmanager.entrywriter import EntryWriter
+
+
+def _entries(count):
+    root = etree.Element('entries')
+    for i in range(count):
+        entry = etree.SubElement(root, 'e', sort='caf%d' % i)
+        etree.SubElement(entry, 'lemma').text = 'café %d' % i
+        wordclass_set = etree.SubElement(entry, 'wordclassSet')
+        etree.SubElement(wordclass_set, 'wordclass', penn='NN')
+        definition = etree.SubElement(entry, 'definition')
+        definition.text = 'a '
+        etree.SubElement(definition, 'i').text = 'mixed'
+        definition[0].tail = ' definition'
+    return root
+
+
+def _written(tmp_path, root, **kwargs):
+    filepath = str(tmp_path / 'out.xml')
+    writer = EntryWriter(str(tmp_path), **kwargs)
+    for entry in [etree.fromstring(etree.tostring(e)) for e in root]:
+        writer.write(entry)
+    assert len(writer) == len(root)
+    writer.close(filepath)
+    assert os.listdir(str(tmp_path)) == ['out.xml']
+    with open(filepath, 'rb') as filehandle:
+        return filehandle.read()
+
+
+def test_same_as_writing_the_whole_tree(tmp_path):
+    root = _entries(3)
+    assert (_written(tmp_path, root) ==
+            etree.tostring(root, pretty_print=True, encoding='UTF-8'))
+
+
+def test_empty_file(tmp_path):
+    root = _entries(0)
+    assert _written(tmp_path, root) == b'<entries/>\n'
+    assert (_written(tmp_path, root, packed=True) ==
+            packedxml.pack(root))
+
+
+def test_preamble_comes_first(tmp_path):
+    root = _entries(2)
+    preamble = etree.PI('xml-stylesheet', 'type="text/xsl" href="x.xsl"')
+    expected = etree.fromstring(etree.tostring(root))
+    expected.addprevious(etree.PI(preamble.target, preamble.text))
+    assert (_written(tmp_path, root, preamble=preamble) ==
+            etree.tostring(expected.getroottree(), pretty_print=True,
+                           encoding='UTF-8'))
+
+
+def test_same_as_packing_the_whole_tree(tmp_path, monkeypatch):
+    # Small records, so that entries span records
+    monkeypatch.setattr(packedxml, 'RECORD_SIZE', 50)
+    root = _entries(5)
+    data = _written(tmp_path, root, packed=True)
+    assert data == packedxml.pack(root)
+    assert len(list(packedxml.records(data))) > 5
+
+
+def test_discarded_file_leaves_nothing_behind(tmp_path):
+    writer = EntryWriter(str(tmp_path))
+    writer.write(_entries(1)[0])
+    assert len(os.listdir(str(tmp_path))) == 1
+    writer.discard()
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+from lxml import etree
+
+from buildmanager import packedxml
+from buildmanager.equivalence import compare_dirs, compare_files
+
+ENTRY = ('<e id="%s" sort="%s"><lemma>%s</lemma>'
+         '<wordclass penn="%s" wordclassId="%s"/></e>')
+
+
+def _entries(*entries):
+    return '<entries>%s</entries>' % ''.join([ENTRY % entry
+                                              for entry in entries])
+
+
+CAT = ('10', 'cat', 'cat', 'NN', '11')
+DOG = ('20', 'dog', 'dog', 'NN', '21')
+
+
+@pytest.fixture
+def build_dirs(tmp_path):
+    dir1, dir2 = str(tmp_path / 'first'), str(tmp_path / 'second')
+    for directory in (dir1, dir2):
+        os.makedirs(os.path.join(directory, 'c'))
+    return dir1, dir2
+
+
+def _write(directory, filename, text):
+    with open(os.path.join(directory, filename), 'w') as filehandle:
+        filehandle.write(text)
+    return os.path.join(directory, filename)
+
+
+def test_identical_builds(build_dirs):
+    dir1, dir2 = build_dirs
+    for directory in build_dirs:
+        _write(directory, os.path.join('c', '0001.xml'), _entries(CAT, DOG))
+    assert compare_dirs(dir1, dir2, workers=1) == []
+
+
+def test_file_in_one_build_only(build_dirs):
+    dir1, dir2 = build_dirs
+    _write(dir1, os.path.join('c', '0001.xml'), _entries(CAT))
+    _write(dir1, os.path.join('c', '0002.xml'), _entries(DOG))
+    _write(dir2, os.path.join('c', '0001.xml'), _entries(CAT))
+    assert compare_dirs(dir1, dir2, workers=1) == [
+        {'file': os.path.join('c', '0002.xml'), 'differences': 1,
+         'details': ['file only in first directory']}]
+
+
+def test_formatting_and_moved_entries_are_not_differences(build_dirs):
+    dir1, dir2 = build_dirs
+    path1 = _write(dir1, '0001.xml', _entries(CAT, DOG))
+    path2 = _write(dir2, '0001.xml', etree.tounicode(
+        etree.fromstring(_entries(DOG, CAT)), pretty_print=True))
+    assert compare_files(path1, path2)['differences'] == 0
+
+
+def test_changed_and_missing_entries(build_dirs):
+    dir1, dir2 = build_dirs
+    path1 = _write(dir1, '0001.xml', _entries(CAT, DOG))
+    path2 = _write(dir2, '0001.xml',
+                   _entries(('10', 'cat', 'cat', 'NNS', '11')))
+    result = compare_files(path1, path2)
+    assert result['differences'] == 2
+    assert result['details'][0].startswith(
+        '<e> "cat" (sort=cat, #1): differs\n')
+    assert '-  <wordclass penn="NN"' in result['details'][0]
+    assert (result['details'][1] ==
+            '<e> "dog" (sort=dog, #1): only in first file')
+
+    assert len(compare_files(path1, path2,
+                             max_differences=1)['details']) == 1
+
+
+def test_ids_are_normalized_unless_exact(build_dirs):
+    dir1, dir2 = build_dirs
+    path1 = _write(dir1, '0001.xml', _entries(CAT))
+    path2 = _write(dir2, '0001.xml',
+                   _entries(('510', 'cat', 'cat', 'NN', '511')))
+    assert compare_files(path1, path2)['differences'] == 0
+    assert compare_files(path1, path2, normalize_ids=False)['differences'] == 1
+
+    # The same IDs, but pointing the other way round
+    path3 = _write(dir2, '0002.xml',
+                   _entries(('511', 'cat', 'cat', 'NN', '510')))
+    assert compare_files(path2, path3)['differences'] == 0
+    path4 = _write(dir2, '0003.xml',
+                   _entries(('510', 'cat', 'cat', 'NN', '510')))
+    assert compare_files(path2, path4)['differences'] == 1
+
+
+def test_packed_file_matches_its_xml(build_dirs):
+    dir1, dir2 = build_dirs
+    text = _entries(CAT, DOG)
+    _write(dir1, '0001.xml', text)
+    with open(os.path.join(dir2, '0001.xml'), 'wb') as filehandle:
+        filehandle.write(packedxml.pack(etree.fromstring(text)))
+    assert compare_dirs(dir1, dir2, workers=1, normalize_ids=False) == []
@@ -0,0 +1,146 @@
+import os
+
+import pytest
+
+import gelconfig
+from buildmanager import registry
+from idgenerator import FORMATTER, IdMap, IdRanges, first_id, read_log
+
+
+def _plan(out_dir, filenames, seed=1, block_size=10):
+    return IdRanges.plan(str(out_dir), filenames, seed=seed,
+                         block_size=block_size, stable=False)
+
+
+def test_blocks_follow_filename_order(tmp_path):
+    ranges = _plan(tmp_path, ['b.xml', 'c.xml', 'a.xml', 'b.xml'])
+    assert ranges.blocks == {'a.xml': 0, 'b.xml': 1, 'c.xml': 2}
+    allocator = ranges.allocator('b.xml')
+    assert allocator.next_id() == FORMATTER % (first_id(1) + 11)
+    assert allocator.next_id() == FORMATTER % (first_id(1) + 12)
+    # The same seed gives the same IDs
+    assert _plan(tmp_path / 'other', ['a.xml', 'b.xml']).allocator(
+        'b.xml').next_id() == FORMATTER % (first_id(1) + 11)
+
+
+def test_files_keep_their_blocks_when_planned_again(tmp_path):
+    _plan(tmp_path, ['a.xml', 'b.xml', 'c.xml'])
+    ranges = _plan(tmp_path, ['b.xml', 'c.xml', 'd.xml', 'e.xml'])
+    # a.xml's block is free again, so d.xml is given it
+    assert ranges.blocks == {'b.xml': 1, 'c.xml': 2, 'd.xml': 0, 'e.xml': 3}
+    assert [record['range'] for record in read_log(ranges.log_path)] == [
+        'd.xml', 'b.xml', 'c.xml', 'e.xml']
+
+
+def test_blocks_are_reassigned_for_a_different_seed(tmp_path):
+    _plan(tmp_path, ['a.xml', 'b.xml'])
+    ranges = _plan(tmp_path, ['b.xml'], seed=2)
+    assert ranges.blocks == {'b.xml': 0}
+
+
+def test_ids_used_are_recorded(tmp_path):
+    ranges = _plan(tmp_path, ['a.xml', 'b.xml'])
+    allocator = ranges.allocator('b.xml')
+    for _ in range(3):
+        allocator.next_id()
+    ranges.record(allocator)
+    used = {record['range']: record['used']
+            for record in read_log(ranges.log_path)}
+    assert used == {'a.xml': 0, 'b.xml': 3}
+    # ...and kept when only some files are rebuilt
+    ranges = _plan(tmp_path, ['a.xml', 'b.xml'])
+    assert read_log(ranges.log_path)[1]['used'] == 3
+
+
+def test_exhausted_block(tmp_path):
+    allocator = _plan(tmp_path, ['a.xml'], block_size=2).allocator('a.xml')
+    allocator.next_id()
+    allocator.next_id()
+    with pytest.raises(RuntimeError, match='a.xml has used all 2 IDs'):
+        allocator.next_id()
+
+
+def test_file_without_a_block(tmp_path):
+    with pytest.raises(KeyError):
+        _plan(tmp_path, ['a.xml']).allocator('b.xml')
+
+
+@pytest.fixture
+def map_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'id_map')
+    monkeypatch.setattr(gelconfig, 'ID_MAP_DIR', directory)
+    registry.release(['id_map'])
+    yield directory
+    registry.release(['id_map'])
+
+
+def _build(out_dir, signatures, seed=1):
+    # Each build reads the map afresh, as a new run would
+    registry.release(['id_map'])
+    ranges = IdRanges.plan(str(out_dir), list(signatures), seed=seed,
+                           block_size=10, stable=True)
+    ids = {}
+    for name in sorted(signatures):
+        allocator = ranges.allocator(name)
+        ids[name] = [int(allocator.id_for(signature))
+                     for signature in signatures[name]]
+        ranges.record(allocator)
+    return ranges, ids
+
+
+def test_ids_are_kept_between_builds(tmp_path, map_dir):
+    base = first_id(1)
+    ranges, ids = _build(tmp_path, {'a.xml': ['s1', 's2', 's3']})
+    ranges.commit()
+    assert ids == {'a.xml': [base + 1, base + 2, base + 3]}
+
+    # s2 has gone; s4 is new, and isn't given s2's ID
+    ranges, ids = _build(tmp_path, {'a.xml': ['s3', 's1', 's4']})
+    ranges.commit()
+    assert ids == {'a.xml': [base + 3, base + 1, base + 4]}
+
+    # s2 is back, but its ID has been issued before, so it gets a new one
+    ranges, ids = _build(tmp_path, {'a.xml': ['s1', 's2']})
+    ranges.commit()
+    assert ids == {'a.xml': [base + 1, base + 5]}
+
+
+def test_new_file_ids_are_kept_alongside_the_old(tmp_path, map_dir):
+    base = first_id(1)
+    _build(tmp_path, {'a.xml': ['s1']})[0].commit()
+    ranges, ids = _build(tmp_path, {'a.xml': ['s1'], 'b.xml': ['t1']})
+    ranges.commit()
+    assert ids == {'a.xml': [base + 1], 'b.xml': [base + 11]}
+    assert IdMap(map_dir).ids == {'s1': FORMATTER % (base + 1),
+                                  't1': FORMATTER % (base + 11)}
+
+
+def test_map_is_unchanged_until_commit(tmp_path, map_dir):
+    _build(tmp_path, {'a.xml': ['s1']})[0].commit()
+    ranges, ids = _build(tmp_path, {'a.xml': ['s1', 's2']})
+    assert IdMap(map_dir).find('s2') is None
+    ranges.commit()
+    assert IdMap(map_dir).find('s2') == FORMATTER % ids['a.xml'][1]
+    assert not os.path.isdir(os.path.join(map_dir, '.pending'))
+
+
+def test_interrupted_build_is_discarded(tmp_path, map_dir):
+    base = first_id(1)
+    _build(tmp_path, {'a.xml': ['s1', 's2']})
+    assert os.path.isdir(os.path.join(map_dir, '.pending'))
+    # Never committed, so the next build starts from the same map
+    ranges, ids = _build(tmp_path, {'a.xml': ['s2']})
+    assert ids == {'a.xml': [base + 1]}
+
+
+def test_duplicate_signature_gets_a_new_id(tmp_path, map_dir):
+    base = first_id(1)
+    _build(tmp_path, {'a.xml': ['s1']})[0].commit()
+    ranges, ids = _build(tmp_path, {'a.xml': ['s1', 's1']})
+    assert ids == {'a.xml': [base + 1, base + 2]}
+
+
+def test_id_settings_must_not_change(tmp_path, map_dir):
+    _build(tmp_path, {'a.xml': ['s1']})[0].commit()
+    with pytest.raises(ValueError, match='ID_SEED=1'):
+        _build(tmp_path, {'a.xml': ['s1']}, seed=2)
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import pytest
+
+import gelconfig
+from buildmanager import buildcache, incremental, runoptions
+
+
+@pytest.fixture
+def build_dirs(monkeypatch):
+    monkeypatch.setattr(gelconfig, 'INCREMENTAL_FILES', True)
+    in_dir = os.path.join(gelconfig.BUILD_DIR, 'test_in')
+    out_dir = os.path.join(gelconfig.BUILD_DIR, 'test_out')
+    for directory in (in_dir, out_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+    for filename in ('0001.xml', '0002.xml'):
+        with open(os.path.join(in_dir, filename), 'w') as filehandle:
+            filehandle.write('<entries><e id="%s"/></entries>' % filename)
+    yield in_dir, out_dir
+    buildcache.invalidate('generateMorphologyHub')
+
+
+def _copy_files(processed):
+    def processor(in_dir, out_dir):
+        for filename in incremental.xml_files(in_dir):
+            shutil.copyfile(os.path.join(in_dir, filename),
+                            os.path.join(out_dir, filename))
+            processed.append(filename)
+    return processor
+
+
+def _hub_completed(timestamp):
+    # What buildcache.record() leaves when generateMorphologyHub runs
+    if not os.path.isdir(buildcache.CACHE_DIR):
+        os.makedirs(buildcache.CACHE_DIR)
+    buildcache._save_record('generateMorphologyHub',
+                            {'fingerprint': None, 'outputs': {},
+                             'completed': timestamp})
+
+
+def test_unchanged_files_are_skipped(build_dirs):
+    in_dir, out_dir = build_dirs
+    _hub_completed(1000.0)
+    processed = []
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    assert processed == ['0001.xml', '0002.xml']
+    del processed[:]
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    assert processed == []
+
+
+def test_new_morphology_hub_reprocesses_every_file(build_dirs):
+    in_dir, out_dir = build_dirs
+    _hub_completed(1000.0)
+    processed = []
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    del processed[:]
+    # The input files are unchanged, but the morphology hub isn't
+    _hub_completed(2000.0)
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    assert processed == ['0001.xml', '0002.xml']
+
+
+def test_force_reprocesses_every_file(build_dirs, monkeypatch):
+    in_dir, out_dir = build_dirs
+    processed = []
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    del processed[:]
+    monkeypatch.setitem(runoptions.OPTIONS, 'force', True)
+    incremental.run_per_file(_copy_files(processed), in_dir, out_dir,
+                             stage='addInflections')
+    assert processed == ['0001.xml', '0002.xml']
@@ -0,0 +1,34 @@
+from buildmanager import memory
+
+
+def _rss(monkeypatch, readings):
+    readings = list(readings)
+    monkeypatch.setattr(memory, 'current_rss_mb', lambda: readings.pop(0))
+
+
+def test_no_spill_after_a_spill_until_the_process_grows(monkeypatch):
+    monkeypatch.setattr(memory, 'budget_mb', lambda: 100)
+    # Started at 50MB; over budget at 120MB, and still there after the
+    #  spill, since the freed memory stays with the process
+    _rss(monkeypatch, [50, 120, 120, 120, 125, 140])
+    watch = memory.SpillWatch()
+    assert watch.over_budget()
+    watch.spilled()
+    # Refilling the memory freed by the spill doesn't count...
+    assert not watch.over_budget()
+    assert not watch.over_budget()
+    # ...but outgrowing it does
+    assert watch.over_budget()
+
+
+def test_structure_started_over_budget_is_given_room(monkeypatch):
+    monkeypatch.setattr(memory, 'budget_mb', lambda: 100)
+    _rss(monkeypatch, [300, 301, 300 + memory.MINIMUM_GROWTH_MB + 1])
+    watch = memory.SpillWatch()
+    assert not watch.over_budget()
+    assert watch.over_budget()
+
+
+def test_no_budget(monkeypatch):
+    monkeypatch.setattr(memory, 'budget_mb', lambda: None)
+    assert not memory.SpillWatch().over_budget()
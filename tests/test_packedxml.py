@@ -0,0 +1,80 @@
+import os
+
+from lxml import etree
+
+import gelconfig
+from buildmanager import packedxml
+
+DOCUMENT = ('<entries><e oedId="1" sort="cat"><lemma src="oed_rev">cat'
+            '</lemma><wordclassSet><wordclass penn="NN"/><type id="2">'
+            '<form>cats</form><!-- a comment --></type></wordclassSet>'
+            '</e><e sort="café"><lemma>café</lemma></e></entries>')
+
+
+def _tree():
+    return etree.fromstring(DOCUMENT, packedxml.PARSER).getroottree()
+
+
+def test_unpacked_file_is_what_xml_mode_writes(tmp_path):
+    filepath = str(tmp_path / '0001.xml')
+    with open(filepath, 'wb') as filehandle:
+        filehandle.write(packedxml.pack(_tree()))
+    assert packedxml.is_packed(filepath)
+    assert packedxml.to_xml(filepath) == etree.tounicode(_tree(),
+                                                         pretty_print=True)
+
+
+def test_document_split_across_records(monkeypatch):
+    monkeypatch.setattr(packedxml, 'RECORD_SIZE', 16)
+    data = packedxml.pack(_tree())
+    records = list(packedxml.records(data))
+    assert len(records) > 1
+    assert max(len(record) for record in records) == 16
+    assert (etree.tostring(packedxml.unpack(data)) ==
+            etree.tostring(_tree()))
+
+
+def test_iterparse_gives_the_same_events(tmp_path, monkeypatch):
+    # The first record ends between the two bytes of 'é'
+    text = etree.tostring(_tree(), encoding='UTF-8')
+    monkeypatch.setattr(packedxml, 'RECORD_SIZE',
+                        text.index('é'.encode('utf-8')) + 1)
+    xml_file, packed_file = str(tmp_path / 'a.xml'), str(tmp_path / 'b.xml')
+    with open(xml_file, 'w') as filehandle:
+        filehandle.write(DOCUMENT)
+    with open(packed_file, 'wb') as filehandle:
+        filehandle.write(packedxml.pack(_tree()))
+
+    def events(filepath):
+        return [(event, node.tag, node.text) for event, node in
+                packedxml.iterparse(filepath, events=('start', 'end'),
+                                    remove_blank_text=True,
+                                    remove_comments=True)]
+    assert events(packed_file) == events(xml_file)
+
+
+def test_write_document_follows_the_output_format(tmp_path, monkeypatch):
+    filepath = str(tmp_path / '0001.xml')
+    for output_format in packedxml.FORMATS:
+        monkeypatch.setattr(gelconfig, 'INTERMEDIATE_FORMAT', output_format)
+        packedxml.write_document(filepath, _tree())
+        assert packedxml.is_packed(filepath) == (output_format == 'packed')
+        assert (etree.tostring(packedxml.parse(filepath)) ==
+                etree.tostring(_tree()))
+
+
+def test_directory_converts_both_ways(tmp_path):
+    source = tmp_path / 'xml'
+    os.makedirs(str(source / 'c'))
+    original = etree.tounicode(_tree(), pretty_print=True)
+    for filename in ('0001.xml', os.path.join('c', '0002.xml')):
+        with open(str(source / filename), 'w') as filehandle:
+            filehandle.write(original)
+    assert packedxml.convert(str(source), str(tmp_path / 'packed'),
+                             packed=True) == 2
+    assert packedxml.convert(str(tmp_path / 'packed'),
+                             str(tmp_path / 'unpacked'), packed=False) == 2
+    assert packedxml.is_packed(str(tmp_path / 'packed' / 'c' / '0002.xml'))
+    for filename in ('0001.xml', os.path.join('c', '0002.xml')):
+        with open(str(tmp_path / 'unpacked' / filename)) as filehandle:
+            assert filehandle.read() == original
@@ -0,0 +1,18 @@
+from buildmanager import runreport
+
+
+def test_workers_peak_rss_is_recorded():
+    with runreport.StageMonitor('addInflections') as monitor:
+        runreport.worker_peak_rss(101, 200 * runreport.MEGABYTE)
+        runreport.worker_peak_rss(102, 300 * runreport.MEGABYTE)
+        # The same worker reporting again, after a smaller shard
+        runreport.worker_peak_rss(101, 100 * runreport.MEGABYTE)
+    assert monitor.data['worker_peak_rss_mb'] == 300
+    assert monitor.data['workers_peak_rss_total_mb'] == 500
+    assert monitor.data['worker_processes'] == 2
+
+
+def test_no_workers():
+    with runreport.StageMonitor('indexOutput') as monitor:
+        pass
+    assert 'worker_peak_rss_mb' not in monitor.data
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+import gelconfig
+from buildmanager import stages
+from buildmanager.scheduler import StageScheduler
+from buildmanager.stages import Stage, depends_on
+
+LOG_FILE = os.path.join(gelconfig.BUILD_DIR, 'scheduler_test.log')
+
+
+@pytest.fixture
+def test_stages(monkeypatch):
+    for stage in (Stage('writeA', inputs=('source',), outputs=('a',)),
+                  Stage('readA', inputs=('a',), outputs=('b',)),
+                  Stage('rewriteSource', inputs=(), outputs=('source',)),
+                  Stage('alsoWriteB', inputs=('other',), outputs=('b',)),
+                  Stage('unrelated', inputs=('other',), outputs=('c',))):
+        monkeypatch.setitem(stages.STAGES, stage.name, stage)
+    if not os.path.isdir(gelconfig.BUILD_DIR):
+        os.makedirs(gelconfig.BUILD_DIR)
+    if os.path.isfile(LOG_FILE):
+        os.unlink(LOG_FILE)
+
+
+def log_stage(stage_name):
+    # Runs in a worker process; writeA takes long enough that anything
+    #  started alongside it would show up as overlapping
+    with open(LOG_FILE, 'a') as filehandle:
+        filehandle.write('start %s %f\n' % (stage_name, time.time()))
+    if stage_name == 'writeA':
+        time.sleep(0.5)
+    if stage_name == 'failing':
+        raise ValueError('stage failed')
+    with open(LOG_FILE, 'a') as filehandle:
+        filehandle.write('end %s %f\n' % (stage_name, time.time()))
+
+
+def _read_log():
+    events = {}
+    with open(LOG_FILE) as filehandle:
+        for line in filehandle:
+            event, stage_name, timestamp = line.split()
+            events[(event, stage_name)] = float(timestamp)
+    return events
+
+
+def test_reading_an_earlier_output_waits(test_stages):
+    assert depends_on('writeA', 'readA')
+
+
+def test_overwriting_an_earlier_input_waits(test_stages):
+    assert depends_on('writeA', 'rewriteSource')
+
+
+def test_writing_the_same_output_waits(test_stages):
+    assert depends_on('readA', 'alsoWriteB')
+
+
+def test_stages_sharing_only_inputs_overlap(test_stages):
+    assert not depends_on('alsoWriteB', 'unrelated')
+    assert not depends_on('writeA', 'unrelated')
+
+
+def test_pipeline_declarations():
+    assert depends_on('generateBase', 'mergeEntryPairs')
+    assert depends_on('distilOdo', 'generateBase')
+    assert not depends_on('generateMorphologyHub', 'indexOedSize')
+
+
+def test_ready_stages_in_pipeline_order(test_stages):
+    scheduler = StageScheduler(['writeA', 'readA', 'unrelated'], log_stage)
+    assert scheduler.prerequisites == {'writeA': set(),
+                                       'readA': {'writeA'},
+                                       'unrelated': set()}
+    pending = ['writeA', 'readA', 'unrelated']
+    assert scheduler.ready(pending, set()) == ['writeA', 'unrelated']
+    assert scheduler.ready(['readA'], {'writeA'}) == ['readA']
+
+
+def test_parallel_run_respects_dependencies(test_stages):
+    scheduler = StageScheduler(['writeA', 'readA', 'unrelated'], log_stage,
+                               workers=2)
+    scheduler.run()
+    events = _read_log()
+    assert events[('start', 'readA')] >= events[('end', 'writeA')]
+    # unrelated doesn't wait for writeA
+    assert events[('start', 'unrelated')] < events[('end', 'writeA')]
+
+
+def test_failed_stage_stops_later_stages(test_stages, monkeypatch):
+    monkeypatch.setitem(stages.STAGES, 'failing',
+                        Stage('failing', inputs=(), outputs=('a',)))
+    scheduler = StageScheduler(['failing', 'readA'], log_stage, workers=2)
+    with pytest.raises(RuntimeError, match='Stage "failing" failed'):
+        scheduler.run()
+    assert ('start', 'readA') not in _read_log()